@@ -1,14 +1,29 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
+import click
+from flask import (Flask, Response, g, render_template, request, redirect, url_for, flash, jsonify,
+                   stream_with_context)
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from werkzeug.security import check_password_hash
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime
+import hmac
 import os
 import logging
+import threading
+import time
 
 from config import config
-from models import db, User, Prediction
+from models import (db, User, ApiToken, Prediction, UserPredictionStats, UserMonthlyPredictions,
+                    ensure_schema, create_missing_indexes, record_predictions, forget_prediction,
+                    backfill_prediction_stats, rebuild_prediction_stats)
 from forms import LoginForm, SignupForm, HousePredictionForm
-from ml_model import predictor
+from features import parse_house
+from predictor_provider import PredictorProvider
+from pagination import keyset_page
+from user_cache import UserCache
+from prediction_api import API_PREDICT_PATH, TokenAuthenticator, bearer_token, prediction_response
+from log_queue import configure_logging
+from metrics import (HTTP_REQUEST_SECONDS, VALIDATE_SECONDS, PREDICT_SECONDS, DB_COMMIT_SECONDS,
+                     RENDER_SECONDS, REGISTRY, CONTENT_TYPE)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -18,15 +33,34 @@ def create_app(config_name=None):
     # Use environment variable or default to production
     if config_name is None:
         config_name = os.environ.get('FLASK_ENV', 'production')
-    
-    logger.info(f"Starting app with config: {config_name}")
 
     app = Flask(__name__)
     app.config.from_object(config[config_name])
 
+    configure_logging(app.config['LOG_LEVEL'], app.config['LOG_QUEUE'])
+    logger.info(f"Starting app with config: {config_name}")
+
     # Initialize extensions
     db.init_app(app)
 
+    # The ML stack is only imported when the predictor is first loaded
+    predictor_provider = PredictorProvider.from_config(app.config)
+    app.extensions['predictor_provider'] = predictor_provider
+    get_predictor = predictor_provider.get
+
+    load_mode = app.config['MODEL_LOAD_MODE']
+    if load_mode == 'eager':
+        predictor_provider.load()
+    elif load_mode == 'background':
+        threading.Thread(target=predictor_provider.load, name='model-warmup', daemon=True).start()
+    logger.info(f"Model load mode: {load_mode}")
+
+    prediction_writer = None
+    if app.config['PREDICTION_WRITE_BEHIND']:
+        from prediction_writer import PredictionWriter
+        prediction_writer = PredictionWriter.from_config(app)
+        app.extensions['prediction_writer'] = prediction_writer
+
     # Initialize Flask-Login
     login_manager = LoginManager()
     login_manager.init_app(app)
@@ -34,18 +68,48 @@ def create_app(config_name=None):
     login_manager.login_message = 'Please log in to access this page.'
     login_manager.login_message_category = 'info'
 
+    user_cache = UserCache.from_config(app)
+    app.extensions['user_cache'] = user_cache
+
+    token_auth = TokenAuthenticator.from_config(app)
+    app.extensions['token_auth'] = token_auth
+
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
+        if user_cache is None:
+            return db.session.get(User, int(user_id))
+        return user_cache.load(int(user_id))
 
     # Create database tables
     with app.app_context():
         try:
             db.create_all()
+            ensure_schema()
             logger.info("Database tables created successfully")
         except Exception as e:
             logger.error(f"Database initialization error: {e}")
 
+    @app.before_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request_time(response):
+        started = g.pop('request_started', None)
+        if started is not None and request.endpoint is not None:
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=request.endpoint,
+                                         method=request.method, status=response.status_code)
+        return response
+
+    def user_stats(user_id):
+        """The user's UserPredictionStats, backfilled on first use"""
+        stats = db.session.get(UserPredictionStats, user_id)
+        if stats is None:
+            backfill_prediction_stats(user_id)
+            db.session.commit()
+            stats = db.session.get(UserPredictionStats, user_id)
+        return stats
+
     # Routes
     @app.route('/')
     def index():
@@ -63,6 +127,10 @@ def create_app(config_name=None):
             user = User.query.filter_by(username=form.username.data).first()
             
             if user and user.check_password(form.password.data):
+                # Upgrade the stored hash when PASSWORD_HASH_METHOD has changed
+                if user.password_needs_rehash():
+                    user.set_password(form.password.data)
+                
                 # Update last login
                 user.last_login = datetime.utcnow()
                 db.session.commit()
@@ -85,17 +153,8 @@ def create_app(config_name=None):
             return redirect(url_for('dashboard'))
         
         form = SignupForm()
+        # Validation includes one query for a taken username or email
         if form.validate_on_submit():
-            # Check if user already exists
-            existing_user = User.query.filter(
-                (User.username == form.username.data) | 
-                (User.email == form.email.data)
-            ).first()
-            
-            if existing_user:
-                flash('Username or email already exists.', 'danger')
-                return render_template('signup.html', form=form)
-            
             # Create new user
             user = User(
                 username=form.username.data,
@@ -106,7 +165,15 @@ def create_app(config_name=None):
             user.set_password(form.password.data)
             
             db.session.add(user)
-            db.session.commit()
+            try:
+                db.session.commit()
+            except IntegrityError:
+                # A concurrent signup took the username or email after the check;
+                # the unique indexes are the authority
+                db.session.rollback()
+                form.check_taken()
+                flash('Username or email already exists.', 'danger')
+                return render_template('signup.html', form=form)
             
             flash('Registration successful! Please log in.', 'success')
             return redirect(url_for('login'))
@@ -125,27 +192,15 @@ def create_app(config_name=None):
     @login_required
     def dashboard():
         """User dashboard with prediction history"""
-        # Get user's recent predictions
         recent_predictions = Prediction.query.filter_by(user_id=current_user.id)\
-                                           .order_by(Prediction.prediction_date.desc())\
+                                           .order_by(Prediction.prediction_date.desc(), Prediction.id.desc())\
                                            .limit(10).all()
         
-        # Calculate some stats
-        total_predictions = Prediction.query.filter_by(user_id=current_user.id).count()
-        
-        if recent_predictions:
-            avg_price = sum(p.predicted_price for p in recent_predictions) / len(recent_predictions)
-            max_price = max(p.predicted_price for p in recent_predictions)
-            min_price = min(p.predicted_price for p in recent_predictions)
-        else:
-            avg_price = max_price = min_price = 0
-        
-        stats = {
-            'total_predictions': total_predictions,
-            'avg_price': avg_price,
-            'max_price': max_price,
-            'min_price': min_price
-        }
+        # Lifetime stats are one maintained row, not a scan of predictions
+        stats = user_stats(current_user.id).summary()
+        stats['monthly'] = UserMonthlyPredictions.query.filter_by(user_id=current_user.id)\
+                                                 .order_by(UserMonthlyPredictions.month.desc())\
+                                                 .limit(12).all()
         
         return render_template('dashboard.html', 
                              predictions=recent_predictions, 
@@ -157,7 +212,10 @@ def create_app(config_name=None):
         """House price prediction"""
         form = HousePredictionForm()
         
-        if form.validate_on_submit():
+        with VALIDATE_SECONDS.time():
+            valid = form.validate_on_submit()
+        
+        if valid:
             # Prepare house features for prediction
             house_features = {
                 'area': form.area.data,
@@ -175,7 +233,9 @@ def create_app(config_name=None):
             }
             
             # Make prediction
-            predicted_price, error = predictor.predict_price(house_features)
+            predictor = get_predictor()
+            with PREDICT_SECONDS.time():
+                predicted_price, error = predictor.predict_price(house_features)
             
             if predicted_price is not None:
                 # Convert to Python float if it's numpy type (avoid PostgreSQL error)
@@ -185,34 +245,213 @@ def create_app(config_name=None):
                 prediction = Prediction(
                     user_id=current_user.id,
                     **house_features,
-                    predicted_price=predicted_price
+                    predicted_price=predicted_price,
+                    prediction_date=datetime.utcnow(),
+                    model_version=getattr(predictor, 'model_version', None) if error is None else None
                 )
                 
-                db.session.add(prediction)
-                db.session.commit()
+                with DB_COMMIT_SECONDS.time():
+                    if prediction_writer is not None:
+                        # Rendered from memory, inserted later by the writer thread
+                        prediction_writer.submit(prediction.column_values())
+                    else:
+                        db.session.add(prediction)
+                        record_predictions([prediction])
+                        db.session.commit()
                 
                 flash(f'Prediction successful! Estimated price: ${predicted_price:,.2f}', 'success')
-                return render_template(
-                    'predict_result.html',
-                    prediction=prediction,
-                    house_features=house_features
-                )
+                with RENDER_SECONDS.time():
+                    return render_template(
+                        'predict_result.html',
+                        prediction=prediction,
+                        house_features=house_features
+                    )
             else:
                 flash(f'Prediction failed: {error}', 'danger')
         
         return render_template('predict.html', form=form)
 
+    @app.route('/api/predict/batch', methods=['POST'])
+    @login_required
+    def predict_batch():
+        """Batch house price prediction (JSON)"""
+        payload = request.get_json(silent=True)
+        houses = payload.get('houses') if isinstance(payload, dict) else payload
+        
+        if not isinstance(houses, list) or not houses:
+            return jsonify({'error': 'Expected a non-empty list of houses'}), 400
+        
+        max_rows = app.config['BATCH_PREDICTION_MAX_ROWS']
+        if len(houses) > max_rows:
+            return jsonify({'error': f'At most {max_rows} houses per request'}), 413
+        
+        # Validate up front so the bulk insert cannot fail halfway
+        rows = []
+        invalid_rows = {}
+        for i, house in enumerate(houses):
+            row, errors = parse_house(house)
+            if errors:
+                invalid_rows[i] = errors
+                continue
+            rows.append(row)
+        
+        if invalid_rows:
+            shown = list(invalid_rows)[:100]
+            return jsonify({
+                'error': 'Invalid house features',
+                'invalid_rows': shown,
+                'fields': {i: invalid_rows[i] for i in shown}
+            }), 400
+        
+        predictor = get_predictor()
+        results = predictor.predict_batch(rows)
+        
+        prediction_date = datetime.utcnow()
+        model_version = getattr(predictor, 'model_version', None)
+        for row, (predicted_price, error) in zip(rows, results):
+            row['user_id'] = current_user.id
+            row['predicted_price'] = float(predicted_price)
+            row['prediction_date'] = prediction_date
+            row['model_version'] = model_version if error is None else None
+        
+        # One executemany INSERT for the whole batch
+        db.session.bulk_insert_mappings(Prediction, rows)
+        record_predictions(rows)
+        db.session.commit()
+        
+        return jsonify({
+            'count': len(results),
+            'predictions': [
+                {'predicted_price': float(price), 'error': error}
+                for price, error in results
+            ]
+        })
+
+    @app.route(API_PREDICT_PATH, methods=['POST'])
+    def api_predict():
+        """Single prediction for API token holders (JSON, not saved to history)"""
+        if token_auth.lookup(bearer_token(request.headers.get('Authorization'))) is None:
+            return jsonify({'error': 'Invalid or missing API token'}), 401, \
+                {'WWW-Authenticate': 'Bearer'}
+        
+        if (request.content_length or 0) > app.config['API_MAX_BODY_BYTES']:
+            return jsonify({'error': 'Request body too large'}), 413
+        
+        house, errors = parse_house(request.get_json(silent=True))
+        if errors:
+            return jsonify({'error': 'Invalid house features', 'fields': errors}), 400
+        
+        with PREDICT_SECONDS.time():
+            body, status = prediction_response(get_predictor(), house)
+        return jsonify(body), status
+
     @app.route('/history')
     @login_required
     def history():
         """Full prediction history"""
-        page = request.args.get('page', 1, type=int)
-        predictions = Prediction.query.filter_by(user_id=current_user.id)\
-                                    .order_by(Prediction.prediction_date.desc())\
-                                    .paginate(page=page, per_page=20, error_out=False)
+        query = Prediction.query.filter_by(user_id=current_user.id)
+        predictions = keyset_page(query, Prediction, request.args.get('cursor'), per_page=20)
+        
+        predictions.total = user_stats(current_user.id).prediction_count
         
         return render_template('history.html', predictions=predictions)
 
+    @app.route('/history/export.<fmt>')
+    @login_required
+    def export_history(fmt):
+        """Download the full prediction history as CSV or JSON Lines"""
+        from history_export import iter_csv, iter_jsonl
+
+        formats = {'csv': (iter_csv, 'text/csv'), 'jsonl': (iter_jsonl, 'application/x-ndjson')}
+        if fmt not in formats:
+            return jsonify({'error': f'Unsupported export format: {fmt}'}), 404
+        generate, mimetype = formats[fmt]
+        
+        rows = generate(current_user.id, app.config['HISTORY_EXPORT_BATCH_SIZE'])
+        filename = f"predictions-{datetime.utcnow():%Y%m%d}.{fmt}"
+        return Response(stream_with_context(rows), mimetype=mimetype,
+                        headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+    @app.cli.command('publish-model')
+    @click.argument('artifact_path')
+    @click.option('--version', default=None, help='Version name (default: UTC timestamp)')
+    @click.option('--no-activate', is_flag=True, help='Publish without making it current')
+    def publish_model(artifact_path, version, no_activate):
+        """Publish a model artifact to MODEL_REGISTRY_DIR"""
+        from model_registry import ModelRegistry
+
+        registry_dir = app.config.get('MODEL_REGISTRY_DIR')
+        if not registry_dir:
+            raise click.ClickException('MODEL_REGISTRY_DIR is not configured')
+        version = ModelRegistry(registry_dir).publish(artifact_path, version, activate=not no_activate)
+        click.echo(f"Published model version {version}")
+
+    @app.cli.command('score')
+    @click.argument('input_path')
+    @click.argument('output_path')
+    @click.option('--model', 'model_path', default=None,
+                  help='Model artifact (default: current registry version or MODEL_PATH)')
+    @click.option('--chunk-size', default=10000, show_default=True, help='Rows per chunk')
+    @click.option('--workers', default=1, show_default=True, help='Scoring processes')
+    def score(input_path, output_path, model_path, chunk_size, workers):
+        """Score a CSV or Parquet file of houses into OUTPUT_PATH"""
+        from bulk_scoring import score_file
+
+        if model_path is None and app.config.get('MODEL_REGISTRY_DIR'):
+            from model_registry import ModelRegistry
+            model_path = ModelRegistry(app.config['MODEL_REGISTRY_DIR']).current()[1]
+        if model_path is None:
+            model_path = app.config['MODEL_PATH']
+
+        try:
+            stats = score_file(input_path, output_path, model_path, chunk_size, workers,
+                               predictor_provider.load_options)
+        except (OSError, RuntimeError) as e:
+            raise click.ClickException(str(e))
+        click.echo(f"Scored {stats['rows']} rows ({stats['fallback_rows']} fallback) "
+                   f"in {stats['seconds']:.2f}s, {stats['rows_per_second']:,.0f} rows/s")
+
+    @app.cli.command('rebuild-stats')
+    @click.option('--user-id', type=int, default=None, help='Only rebuild this user (default: everyone)')
+    def rebuild_stats(user_id):
+        """Recompute user_prediction_stats from the predictions table"""
+        rebuild_prediction_stats(user_id)
+        db.session.commit()
+        scope = f"user {user_id}" if user_id is not None else "all users"
+        click.echo(f"Rebuilt prediction stats for {scope}")
+
+    @app.cli.command('ensure-schema')
+    def ensure_schema_command():
+        """Add missing columns and build missing indexes (once per deploy)"""
+        db.create_all()
+        ensure_schema()
+        created = create_missing_indexes()
+        click.echo(f"Created indexes: {', '.join(created)}" if created else "All indexes present")
+
+    @app.cli.command('create-token')
+    @click.argument('username')
+    @click.option('--name', default=None, help='Label to recognise the token by')
+    def create_token(username, name):
+        """Issue an API token for USERNAME (printed once, only its hash is stored)"""
+        user = User.query.filter_by(username=username).first()
+        if user is None:
+            raise click.ClickException(f'No user named {username}')
+        token = ApiToken.issue(user.id, name)
+        db.session.commit()
+        click.echo(token)
+
+    if app.config['METRICS_ENABLED']:
+        @app.route('/metrics')
+        def metrics():
+            """Prometheus metrics of this worker process"""
+            expected = app.config['METRICS_TOKEN']
+            if expected is not None:
+                token = bearer_token(request.headers.get('Authorization')) or ''
+                if not hmac.compare_digest(token.encode(), expected.encode()):
+                    return Response('Unauthorized\n', 401, {'WWW-Authenticate': 'Bearer'},
+                                    content_type='text/plain')
+            return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
     @app.route('/delete_prediction/<int:prediction_id>')
     @login_required
     def delete_prediction(prediction_id):
@@ -225,6 +464,7 @@ def create_app(config_name=None):
             return redirect(url_for('history'))
         
         db.session.delete(prediction)
+        forget_prediction(prediction)
         db.session.commit()
         flash('Prediction deleted successfully.', 'success')
         
@@ -0,0 +1,218 @@
+"""ASGI entry point: the JSON prediction API on an event loop
+
+    uvicorn asgi:application --workers 2
+    gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi:application
+
+POST /api/v1/predict is answered here without going through Flask: the
+token check is usually a cache hit, and the database lookup on a miss
+and the model call both run on a thread pool, so the event loop keeps
+accepting connections while predictions are computed. Every other path
+(the HTML pages, /metrics, the batch API) is passed to the Flask app on
+the same pool through a small WSGI bridge. That bridge buffers whole
+responses, so history exports are not streamed; serve those from the
+WSGI app (Procfile) if they matter.
+
+uvicorn is not in requirements.txt; install it on hosts that use this.
+"""
+import asyncio
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app import app
+from features import parse_house
+from metrics import HTTP_REQUEST_SECONDS, PREDICT_SECONDS
+from prediction_api import API_PREDICT_PATH, bearer_token, prediction_response
+
+JSON_HEADERS = [(b'content-type', b'application/json')]
+TEXT_HEADERS = [(b'content-type', b'text/plain; charset=utf-8')]
+
+
+class PredictionASGI:
+    """ASGI app serving API_PREDICT_PATH natively and the rest via Flask"""
+
+    def __init__(self, flask_app, threads=8):
+        self.flask_app = flask_app
+        self.provider = flask_app.extensions['predictor_provider']
+        self.token_auth = flask_app.extensions['token_auth']
+        self.max_body = flask_app.config['API_MAX_BODY_BYTES']
+        self.max_content_length = flask_app.config['MAX_CONTENT_LENGTH']
+        self.threads = threads
+        self._executor = None
+        self._executor_pid = None
+
+    @classmethod
+    def from_app(cls, flask_app):
+        return cls(flask_app, flask_app.config['API_INFERENCE_THREADS'])
+
+    @property
+    def executor(self):
+        # Created per process: a pool made before a fork has no threads
+        if self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(self.threads, thread_name_prefix='api-inference')
+            self._executor_pid = os.getpid()
+        return self._executor
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] != 'http':
+            raise NotImplementedError(f"Unsupported ASGI scope type {scope['type']}")
+        elif scope['path'] == API_PREDICT_PATH:
+            started = time.perf_counter()
+            status, body, headers = await self._predict(scope, receive)
+            await self._send(send, status, headers + JSON_HEADERS, json.dumps(body).encode())
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint='api_predict',
+                                         method=scope['method'], status=status)
+        else:
+            await self._wsgi(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                # Load the model before the first request rather than during it
+                await asyncio.get_running_loop().run_in_executor(self.executor, self.provider.get)
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self._executor is not None:
+                    self._executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _predict(self, scope, receive):
+        """(status, body, extra headers) for one API request"""
+        if scope['method'] != 'POST':
+            return 405, {'error': 'Method not allowed'}, [(b'allow', b'POST')]
+
+        loop = asyncio.get_running_loop()
+        headers = dict(scope['headers'])
+        token = bearer_token(headers.get(b'authorization', b'').decode('latin-1'))
+        user_id = self.token_auth.cached(token)
+        if user_id is None and token is not None:
+            user_id = await loop.run_in_executor(self.executor, self.token_auth.lookup, token)
+        if user_id is None:
+            return 401, {'error': 'Invalid or missing API token'}, [(b'www-authenticate', b'Bearer')]
+
+        length = self._content_length(headers)
+        if length is None:
+            return 400, {'error': 'Invalid Content-Length header'}, []
+        if length > self.max_body:
+            return 413, {'error': 'Request body too large'}, []
+        raw = await self._read_body(receive, self.max_body)
+        if raw is None:
+            return 413, {'error': 'Request body too large'}, []
+
+        try:
+            payload = json.loads(raw)
+        except ValueError:
+            payload = None
+        house, errors = parse_house(payload)
+        if errors:
+            return 400, {'error': 'Invalid house features', 'fields': errors}, []
+
+        body, status = await loop.run_in_executor(self.executor, self._predict_house, house)
+        return status, body, []
+
+    def _predict_house(self, house):
+        with PREDICT_SECONDS.time():
+            return prediction_response(self.provider.get(), house)
+
+    @staticmethod
+    def _content_length(headers):
+        """The Content-Length header as an int (0 if absent), or None if malformed"""
+        value = headers.get(b'content-length')
+        if value is None:
+            return 0
+        value = value.strip()
+        return int(value) if value.isdigit() else None
+
+    @staticmethod
+    async def _read_body(receive, limit=None):
+        """The request body, or None once it grows past limit bytes"""
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                break
+            body += message.get('body', b'')
+            if limit is not None and len(body) > limit:
+                return None
+            if not message.get('more_body'):
+                break
+        return bytes(body)
+
+    @staticmethod
+    async def _send(send, status, headers, body):
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def _wsgi(self, scope, receive, send):
+        # The whole body is buffered for Flask, so cap it before reading
+        length = self._content_length(dict(scope['headers']))
+        if length is None:
+            await self._send(send, 400, TEXT_HEADERS, b'Invalid Content-Length header\n')
+            return
+        limit = self.max_content_length
+        body = None if limit is not None and length > limit else await self._read_body(receive, limit)
+        if body is None:
+            await self._send(send, 413, TEXT_HEADERS, b'Request body too large\n')
+            return
+        environ = self._environ(scope, body)
+        status, headers, body = await asyncio.get_running_loop().run_in_executor(
+            self.executor, self._call_wsgi, environ)
+        await self._send(send, status, headers, body)
+
+    def _call_wsgi(self, environ):
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                  for name, value in headers]
+
+        result = self.flask_app(environ, start_response)
+        try:
+            body = b''.join(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return started['status'], started['headers'], body
+
+    @staticmethod
+    def _environ(scope, body):
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope['query_string'].decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1] or 80),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': client[0],
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False
+        }
+        for name, value in scope['headers']:
+            key = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if key == 'CONTENT_LENGTH':
+                continue
+            if key != 'CONTENT_TYPE':
+                key = f'HTTP_{key}'
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+        return environ
+
+
+application = PredictionASGI.from_app(app)
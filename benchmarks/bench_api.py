@@ -0,0 +1,172 @@
+"""Load test: the /predict form against the /api/v1/predict JSON API
+
+Serves the app from one process per mode and posts --requests
+predictions from --concurrency keep-alive client threads:
+
+- form      POST /predict under Gunicorn (session cookie, CSRF form,
+            result template, prediction saved to history)
+- api-wsgi  POST /api/v1/predict under Gunicorn, through Flask
+- api-asgi  POST /api/v1/predict under uvicorn via asgi.py (needs
+            uvicorn installed, skipped otherwise)
+
+Gunicorn runs one worker with --threads threads; uvicorn one worker
+with API_INFERENCE_THREADS set to the same number. The prediction cache
+is off, so every request reaches the model. Reports requests/s, latency
+percentiles and non-200 responses.
+
+    python benchmarks/bench_api.py [--requests 3000] [--concurrency 64] [--modes form api-wsgi api-asgi]
+"""
+import argparse
+import contextlib
+import http.client
+import importlib.util
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from bench_predict_logging import Client, free_port, wait_for
+from fixtures import make_houses, train_artifact
+
+MODES = ['form', 'api-wsgi', 'api-asgi']
+
+
+def server_command(mode):
+    if mode == 'api-asgi':
+        return [sys.executable, '-m', 'uvicorn', 'asgi:application', '--host', '127.0.0.1',
+                '--log-level', 'warning', '--no-access-log']
+    return [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app']
+
+
+def create_user_and_token(env):
+    """Add the 'bench' user to env's database and return a new API token for it"""
+    subprocess.run([sys.executable, '-c', (
+        "from app import app; from models import db, User\n"
+        "with app.app_context():\n"
+        "    user = User(username='bench', email='bench@example.com')\n"
+        "    user.set_password('secret123'); db.session.add(user); db.session.commit()")],
+        cwd=ROOT, env=env, check=True, capture_output=True)
+    result = subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'create-token', 'bench'],
+                            cwd=ROOT, env=env, check=True, capture_output=True, text=True)
+    return result.stdout.strip().splitlines()[-1]
+
+
+def form_sender(port, houses):
+    """Clients sharing one logged-in session that post the prediction form"""
+    client = Client(port)
+    client.request('POST', '/login', {
+        'csrf_token': client.csrf('/login'), 'username': 'bench', 'password': 'secret123'})
+    csrf = client.csrf('/predict')
+    forms = [dict(house, csrf_token=csrf) for house in houses]
+
+    def connect():
+        worker = Client(port, client.cookie)
+        return lambda i: worker.request('POST', '/predict', forms[i])[0]
+    return connect
+
+
+def api_sender(port, houses, token):
+    bodies = [json.dumps(house) for house in houses]
+    headers = {'Content-Type': 'application/json', 'Authorization': f'Bearer {token}'}
+
+    def connect():
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+
+        def send(i):
+            conn.request('POST', '/api/v1/predict', bodies[i], headers)
+            response = conn.getresponse()
+            response.read()
+            return response.status
+        return send
+    return connect
+
+
+def load(connect, n, concurrency):
+    latencies = []
+    failures = []
+    lock = threading.Lock()
+    jobs = iter(range(n))
+
+    def run():
+        send = connect()
+        while True:
+            with lock:
+                i = next(jobs, None)
+            if i is None:
+                return
+            start = time.perf_counter()
+            status = send(i)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                if status != 200:
+                    failures.append(status)
+
+    threads = [threading.Thread(target=run) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return n / (time.perf_counter() - start), np.array(latencies) * 1e3, len(failures)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=3000)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--threads', type=int, default=16, help='Gunicorn threads / API inference threads')
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    with contextlib.redirect_stdout(io.StringIO()):
+        model_path = train_artifact(os.path.join(tmp, 'model.joblib'))
+    env = dict(os.environ, WEB_CONCURRENCY='1', GUNICORN_THREADS=str(args.threads),
+               API_INFERENCE_THREADS=str(args.threads), MODEL_PATH=str(model_path),
+               DATABASE_URL=f"sqlite:///{tmp}/bench.db", PREDICTION_CACHE_SIZE='0',
+               FLASK_ENV='production', LOG_LEVEL='WARNING', PYTHONWARNINGS='ignore')
+    houses = make_houses(args.requests)
+    for house in houses:
+        house['parking'] = max(house['parking'], 1)
+
+    # The user and token exist before any server starts
+    token = create_user_and_token(env)
+
+    print(f"{args.requests} predictions, concurrency {args.concurrency}, 1 worker, {args.threads} threads")
+    print(f"{'mode':<10}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for mode in args.modes:
+        if mode == 'api-asgi' and importlib.util.find_spec('uvicorn') is None:
+            print(f"{mode:<10}  skipped: uvicorn is not installed")
+            continue
+        port = free_port()
+        command = server_command(mode) + (['--port', str(port)] if mode == 'api-asgi' else [])
+        server = subprocess.Popen(command, cwd=ROOT, env=dict(env, PORT=str(port)),
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_for(port)
+            if mode == 'form':
+                connect = form_sender(port, houses)
+            else:
+                connect = api_sender(port, houses, token)
+            connect()(0)
+            rate, ms, errors = load(connect, len(houses), args.concurrency)
+        finally:
+            server.terminate()
+            server.wait()
+        print(f"{mode:<10}{rate:>10.1f}{np.percentile(ms, 50):>10.1f}{np.percentile(ms, 99):>10.1f}"
+              f"{errors:>8}")
+
+
+if __name__ == '__main__':
+    main()
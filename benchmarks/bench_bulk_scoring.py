@@ -0,0 +1,63 @@
+"""Rows per second of bulk_scoring.score_file
+
+Writes a synthetic CSV of houses, then scores it with 1, 2 and 4 worker
+processes and reports throughput and peak RSS of the parent process.
+
+    python benchmarks/bench_bulk_scoring.py [--rows 200000] [--chunk-size 10000] [--model forest]
+"""
+import argparse
+import contextlib
+import io
+import os
+import resource
+import sys
+import tempfile
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pandas as pd
+
+from fixtures import make_houses, train_artifact
+
+WORKER_COUNTS = [1, 2, 4]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    parser.add_argument('--model', choices=['linear', 'forest'], default='linear')
+    args = parser.parse_args()
+    warnings.simplefilter('ignore')
+
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        estimator = None
+        if args.model == 'forest':
+            from sklearn.ensemble import RandomForestRegressor
+            estimator = RandomForestRegressor(n_estimators=100, random_state=0)
+        model_path = str(train_artifact(os.path.join(tmp, 'model.joblib'), estimator))
+
+        source = os.path.join(tmp, 'houses.csv')
+        sample = pd.DataFrame(make_houses(10000))
+        for start in range(0, args.rows, len(sample)):
+            sample.iloc[:args.rows - start].to_csv(source, mode='a', header=start == 0, index=False)
+
+        from bulk_scoring import score_file
+
+        results = []
+        for workers in WORKER_COUNTS:
+            stats = score_file(source, os.path.join(tmp, 'scored.csv'), model_path,
+                               args.chunk_size, workers)
+            peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+            results.append((workers, stats, peak_mb))
+
+    print(f"{args.model} model, {args.rows} rows, chunks of {args.chunk_size}")
+    print(f"{'workers':>8}{'seconds':>10}{'rows/s':>12}{'parent peak MB':>16}")
+    for workers, stats, peak_mb in results:
+        print(f"{workers:>8}{stats['seconds']:>10.2f}{stats['rows_per_second']:>12,.0f}{peak_mb:>16.0f}")
+
+
+if __name__ == '__main__':
+    main()
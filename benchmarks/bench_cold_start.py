@@ -0,0 +1,104 @@
+"""Cold start of the web process for each MODEL_LOAD_MODE
+
+For every mode this reports:
+  * wall time of `import app`, plus the heaviest modules imported while
+    doing it according to `python -X importtime`
+  * time from launching a single Gunicorn worker to the first byte of
+    GET / and then GET /login
+
+    python benchmarks/bench_cold_start.py [--runs 3]
+"""
+import argparse
+import os
+import re
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORT_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+MODES = ['eager', 'lazy', 'background']
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def import_wall_time(env):
+    """Seconds spent in `import app`"""
+    code = 'import time; t = time.perf_counter(); import app; print(time.perf_counter() - t)'
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env,
+                            capture_output=True, text=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def heaviest_imports(env, count=4):
+    """Modules imported directly by app.py (or its create_app) with the
+    highest cumulative -X importtime, in ms
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'],
+                            cwd=ROOT, env=env, capture_output=True, text=True)
+    modules = {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        # One space of indent is top level, three is one level below it
+        if match and len(match.group(3)) == 3:
+            modules[match.group(4)] = int(match.group(2)) / 1000
+    return sorted(modules.items(), key=lambda item: -item[1])[:count]
+
+
+def first_byte(url, deadline):
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                response.read(1)
+                return time.time()
+        except OSError:
+            time.sleep(0.005)
+    raise TimeoutError(url)
+
+
+def time_to_first_byte(env):
+    port = free_port()
+    env = dict(env, PORT=str(port), WEB_CONCURRENCY='1', GUNICORN_PRELOAD='false')
+    start = time.time()
+    proc = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+                            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        index = first_byte(f'http://127.0.0.1:{port}/', start + 60) - start
+        login_start = time.time()
+        login = first_byte(f'http://127.0.0.1:{port}/login', login_start + 60) - login_start
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait()
+    return index, login
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base_env = dict(os.environ, PYTHONWARNINGS='ignore',
+                        DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+
+        print(f"{'mode':<12}{'import ms':>10}{'TTFB / ms':>12}{'then /login ms':>16}   heaviest imports")
+        for mode in MODES:
+            env = dict(base_env, MODEL_LOAD_MODE=mode)
+            total = min(import_wall_time(env) for _ in range(args.runs)) * 1000
+            ttfb = [time_to_first_byte(env) for _ in range(args.runs)]
+            index = min(i for i, _ in ttfb) * 1000
+            login = min(l for _, l in ttfb) * 1000
+            heaviest = ', '.join(f'{name} {ms:.0f}' for name, ms in heaviest_imports(env))
+            print(f"{mode:<12}{total:>10.0f}{index:>12.0f}{login:>16.1f}   {heaviest}")
+
+
+if __name__ == '__main__':
+    main()
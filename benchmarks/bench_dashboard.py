@@ -0,0 +1,92 @@
+"""Dashboard query latency for a user with many predictions
+
+Fills a SQLite database with --rows predictions for one user (plus
+another user's rows as noise), backfills user_prediction_stats, then
+times reading the stats row and GET /dashboard against a latency budget.
+
+    python benchmarks/bench_dashboard.py [--rows 1000000] [--budget-ms 300]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from fixtures import SAMPLE_HOUSE
+
+
+def fill(db, Prediction, user_id, rows, other_id):
+    start = datetime(2024, 1, 1)
+    rng = np.random.default_rng(0)
+    prices = rng.uniform(50000, 2000000, rows)
+    chunk = 50000
+    for offset in range(0, rows, chunk):
+        batch = []
+        for i in range(offset, min(offset + chunk, rows)):
+            batch.append(dict(SAMPLE_HOUSE, user_id=user_id if i % 10 else other_id,
+                              predicted_price=float(prices[i]),
+                              prediction_date=start + timedelta(seconds=i)))
+        db.session.execute(db.insert(Prediction), batch)
+        db.session.commit()
+
+
+def timed(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return np.array(timings) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--budget-ms', type=float, default=300.0)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ.update(DATABASE_URL=f"sqlite:///{tmp}/dashboard.db", MODEL_LOAD_MODE='lazy',
+                      LOG_LEVEL='WARNING')
+    from app import create_app
+    from models import db, User, Prediction, UserPredictionStats, rebuild_prediction_stats
+
+    app = create_app('production')
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.app_context():
+        users = [User(username=name, email=f'{name}@example.com') for name in ('bench', 'other')]
+        for user in users:
+            user.set_password('secret123')
+        db.session.add_all(users)
+        db.session.commit()
+        user_id, other_id = users[0].id, users[1].id
+
+        start = time.perf_counter()
+        fill(db, Prediction, user_id, args.rows, other_id)
+        print(f"Inserted {args.rows} predictions in {time.perf_counter() - start:.1f}s "
+              f"({Prediction.query.filter_by(user_id=user_id).count()} for the benchmark user)")
+
+        rebuild = timed(lambda: (rebuild_prediction_stats(), db.session.commit()), 1)
+        summary = timed(lambda: (db.session.get(UserPredictionStats, user_id).summary(),
+                                 db.session.remove()), args.repeat)
+
+    client = app.test_client()
+    client.post('/login', data={'username': 'bench', 'password': 'secret123'})
+    page = timed(lambda: client.get('/dashboard'), args.repeat)
+
+    print(f"{'':<28}{'p50 ms':>10}{'max ms':>10}")
+    print(f"{'rebuild-stats (all users)':<28}{rebuild[0]:>10.1f}{rebuild[0]:>10.1f}")
+    print(f"{'stats row':<28}{np.percentile(summary, 50):>10.1f}{summary.max():>10.1f}")
+    print(f"{'GET /dashboard':<28}{np.percentile(page, 50):>10.1f}{page.max():>10.1f}")
+    verdict = 'within' if page.max() <= args.budget_ms else 'OVER'
+    print(f"Slowest dashboard request {verdict} the {args.budget_ms:.0f} ms budget")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""Worker boot time and memory with and without preload_app
+
+Starts Gunicorn with gunicorn.conf.py on a synthetic random forest,
+waits for every worker to log that it booted, then reads RSS, PSS and
+private memory of each worker from /proc (Linux only).
+
+    python benchmarks/bench_gunicorn_boot.py [--workers 4] [--trees 300]
+"""
+import argparse
+import os
+import re
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BOOTED = re.compile(r'Worker (\d+) booted in ([\d.]+)s')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def memory_kb(pid):
+    """RSS, PSS and private (unshared) memory of a process in kB"""
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                fields[parts[0].rstrip(':')] = int(parts[1])
+    private = fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)
+    return fields['Rss'], fields['Pss'], private
+
+
+def run(preload, workers, env):
+    env = dict(env, GUNICORN_PRELOAD='true' if preload else 'false',
+               WEB_CONCURRENCY=str(workers), PORT=str(free_port()))
+    start = time.time()
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+    )
+    boots = {}
+    try:
+        for line in proc.stderr:
+            match = BOOTED.search(line)
+            if match:
+                boots[int(match.group(1))] = float(match.group(2))
+                if len(boots) == workers:
+                    break
+        ready = time.time() - start
+        time.sleep(1)
+        memory = [memory_kb(pid) for pid in boots]
+        master = memory_kb(proc.pid)
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait()
+    return ready, list(boots.values()), memory, master
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--trees', type=int, default=300)
+    args = parser.parse_args()
+
+    from sklearn.ensemble import RandomForestRegressor
+    from fixtures import train_artifact
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = train_artifact(os.path.join(tmp, 'model.joblib'),
+                                    RandomForestRegressor(n_estimators=args.trees, random_state=0),
+                                    n=2000)
+        size_mb = os.path.getsize(model_path) / 1e6
+        env = dict(os.environ, MODEL_PATH=str(model_path), PYTHONWARNINGS='ignore',
+                   DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+
+        print(f"{args.workers} workers, {args.trees}-tree forest ({size_mb:.1f} MB artifact)")
+        print(f"{'preload':<10}{'all ready s':>12}{'worker boot s':>15}"
+              f"{'RSS MB':>10}{'PSS MB':>10}{'private MB':>12}")
+        for preload in (False, True):
+            ready, boots, memory, master = run(preload, args.workers, env)
+            rss, pss, private = (sum(m[i] for m in memory) / len(memory) / 1024 for i in range(3))
+            print(f"{str(preload):<10}{ready:>12.2f}{sum(boots) / len(boots):>15.3f}"
+                  f"{rss:>10.1f}{pss:>10.1f}{private:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
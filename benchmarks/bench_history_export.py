@@ -0,0 +1,87 @@
+"""Peak memory and time of /history/export.* as a user's history grows
+
+For each size in --rows, grows one user's history in a SQLite database
+to that many rows (reusing bench_dashboard.fill), then downloads the CSV
+and JSON Lines exports through the test client while tracemalloc records
+the peak Python allocation. For comparison it also times the naive export, every
+Prediction loaded and passed through to_dict. Streaming should keep the
+peak flat while the naive export grows with the row count.
+
+    python benchmarks/bench_history_export.py [--rows 20000 200000]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_dashboard import fill
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = fn()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak / 2 ** 20, size
+
+
+def download(client, path):
+    # Consume the stream chunk by chunk, like a client writing to disk
+    response = client.get(path, buffered=False)
+    size = sum(len(chunk) for chunk in response.response)
+    response.close()
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[20000, 200000])
+    args = parser.parse_args()
+
+    os.environ.update(DATABASE_URL=f"sqlite:///{tempfile.mkdtemp()}/export.db", MODEL_LOAD_MODE='lazy',
+                      LOG_LEVEL='WARNING')
+    from app import create_app
+    from models import db, User, Prediction
+
+    app = create_app('production')
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.app_context():
+        user = User(username='bench', email='bench@example.com')
+        user.set_password('secret123')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+    client = app.test_client()
+    client.post('/login', data={'username': 'bench', 'password': 'secret123'})
+
+    def naive():
+        predictions = Prediction.query.filter_by(user_id=user_id).all()
+        size = len(json.dumps([p.to_dict() for p in predictions]))
+        db.session.remove()
+        return size
+
+    print(f"{'rows':>8}  {'export':<20}{'seconds':>10}{'peak MiB':>10}{'MiB out':>10}")
+    filled = 0
+    for rows in sorted(args.rows):
+        with app.app_context():
+            # Grow the same user's history; every row belongs to them
+            fill(db, Prediction, user_id, rows - filled, user_id)
+            filled = rows
+            results = [('to_dict list', measure(naive))]
+        for fmt in ('csv', 'jsonl'):
+            results.append((f'stream .{fmt}', measure(lambda: download(client, f'/history/export.{fmt}'))))
+
+        for name, (seconds, peak, size) in results:
+            print(f"{rows:>8}  {name:<20}{seconds:>10.2f}{peak:>10.1f}{size / 2 ** 20:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
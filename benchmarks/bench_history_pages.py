@@ -0,0 +1,93 @@
+"""OFFSET vs keyset pagination of /history for a user with millions of rows
+
+Fills a SQLite database like bench_dashboard.py, then times fetching
+page 1 and a deep page with the old .paginate() (OFFSET plus COUNT(*))
+and with pagination.keyset_page (cursor seek, count served from cache).
+
+    python benchmarks/bench_history_pages.py [--rows 2000000] [--page 5000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from bench_dashboard import fill, timed
+
+PER_PAGE = 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=2000000)
+    parser.add_argument('--page', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ.update(DATABASE_URL=f"sqlite:///{tmp}/history.db", MODEL_LOAD_MODE='lazy',
+                      LOG_LEVEL='WARNING')
+    from app import create_app
+    from models import db, User, Prediction
+    from pagination import NEXT, encode_cursor, keyset_page
+
+    app = create_app('production')
+    with app.app_context():
+        users = [User(username=name, email=f'{name}@example.com') for name in ('bench', 'other')]
+        for user in users:
+            user.set_password('secret123')
+        db.session.add_all(users)
+        db.session.commit()
+        user_id = users[0].id
+        fill(db, Prediction, user_id, args.rows, users[1].id)
+
+        query = Prediction.query.filter_by(user_id=user_id)
+        ordered = query.order_by(Prediction.prediction_date.desc(), Prediction.id.desc())
+        # Cursor a user would hold after clicking Next page - 1 times
+        boundary = ordered.offset((args.page - 1) * PER_PAGE - 1).first()
+        deep_cursor = encode_cursor(boundary, NEXT)
+        total = query.count()
+        print(f"{total} predictions for the benchmark user, {total // PER_PAGE} pages")
+
+        def offset_page(page):
+            def fetch():
+                ordered.paginate(page=page, per_page=PER_PAGE, error_out=False).items
+                db.session.remove()
+            return fetch
+
+        def offset_only(page):
+            def fetch():
+                ordered.offset((page - 1) * PER_PAGE).limit(PER_PAGE).all()
+                db.session.remove()
+            return fetch
+
+        def seek_page(cursor):
+            def fetch():
+                keyset_page(query, Prediction, cursor, PER_PAGE).items
+                db.session.remove()
+            return fetch
+
+        deep_offset = offset_page(args.page)
+        deep_seek = seek_page(deep_cursor)
+        assert [p.id for p in ordered.paginate(page=args.page, per_page=PER_PAGE).items] == \
+            [p.id for p in keyset_page(query, Prediction, deep_cursor, PER_PAGE).items]
+
+        results = [
+            ('OFFSET + COUNT, page 1', timed(offset_page(1), args.repeat)),
+            (f'OFFSET + COUNT, page {args.page}', timed(deep_offset, args.repeat)),
+            ('OFFSET only, page 1', timed(offset_only(1), args.repeat)),
+            (f'OFFSET only, page {args.page}', timed(offset_only(args.page), args.repeat)),
+            ('keyset, page 1', timed(seek_page(None), args.repeat)),
+            (f'keyset, page {args.page}', timed(deep_seek, args.repeat)),
+        ]
+
+    print(f"{'':<28}{'p50 ms':>10}{'max ms':>10}")
+    for name, ms in results:
+        print(f"{name:<28}{np.percentile(ms, 50):>10.2f}{ms.max():>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""Mixed page and prediction traffic per inference backend
+
+Serves the app from Gunicorn (one worker, --threads threads) with a
+heavy random forest, once per --backends entry (MODEL_INFERENCE_BACKEND).
+For --seconds, --page-clients threads load the login page while
+--predict-clients threads post houses to /api/v1/predict. Reports
+requests/s and latency percentiles for each kind of traffic, and how
+many predictions came from the fallback formula (inference timeouts).
+
+    python benchmarks/bench_inference_backend.py [--seconds 10] [--processes 2] [--timeout-ms 1000]
+"""
+import argparse
+import contextlib
+import http.client
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+
+from bench_api import create_user_and_token
+from bench_predict_logging import free_port, wait_for
+from fixtures import make_houses, train_artifact
+
+
+def traffic(port, n_clients, send, seconds):
+    """Run n_clients threads calling send(conn, i) for seconds; returns (rate, ms, flagged)"""
+    latencies = []
+    flagged = []
+    lock = threading.Lock()
+    stop = time.perf_counter() + seconds
+
+    def run(offset):
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        mine, marks, i = [], 0, offset
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            marks += send(conn, i)
+            mine.append(time.perf_counter() - start)
+            i += n_clients
+        with lock:
+            latencies.extend(mine)
+            flagged.append(marks)
+
+    threads = [threading.Thread(target=run, args=(k,)) for k in range(n_clients)]
+    for t in threads:
+        t.start()
+    return threads, lambda: (len(latencies) / seconds, np.array(latencies) * 1e3, sum(flagged))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backends', nargs='+', choices=['local', 'process'], default=['local', 'process'])
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--threads', type=int, default=8, help='Gunicorn threads')
+    parser.add_argument('--page-clients', type=int, default=4)
+    parser.add_argument('--predict-clients', type=int, default=8)
+    parser.add_argument('--processes', type=int, default=2, help='MODEL_INFERENCE_PROCESSES')
+    parser.add_argument('--timeout-ms', type=float, default=1000)
+    parser.add_argument('--trees', type=int, default=300)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    forest = RandomForestRegressor(n_estimators=args.trees, max_depth=12, random_state=0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        model_path = train_artifact(os.path.join(tmp, 'model.joblib'), forest, n=2000)
+    env = dict(os.environ, WEB_CONCURRENCY='1', GUNICORN_THREADS=str(args.threads),
+               MODEL_PATH=str(model_path), DATABASE_URL=f"sqlite:///{tmp}/bench.db",
+               PREDICTION_CACHE_SIZE='0', MODEL_INFERENCE_PROCESSES=str(args.processes),
+               MODEL_INFERENCE_TIMEOUT_MS=str(args.timeout_ms), FLASK_ENV='production',
+               LOG_LEVEL='WARNING', PYTHONWARNINGS='ignore')
+    token = create_user_and_token(env)
+    bodies = [json.dumps(house) for house in make_houses(5000)]
+    headers = {'Content-Type': 'application/json', 'Authorization': f'Bearer {token}'}
+
+    def page(conn, i):
+        conn.request('GET', '/login')
+        response = conn.getresponse()
+        response.read()
+        return response.status != 200
+
+    def predict(conn, i):
+        conn.request('POST', '/api/v1/predict', bodies[i % len(bodies)], headers)
+        response = conn.getresponse()
+        body = json.loads(response.read())
+        return response.status != 200 or body.get('fallback') is not None
+
+    print(f"RandomForest {args.trees} trees, {args.seconds:g}s, 1 worker x {args.threads} threads, "
+          f"{args.page_clients} page + {args.predict_clients} predict clients")
+    print(f"{'backend':<9}{'page/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'predict/s':>11}{'p50 ms':>9}"
+          f"{'p99 ms':>9}{'fallback':>10}")
+    for backend in args.backends:
+        port = free_port()
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'], cwd=ROOT,
+            env=dict(env, PORT=str(port), MODEL_INFERENCE_BACKEND=backend),
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_for(port)
+            # The first prediction starts the inference processes in the
+            # background; wait until the model answers instead of the fallback
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+            page(conn, 0)
+            deadline = time.perf_counter() + 120
+            while predict(conn, 0) and time.perf_counter() < deadline:
+                time.sleep(0.5)
+            page_threads, page_result = traffic(port, args.page_clients, page, args.seconds)
+            predict_threads, predict_result = traffic(port, args.predict_clients, predict, args.seconds)
+            for t in page_threads + predict_threads:
+                t.join()
+        finally:
+            server.terminate()
+            server.wait()
+        page_rate, page_ms, _ = page_result()
+        predict_rate, predict_ms, fallbacks = predict_result()
+        print(f"{backend:<9}{page_rate:>9.1f}{np.percentile(page_ms, 50):>9.1f}"
+              f"{np.percentile(page_ms, 99):>9.1f}{predict_rate:>11.1f}{np.percentile(predict_ms, 50):>9.1f}"
+              f"{np.percentile(predict_ms, 99):>9.1f}{fallbacks:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Login throughput per password hash cost, and the user_loader cache
+
+Signs up users in a SQLite database, then measures through the test
+client:
+
+- POST /login per second for each method in --methods (the stored hashes
+  are rehashed to the method on the first login, which is not timed)
+- authenticated GET / per second with the user cache off and on, which is
+  the user_loader cost paid by every logged-in request
+
+    python benchmarks/bench_login.py [--logins 50] [--requests 2000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEFAULT_METHODS = ['pbkdf2:sha256:600000', 'pbkdf2:sha256:100000', 'scrypt:32768:8:1',
+                   'scrypt:16384:8:1']
+
+
+def per_second(fn, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return n / (time.perf_counter() - start)
+
+
+def login(client):
+    response = client.post('/login', data={'username': 'bench', 'password': 'secret123'})
+    assert response.status_code == 302, response.status_code
+    client.get('/logout')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--methods', nargs='+', default=DEFAULT_METHODS)
+    parser.add_argument('--logins', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    os.environ.update(DATABASE_URL=f"sqlite:///{tempfile.mkdtemp()}/login.db", MODEL_LOAD_MODE='lazy',
+                      LOG_LEVEL='WARNING', METRICS_ENABLED='false')
+    from app import create_app
+    from config import config
+    from models import db, User
+
+    results = []
+    for cache_size in (0, 10000):
+        config['production'].USER_CACHE_SIZE = cache_size
+        app = create_app('production')
+        app.config['WTF_CSRF_ENABLED'] = False
+        with app.app_context():
+            if User.query.filter_by(username='bench').first() is None:
+                user = User(username='bench', email='bench@example.com')
+                user.set_password('secret123')
+                db.session.add(user)
+                db.session.commit()
+        client = app.test_client()
+
+        if cache_size == 0:
+            for method in args.methods:
+                app.config['PASSWORD_HASH_METHOD'] = method
+                login(client)
+                results.append((f'POST /login  {method}', per_second(lambda: login(client), args.logins)))
+
+        client.post('/login', data={'username': 'bench', 'password': 'secret123'})
+        label = 'on' if cache_size else 'off'
+        results.append((f'GET /  user cache {label}', per_second(lambda: client.get('/'), args.requests)))
+
+    print(f"{'':<40}{'req/s':>10}")
+    for name, rate in results:
+        print(f"{name:<40}{rate:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
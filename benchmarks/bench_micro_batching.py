@@ -0,0 +1,99 @@
+"""Throughput versus p99 latency of the micro-batcher per batch window
+
+Many client threads call predict_price on one predictor at once, the
+way threaded Gunicorn workers do, first without the micro-batcher and
+then with each --windows setting (milliseconds). Reports requests/s,
+p50/p99 latency and the average number of houses scored per model call.
+The prediction cache is off, so every request reaches the model.
+
+    python benchmarks/bench_micro_batching.py [--model forest] [--threads 32] [--requests 4000]
+"""
+import argparse
+import contextlib
+import io
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+
+from fixtures import make_houses, train_artifact
+
+MODELS = {
+    'linear': lambda: None,
+    'forest': lambda: RandomForestRegressor(n_estimators=100, max_depth=10, random_state=0),
+    'boosting': lambda: GradientBoostingRegressor(n_estimators=200, max_depth=4, random_state=0),
+}
+
+
+def run(predictor, houses, n_threads):
+    latencies = []
+    lock = threading.Lock()
+    jobs = iter(range(len(houses)))
+
+    def client():
+        mine = []
+        while True:
+            with lock:
+                i = next(jobs, None)
+            if i is None:
+                break
+            start = time.perf_counter()
+            predictor.predict_price(houses[i])
+            mine.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=client) for _ in range(n_threads)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return len(houses) / (time.perf_counter() - start), np.array(latencies) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model', choices=sorted(MODELS), default='forest')
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=4000)
+    parser.add_argument('--max-batch', type=int, default=32)
+    parser.add_argument('--windows', type=float, nargs='+', default=[0.5, 1, 2, 5, 10])
+    args = parser.parse_args()
+
+    warnings.simplefilter('ignore')
+    logging.disable(logging.WARNING)
+    from metrics import MICRO_BATCH_SIZE
+    from ml_model import HousePricePredictor
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        path = train_artifact(os.path.join(tempfile.mkdtemp(), 'model.joblib'), MODELS[args.model](), n=1000)
+    predictor = HousePricePredictor(str(path))
+    houses = make_houses(args.requests, seed=11)
+    sizes = MICRO_BATCH_SIZE.labels()
+
+    print(f"{args.model} model, {args.threads} client threads, {args.requests} requests, "
+          f"max batch {args.max_batch}")
+    print(f"{'window ms':>10}{'req/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'avg batch':>11}")
+    for window in [0] + args.windows:
+        predictor.configure(batch_window=window / 1000.0, max_batch=args.max_batch)
+        run(predictor, houses[:200], args.threads)
+        calls, total = sum(sizes.counts), sizes.total
+        rate, ms = run(predictor, houses, args.threads)
+        batches = sum(sizes.counts) - calls
+        avg = (sizes.total - total) / batches if batches else 1.0
+        label = f"{window:g}" if window else 'off'
+        print(f"{label:>10}{rate:>10.0f}{np.percentile(ms, 50):>9.2f}{np.percentile(ms, 99):>9.2f}"
+              f"{avg:>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
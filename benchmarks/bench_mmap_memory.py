@@ -0,0 +1,81 @@
+"""Per-worker memory of a 500-tree forest with and without mmap
+
+Starts several worker processes that each load the model with
+HousePricePredictor, make one prediction and wait, then reads their
+RSS, PSS and private memory from /proc (Linux only). Compares the plain
+sklearn artifact with the flat-array artifact from save_model_artifact,
+each loaded normally and with mmap_mode='r'.
+
+    python benchmarks/bench_mmap_memory.py [--workers 4] [--trees 500]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_gunicorn_boot import memory_kb
+
+WORKER = '''
+import sys, contextlib, io
+with contextlib.redirect_stdout(io.StringIO()):
+    from ml_model import HousePricePredictor
+    from benchmarks.fixtures import SAMPLE_HOUSE
+    predictor = HousePricePredictor(sys.argv[1], mmap_mode=sys.argv[2] or None)
+    price, error = predictor.predict_price(SAMPLE_HOUSE)
+assert error is None, error
+print('ready', flush=True)
+sys.stdin.read()
+'''
+
+
+def measure(path, mmap_mode, workers):
+    env = dict(os.environ, PYTHONWARNINGS='ignore')
+    procs = [subprocess.Popen([sys.executable, '-c', WORKER, path, mmap_mode or ''], cwd=ROOT,
+                              env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+             for _ in range(workers)]
+    try:
+        for proc in procs:
+            assert proc.stdout.readline().strip() == 'ready'
+        memory = [memory_kb(proc.pid) for proc in procs]
+    finally:
+        for proc in procs:
+            proc.stdin.close()
+            proc.wait()
+    return [sum(m[i] for m in memory) / len(memory) / 1024 for i in range(3)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--trees', type=int, default=500)
+    args = parser.parse_args()
+
+    import joblib
+    from sklearn.ensemble import RandomForestRegressor
+    from fixtures import train_artifact
+    from ml_model import save_model_artifact
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sklearn_path = train_artifact(os.path.join(tmp, 'sklearn.joblib'),
+                                      RandomForestRegressor(n_estimators=args.trees, random_state=0),
+                                      n=2000)
+        flat_path = save_model_artifact(os.path.join(tmp, 'flat.joblib'), joblib.load(sklearn_path))
+
+        print(f"{args.workers} workers, {args.trees}-tree forest "
+              f"(sklearn {os.path.getsize(sklearn_path) / 1e6:.1f} MB, "
+              f"flat {os.path.getsize(flat_path) / 1e6:.1f} MB)")
+        print(f"{'artifact':<22}{'RSS MB':>10}{'PSS MB':>10}{'private MB':>12}")
+        for label, path, mmap_mode in [('sklearn', sklearn_path, None),
+                                       ('sklearn, mmap', sklearn_path, 'r'),
+                                       ('flat', flat_path, None),
+                                       ('flat, mmap', flat_path, 'r')]:
+            rss, pss, private = measure(path, mmap_mode, args.workers)
+            print(f"{label:<22}{rss:>10.1f}{pss:>10.1f}{private:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Per-request latency of HousePricePredictor.predict_price
+
+Compares the pandas path, the compiled preprocessing plan and the folded
+linear kernel on a synthetic model shaped like the shipped one.
+
+    python benchmarks/bench_predict_latency.py [--requests 2000]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from fixtures import make_houses, train_artifact
+from ml_model import HousePricePredictor
+
+
+def measure(predict, houses):
+    timings = []
+    for house in houses:
+        start = time.perf_counter()
+        predict(house)
+        timings.append(time.perf_counter() - start)
+    timings = np.array(timings) * 1e6
+    return np.percentile(timings, 50), np.percentile(timings, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = train_artifact(os.path.join(tmp, 'model.joblib'))
+        with contextlib.redirect_stdout(io.StringIO()):
+            predictor = HousePricePredictor(path)
+
+    houses = make_houses(args.requests)
+    plan, linear = predictor._plan, predictor._linear
+
+    predictor._plan = predictor._linear = None
+    legacy = measure(predictor.predict_price, houses)
+    predictor._plan = plan
+    compiled = measure(predictor.predict_price, houses)
+    predictor._linear = linear
+    folded = measure(predictor.predict_price, houses)
+    preprocess = measure(plan.transform, houses)
+
+    print(f"{'path':<28}{'p50 us':>10}{'p99 us':>10}")
+    print(f"{'predict_price (pandas)':<28}{legacy[0]:>10.1f}{legacy[1]:>10.1f}")
+    print(f"{'predict_price (compiled)':<28}{compiled[0]:>10.1f}{compiled[1]:>10.1f}")
+    print(f"{'predict_price (folded)':<28}{folded[0]:>10.1f}{folded[1]:>10.1f}")
+    print(f"{'plan.transform only':<28}{preprocess[0]:>10.1f}{preprocess[1]:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""/predict throughput under Gunicorn at high concurrency
+
+Starts Gunicorn (one worker, GUNICORN_THREADS threads) with its output
+unbuffered and redirected to a file, like a platform log collector,
+signs up a user and then posts the prediction form from many client
+threads at once. Reports requests/s, latency percentiles and how many
+bytes of log output the requests produced.
+
+Run it against another checkout with --tree to compare revisions, e.g.
+one before and one after a logging change:
+
+    python benchmarks/bench_predict_logging.py [--tree PATH] [--requests 3000] [--concurrency 32]
+"""
+import argparse
+import contextlib
+import http.client
+import io
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+
+from fixtures import make_houses, train_artifact
+
+CSRF = re.compile(r'name="csrf_token" type="hidden" value="([^"]+)"')
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class Client:
+    """Keep-alive HTTP client that carries the session cookie"""
+
+    def __init__(self, port, cookie=None):
+        self.conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        self.cookie = cookie
+
+    def request(self, method, path, form=None):
+        headers = {'Cookie': self.cookie} if self.cookie else {}
+        body = None
+        if form is not None:
+            body = urllib.parse.urlencode(form)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        self.conn.request(method, path, body, headers)
+        response = self.conn.getresponse()
+        text = response.read().decode()
+        cookies = [v.split(';')[0] for k, v in response.getheaders() if k.lower() == 'set-cookie']
+        session = [c for c in cookies if c.startswith('session=')]
+        if session:
+            self.cookie = session[0]
+        return response.status, text
+
+    def csrf(self, path):
+        return CSRF.search(self.request('GET', path)[1]).group(1)
+
+
+def wait_for(port, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        with contextlib.suppress(OSError), socket.create_connection(('127.0.0.1', port), 0.5):
+            return
+        time.sleep(0.2)
+    raise RuntimeError('Gunicorn did not start')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tree', default=ROOT, help='Checkout to serve (default: this one)')
+    parser.add_argument('--requests', type=int, default=3000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--threads', type=int, default=16, help='Gunicorn threads')
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    with contextlib.redirect_stdout(io.StringIO()):
+        model_path = train_artifact(os.path.join(tmp, 'model.joblib'))
+    log_path = os.path.join(tmp, 'gunicorn.log')
+    port = free_port()
+    env = dict(os.environ, PORT=str(port), WEB_CONCURRENCY='1', GUNICORN_THREADS=str(args.threads),
+               MODEL_PATH=str(model_path), DATABASE_URL=f"sqlite:///{tmp}/bench.db",
+               PREDICTION_CACHE_SIZE='0', FLASK_ENV='production', PYTHONUNBUFFERED='1',
+               PYTHONWARNINGS='ignore')
+    with open(log_path, 'w') as log:
+        server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+                                  cwd=args.tree, env=env, stdout=log, stderr=subprocess.STDOUT)
+    try:
+        wait_for(port)
+        client = Client(port)
+        client.request('POST', '/signup', {
+            'csrf_token': client.csrf('/signup'), 'username': 'bench', 'email': 'bench@example.com',
+            'first_name': 'Bench', 'last_name': 'User', 'password': 'secret123',
+            'confirm_password': 'secret123'})
+        client.request('POST', '/login', {
+            'csrf_token': client.csrf('/login'), 'username': 'bench', 'password': 'secret123'})
+        token = client.csrf('/predict')
+
+        forms = []
+        for house in make_houses(args.requests):
+            house['parking'] = max(house['parking'], 1)
+            forms.append(dict(house, csrf_token=token))
+
+        # Warm up, then measure from a clean log
+        status, _ = client.request('POST', '/predict', forms[0])
+        assert status == 200, status
+        time.sleep(0.5)
+        log_start = os.path.getsize(log_path)
+
+        latencies = []
+        failures = []
+        lock = threading.Lock()
+        next_form = iter(range(len(forms)))
+
+        def run():
+            worker = Client(port, client.cookie)
+            while True:
+                with lock:
+                    i = next(next_form, None)
+                if i is None:
+                    return
+                start = time.perf_counter()
+                status, _ = worker.request('POST', '/predict', forms[i])
+                elapsed = time.perf_counter() - start
+                with lock:
+                    latencies.append(elapsed)
+                    if status != 200:
+                        failures.append(status)
+
+        threads = [threading.Thread(target=run) for _ in range(args.concurrency)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        total = time.perf_counter() - start
+        time.sleep(0.5)
+        log_bytes = os.path.getsize(log_path) - log_start
+    finally:
+        server.terminate()
+        server.wait()
+
+    ms = np.array(latencies) * 1e3
+    print(f"{args.requests} POST /predict, concurrency {args.concurrency}, "
+          f"1 worker x {args.threads} threads, tree {args.tree}")
+    print(f"{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}{'log bytes/req':>15}")
+    print(f"{len(latencies) / total:>10.1f}{np.percentile(ms, 50):>10.1f}{np.percentile(ms, 99):>10.1f}"
+          f"{len(failures):>8}{log_bytes / len(latencies):>15.1f}")
+
+
+if __name__ == '__main__':
+    main()
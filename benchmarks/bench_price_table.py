@@ -0,0 +1,82 @@
+"""Memory, build time and predict_price latency of ml_model.PriceTable
+
+Trains a few models of different shapes on the synthetic houses from
+fixtures.py, loads each with and without price_table, and reports the table
+layout and size, how long building it added to the load, single-house
+predict_price latency both ways, and the largest difference between the
+two over --houses random houses.
+
+    python benchmarks/bench_price_table.py [--houses 5000] [--max-cells 2000000]
+"""
+import argparse
+import contextlib
+import io
+import logging
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+from sklearn.tree import DecisionTreeRegressor
+
+from fixtures import make_houses, train_artifact
+
+MODELS = {
+    'LinearRegression': None,
+    'GBM stumps (depth 1)': GradientBoostingRegressor(max_depth=1, n_estimators=100, random_state=0),
+    'DecisionTree depth 6': DecisionTreeRegressor(max_depth=6, random_state=0),
+    'DecisionTree depth 8': DecisionTreeRegressor(max_depth=8, random_state=0),
+    'RandomForest 50x6': RandomForestRegressor(n_estimators=50, max_depth=6, random_state=0),
+}
+
+
+def load(path, **options):
+    from ml_model import HousePricePredictor
+
+    start = time.perf_counter()
+    predictor = HousePricePredictor(path, **options)
+    return predictor, time.perf_counter() - start
+
+
+def per_call_us(predictor, houses):
+    start = time.perf_counter()
+    for house in houses:
+        predictor.predict_price(house)
+    return (time.perf_counter() - start) / len(houses) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--houses', type=int, default=5000)
+    parser.add_argument('--max-cells', type=int, default=2000000)
+    args = parser.parse_args()
+
+    warnings.simplefilter('ignore')
+    logging.disable(logging.INFO)
+    tmp = tempfile.mkdtemp()
+    houses = make_houses(args.houses, seed=7)
+
+    print(f"{'model':<22}{'table':>10}{'MiB':>7}{'build s':>9}{'model us':>10}{'table us':>10}"
+          f"{'max |diff|':>12}")
+    for name, estimator in MODELS.items():
+        with contextlib.redirect_stdout(io.StringIO()):
+            path = train_artifact(os.path.join(tmp, f'{len(os.listdir(tmp))}.joblib'), estimator, n=1000)
+        plain, plain_load = load(path)
+        tabled, tabled_load = load(path, price_table=True, price_table_max_cells=args.max_cells)
+        table = tabled._table
+
+        plain_us = per_call_us(plain, houses)
+        table_us = per_call_us(tabled, houses)
+        diff = max(abs(tabled.predict_price(h)[0] - plain.predict_price(h)[0]) for h in houses)
+        kind = table.kind if table is not None else '-'
+        size = f"{table.nbytes / 2 ** 20:.1f}" if table is not None else '-'
+        print(f"{name:<22}{kind:>10}{size:>7}{tabled_load - plain_load:>9.2f}{plain_us:>10.1f}"
+              f"{table_us:>10.1f}{diff:>12.2g}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Hit rate and latency of per-worker vs shared prediction caches
+
+Spawns several worker processes that each load the model and serve a
+slice of one Zipf-distributed request stream, the way Gunicorn workers
+split traffic. Every worker runs once with its own in-process LRU and
+once against the shared SQLite cache.
+
+    python benchmarks/bench_shared_cache.py [--workers 4] [--model forest]
+"""
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from fixtures import make_houses, train_artifact
+
+
+def worker(model_path, backend, cache_path, cache_size, houses, results):
+    from ml_model import HousePricePredictor
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        predictor = HousePricePredictor(model_path)
+        predictor.configure(cache_size=cache_size, cache_backend=backend, cache_path=cache_path)
+
+        timings = []
+        for house in houses:
+            start = time.perf_counter()
+            predictor.predict_price(house)
+            timings.append(time.perf_counter() - start)
+
+    stats = predictor.cache_stats() or {'hits': 0, 'misses': len(houses)}
+    results.put((timings, stats['hits'], stats['misses']))
+
+
+def run(model_path, backend, workers, cache_size, stream):
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = os.path.join(tmp, 'cache.sqlite')
+        results = multiprocessing.Queue()
+        procs = [
+            multiprocessing.Process(target=worker, args=(
+                model_path, backend, cache_path, cache_size, stream[i::workers], results))
+            for i in range(workers)
+        ]
+        for proc in procs:
+            proc.start()
+        collected = [results.get() for _ in procs]
+        for proc in procs:
+            proc.join()
+
+    timings = np.concatenate([t for t, _, _ in collected]) * 1e6
+    hits = sum(h for _, h, _ in collected)
+    misses = sum(m for _, _, m in collected)
+    return hits / (hits + misses), np.percentile(timings, 50), np.percentile(timings, 99), timings.mean()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--distinct', type=int, default=5000, help='distinct houses in the stream')
+    parser.add_argument('--cache-size', type=int, default=1000, help='entries per cache')
+    parser.add_argument('--model', choices=['linear', 'forest'], default='linear')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    pool = make_houses(args.distinct)
+    ranks = np.minimum(rng.zipf(1.2, args.requests), args.distinct) - 1
+    stream = [pool[i] for i in ranks]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        estimator = None
+        if args.model == 'forest':
+            from sklearn.ensemble import RandomForestRegressor
+            estimator = RandomForestRegressor(n_estimators=100, max_depth=10, random_state=0)
+        model_path = train_artifact(os.path.join(tmp, 'model.joblib'), estimator)
+
+        print(f"{args.workers} workers, {args.requests} requests, {args.distinct} distinct houses, "
+              f"{args.model} model, cache size {args.cache_size}")
+        print(f"{'cache':<22}{'hit rate':>10}{'p50 us':>10}{'p99 us':>10}{'mean us':>10}")
+        for label, backend in [('none', 'none'), ('per-worker LRU', 'memory'), ('shared SQLite', 'sqlite')]:
+            hit_rate, p50, p99, mean = run(model_path, backend, args.workers, args.cache_size, stream)
+            print(f"{label:<22}{hit_rate:>10.1%}{p50:>10.1f}{p99:>10.1f}{mean:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
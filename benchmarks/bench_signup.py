@@ -0,0 +1,111 @@
+"""Concurrent signup load test: correctness and queries per signup
+
+Serves the app from a threaded Werkzeug server in this process, then
+posts --signups signup forms from --concurrency client threads. Each
+username is tried by --contenders clients at the same moment. Reports
+the outcomes, whether exactly one user per username exists afterwards,
+and how many SELECTs on users each signup issued (counted with an
+engine event).
+
+Point --tree at another checkout to compare revisions:
+
+    python benchmarks/bench_signup.py [--tree PATH] [--signups 400] [--concurrency 16]
+"""
+import argparse
+import collections
+import http.client
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tree', default=ROOT, help='Checkout to import the app from (default: this one)')
+    parser.add_argument('--signups', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--contenders', type=int, default=2, help='Clients racing for each username')
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.abspath(args.tree))
+    # A cheap hash, so the database work is what gets compared
+    os.environ.update(DATABASE_URL=f"sqlite:///{tempfile.mkdtemp()}/signup.db", MODEL_LOAD_MODE='lazy',
+                      LOG_LEVEL='WARNING', PASSWORD_HASH_METHOD='pbkdf2:sha256:1000')
+    from sqlalchemy import event
+    from werkzeug.serving import make_server
+    from app import create_app
+    from models import db, User
+
+    app = create_app('production')
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.app_context():
+        engine = db.engine
+    user_selects = collections.Counter()
+
+    def count(conn, cursor, statement, *_):
+        if statement.startswith('SELECT') and 'FROM users' in statement:
+            user_selects['select'] += 1
+
+    event.listen(engine, 'before_cursor_execute', count)
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_port
+
+    outcomes = collections.Counter()
+    lock = threading.Lock()
+    jobs = iter(range(args.signups))
+
+    def run():
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        while True:
+            with lock:
+                i = next(jobs, None)
+            if i is None:
+                return
+            name = f'user{i // args.contenders}'
+            body = urllib.parse.urlencode({
+                'username': name, 'email': f'{name}@example.com', 'first_name': 'Load',
+                'last_name': 'Test', 'password': 'secret123', 'confirm_password': 'secret123'})
+            conn.request('POST', '/signup', body, {'Content-Type': 'application/x-www-form-urlencoded'})
+            response = conn.getresponse()
+            response.read()
+            outcome = {302: 'created', 200: 'rejected'}.get(response.status, f'HTTP {response.status}')
+            with lock:
+                outcomes[outcome] += 1
+
+    threads = [threading.Thread(target=run) for _ in range(args.concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    seconds = time.perf_counter() - start
+    server.shutdown()
+
+    with app.app_context():
+        users = User.query.count()
+        duplicates = db.session.query(User.username).group_by(User.username)\
+            .having(db.func.count() > 1).count()
+    expected = -(-args.signups // args.contenders)
+
+    print(f"{args.signups} signups, {args.contenders} per username, concurrency {args.concurrency}, "
+          f"tree {args.tree}")
+    print(f"{'signups/s':>10}{'created':>9}{'rejected':>10}{'errors':>8}{'users':>7}{'expected':>10}"
+          f"{'user SELECTs/signup':>21}")
+    errors = sum(n for outcome, n in outcomes.items() if outcome.startswith('HTTP'))
+    print(f"{args.signups / seconds:>10.1f}{outcomes['created']:>9}{outcomes['rejected']:>10}{errors:>8}"
+          f"{users:>7}{expected:>10}{user_selects['select'] / args.signups:>21.2f}")
+    if users != expected or duplicates:
+        print("FAILED: user rows do not match the distinct usernames")
+
+
+if __name__ == '__main__':
+    main()
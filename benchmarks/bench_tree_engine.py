@@ -0,0 +1,69 @@
+"""TreeEnsembleEngine vs sklearn predict on a synthetic forest
+
+Times model.predict of the sklearn ensemble and of the flattened engine
+on already scaled inputs for batch sizes from 1 to 100k.
+
+    python benchmarks/bench_tree_engine.py [--trees 100] [--depth 12] [--model forest]
+"""
+import argparse
+import os
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from ml_model import TreeEnsembleEngine
+
+BATCH_SIZES = [1, 10, 50, 100, 1000, 100000]
+
+
+def best_time(fn, X, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(X)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--trees', type=int, default=100)
+    parser.add_argument('--depth', type=int, default=12)
+    parser.add_argument('--model', choices=['forest', 'boosting'], default='forest')
+    args = parser.parse_args()
+
+    from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+
+    rng = np.random.default_rng(0)
+    X_train = rng.normal(size=(20000, 12))
+    y_train = X_train @ rng.normal(size=12) + np.sin(X_train[:, 0] * 3)
+    if args.model == 'forest':
+        model = RandomForestRegressor(n_estimators=args.trees, max_depth=args.depth, random_state=0)
+    else:
+        model = GradientBoostingRegressor(n_estimators=args.trees, max_depth=args.depth, random_state=0)
+    model.fit(X_train, y_train)
+
+    engine = TreeEnsembleEngine.from_sklearn(model)
+    assert engine.matches(model)
+
+    print(f"{args.model}, {args.trees} trees, max depth {args.depth}, "
+          f"{len(engine.feature)} nodes")
+    print(f"{'batch':>8}{'sklearn ms':>14}{'engine ms':>12}{'speedup':>10}{'max abs diff':>15}")
+    for size in BATCH_SIZES:
+        X = rng.normal(size=(size, 12))
+        repeat = 20 if size < 1000 else 3
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            sklearn_s = best_time(model.predict, X, repeat)
+        engine_s = best_time(engine.predict, X, repeat)
+        diff = np.abs(engine.predict(X) - model.predict(X)).max()
+        print(f"{size:>8}{sklearn_s * 1e3:>14.3f}{engine_s * 1e3:>12.3f}"
+              f"{sklearn_s / engine_s:>9.1f}x{diff:>15.2e}")
+
+
+if __name__ == '__main__':
+    main()
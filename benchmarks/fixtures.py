@@ -0,0 +1,77 @@
+"""Sample houses and small trained artifacts for the tests and benchmarks
+
+conftest.py re-exports these for the test suite; benchmark scripts import
+them directly, so running a benchmark needs neither pytest nor conftest.
+"""
+
+SAMPLE_HOUSE = {
+    'area': 2400,
+    'bedrooms': 3,
+    'bathrooms': 2,
+    'stories': 2,
+    'parking': 1,
+    'mainroad': 'yes',
+    'guestroom': 'no',
+    'basement': 'yes',
+    'hotwaterheating': 'no',
+    'airconditioning': 'yes',
+    'prefarea': 'no',
+    'furnishingstatus': 'semi-furnished'
+}
+
+
+def make_houses(n, seed=0):
+    """Random houses within the HousePredictionForm bounds"""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    yes_no = np.array(['no', 'yes'])
+    furnishing = np.array(['furnished', 'semi-furnished', 'unfurnished'])
+    houses = []
+    for _ in range(n):
+        houses.append({
+            'area': int(rng.integers(500, 15000)),
+            'bedrooms': int(rng.integers(1, 7)),
+            'bathrooms': int(rng.integers(1, 5)),
+            'stories': int(rng.integers(1, 5)),
+            'parking': int(rng.integers(0, 4)),
+            'mainroad': str(rng.choice(yes_no)),
+            'guestroom': str(rng.choice(yes_no)),
+            'basement': str(rng.choice(yes_no)),
+            'hotwaterheating': str(rng.choice(yes_no)),
+            'airconditioning': str(rng.choice(yes_no)),
+            'prefarea': str(rng.choice(yes_no)),
+            'furnishingstatus': str(rng.choice(furnishing))
+        })
+    return houses
+
+
+def train_artifact(path, estimator=None, n=300):
+    """Train a small model on synthetic data and save it like the notebook does"""
+    import joblib
+    import pandas as pd
+    from sklearn.linear_model import LinearRegression
+    from sklearn.preprocessing import LabelEncoder, StandardScaler
+    from ml_model import CATEGORICAL_FEATURES, HOUSE_FEATURES
+
+    df = pd.DataFrame(make_houses(n, seed=1))
+    label_encoders = {}
+    for col in CATEGORICAL_FEATURES:
+        label_encoders[col] = LabelEncoder().fit(df[col])
+        df[col] = label_encoders[col].transform(df[col])
+
+    price = (df['area'] * 120 + df['bedrooms'] * 20000 + df['bathrooms'] * 30000
+             + df['airconditioning'] * 25000 - df['furnishingstatus'] * 15000 + 150000)
+
+    scaler = StandardScaler().fit(df[HOUSE_FEATURES])
+    scaled = pd.DataFrame(scaler.transform(df[HOUSE_FEATURES]), columns=HOUSE_FEATURES)
+    model = estimator if estimator is not None else LinearRegression()
+    model.fit(scaled, price)
+
+    joblib.dump({
+        'model': model,
+        'scaler': scaler,
+        'label_encoders': label_encoders,
+        'feature_columns': list(HOUSE_FEATURES)
+    }, path)
+    return path
@@ -0,0 +1,222 @@
+"""Load generator for the page and prediction paths, with JSON results
+
+Seeds a SQLite database with users holding --sizes predictions (see
+seeding.py), serves the app from Gunicorn and runs --concurrency
+clients for --seconds. Each client logs in as one of the seeded users
+(round-robin) and picks its next request by the --mix weights:
+
+- predict    POST /predict (form, result page, saved to history)
+- dashboard  GET /dashboard
+- history    GET /history
+
+Per route and history size it reports requests/s, latency percentiles
+and errors, and writes them with the commit, host and arguments to
+--output. --compare OLD.json prints the change against an earlier run
+and exits with status 1 when a p50 latency grew or a request rate fell
+by more than --threshold percent (p99 is shown but too noisy to gate
+short runs on).
+
+    python benchmarks/load_test.py [--sizes 10 10000 1000000] [--seconds 30] [--concurrency 16]
+        [--output load-test.json] [--compare load-test-OLD.json]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from bench_predict_logging import Client, free_port, wait_for
+from fixtures import make_houses, train_artifact
+from seeding import PASSWORD, seed_users, username
+
+# Cheap password hashes: login cost is benchmarks/bench_login.py's subject
+HASH_METHOD = 'pbkdf2:sha256:1000'
+
+ROUTES = {
+    'predict': ('POST', '/predict'),
+    'dashboard': ('GET', '/dashboard'),
+    'history': ('GET', '/history'),
+}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        route, _, weight = part.partition('=')
+        if route not in ROUTES:
+            raise argparse.ArgumentTypeError(f"Unknown route {route!r} (choose from {', '.join(ROUTES)})")
+        mix[route] = float(weight or 1)
+    return mix
+
+
+def seed(database_url, sizes):
+    os.environ.update(DATABASE_URL=database_url, MODEL_LOAD_MODE='lazy', LOG_LEVEL='WARNING',
+                      METRICS_ENABLED='false', PASSWORD_HASH_METHOD=HASH_METHOD)
+    from app import create_app
+
+    start = time.perf_counter()
+    seed_users(create_app('production'), sizes)
+    return time.perf_counter() - start
+
+
+def run_clients(port, sizes, mix, concurrency, seconds):
+    """[(route, size, seconds, status)] for every request the clients sent"""
+    houses = make_houses(1000, seed=3)
+    samples = []
+    lock = threading.Lock()
+    window = {}
+    # Logins are not part of the measurement: the clock starts once every client is in
+    ready = threading.Barrier(concurrency, action=lambda: window.update(stop=time.perf_counter() + seconds))
+
+    def run(k):
+        size = sizes[k % len(sizes)]
+        client = Client(port)
+        client.request('POST', '/login', {'csrf_token': client.csrf('/login'),
+                                          'username': username(size), 'password': PASSWORD})
+        csrf = client.csrf('/predict')
+        rng = random.Random(k)
+        routes, weights = list(mix), list(mix.values())
+        mine = []
+        ready.wait()
+        while time.perf_counter() < window['stop']:
+            route = rng.choices(routes, weights)[0]
+            method, path = ROUTES[route]
+            form = dict(rng.choice(houses), csrf_token=csrf) if method == 'POST' else None
+            start = time.perf_counter()
+            status, _ = client.request(method, path, form)
+            mine.append((route, size, time.perf_counter() - start, status))
+        with lock:
+            samples.extend(mine)
+
+    threads = [threading.Thread(target=run, args=(k,)) for k in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return samples
+
+
+def summarize(samples, seconds):
+    groups = {}
+    for route, size, elapsed, status in samples:
+        groups.setdefault(f'{route}/{size}', []).append((elapsed, status))
+    results = {}
+    for key, rows in sorted(groups.items()):
+        ms = np.array([elapsed for elapsed, _ in rows]) * 1e3
+        results[key] = {
+            'requests': len(rows),
+            'requests_per_second': len(rows) / seconds,
+            'errors': sum(status != 200 for _, status in rows),
+            'mean_ms': float(ms.mean()),
+            'p50_ms': float(np.percentile(ms, 50)),
+            'p95_ms': float(np.percentile(ms, 95)),
+            'p99_ms': float(np.percentile(ms, 99)),
+        }
+    return results
+
+
+def compare(old, new, threshold):
+    """Print the change per route against an older run; returns the regressions"""
+    regressions = []
+    print(f"\nAgainst {old.get('commit') or 'unknown commit'} ({old.get('timestamp')})")
+    print(f"{'route/size':<22}{'req/s':>10}{'p50':>10}{'p99':>10}")
+    for key, now in new['results'].items():
+        before = old['results'].get(key)
+        if before is None:
+            continue
+        changes = {metric: (now[metric] - before[metric]) / before[metric] * 100 if before[metric] else 0.0
+                   for metric in ('requests_per_second', 'p50_ms', 'p99_ms')}
+        print(f"{key:<22}{changes['requests_per_second']:>+9.1f}%{changes['p50_ms']:>+9.1f}%"
+              f"{changes['p99_ms']:>+9.1f}%")
+        if changes['requests_per_second'] < -threshold:
+            regressions.append(f"{key} requests/s")
+        if changes['p50_ms'] > threshold:
+            regressions.append(f"{key} p50")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 10000, 1000000])
+    parser.add_argument('--seconds', type=float, default=30)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--workers', type=int, default=1, help='Gunicorn workers')
+    parser.add_argument('--threads', type=int, default=8, help='Gunicorn threads per worker')
+    parser.add_argument('--mix', type=parse_mix, default='predict=2,dashboard=1,history=1')
+    parser.add_argument('--output', default='load-test.json')
+    parser.add_argument('--compare', default=None, help='Earlier --output to compare with')
+    parser.add_argument('--threshold', type=float, default=10.0, help='Regression threshold in percent')
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    database_url = f"sqlite:///{tmp}/load.db"
+    with contextlib.redirect_stdout(io.StringIO()):
+        model_path = train_artifact(os.path.join(tmp, 'model.joblib'), n=1000)
+    seed_seconds = seed(database_url, args.sizes)
+    print(f"Seeded users with {', '.join(map(str, args.sizes))} predictions in {seed_seconds:.1f}s")
+
+    port = free_port()
+    env = dict(os.environ, PORT=str(port), WEB_CONCURRENCY=str(args.workers),
+               GUNICORN_THREADS=str(args.threads), MODEL_PATH=str(model_path), DATABASE_URL=database_url,
+               PREDICTION_CACHE_SIZE='0', PASSWORD_HASH_METHOD=HASH_METHOD, FLASK_ENV='production',
+               LOG_LEVEL='WARNING', PYTHONWARNINGS='ignore')
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+                              cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for(port)
+        samples = run_clients(port, args.sizes, args.mix, args.concurrency, args.seconds)
+    finally:
+        server.terminate()
+        server.wait()
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'args': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        'results': summarize(samples, args.seconds),
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{args.concurrency} clients for {args.seconds:g}s, {args.workers} worker(s) x {args.threads} threads")
+    print(f"{'route/size':<22}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for key, row in report['results'].items():
+        print(f"{key:<22}{row['requests_per_second']:>10.1f}{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}"
+              f"{row['p99_ms']:>10.1f}{row['errors']:>8}")
+    print(f"Saved {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), report, args.threshold)
+        if regressions:
+            print(f"Regressions over {args.threshold:g}%: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""pytest-benchmark suite: HousePricePredictor hot paths
+
+Needs pytest-benchmark (pip install pytest-benchmark, skipped without
+it). Not collected by the normal test run, as the file name does not
+start with test_; run it explicitly, together with perf_routes.py, and
+keep the JSON to compare commits:
+
+    python -m pytest benchmarks/perf_predictor.py benchmarks/perf_routes.py \\
+        --benchmark-json=bench-$(git rev-parse --short HEAD).json
+    pytest-benchmark compare bench-OLD.json bench-NEW.json --columns=median,iqr,ops
+
+or let pytest-benchmark keep them with --benchmark-autosave and check
+the latest run against the previous one with --benchmark-compare
+--benchmark-compare-fail=median:10%.
+"""
+import contextlib
+import io
+import itertools
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+from sklearn.ensemble import RandomForestRegressor
+
+from fixtures import SAMPLE_HOUSE, make_houses, train_artifact
+from ml_model import HousePricePredictor
+
+MODELS = {
+    'linear': lambda: None,
+    'forest': lambda: RandomForestRegressor(n_estimators=100, max_depth=10, random_state=0),
+}
+
+
+@pytest.fixture(scope='module', params=sorted(MODELS))
+def artifact(request, tmp_path_factory):
+    path = tmp_path_factory.mktemp(request.param) / 'model.joblib'
+    with contextlib.redirect_stdout(io.StringIO()):
+        train_artifact(path, MODELS[request.param](), n=1000)
+    return str(path)
+
+
+@pytest.mark.benchmark(group='load')
+def test_model_load(benchmark, artifact):
+    predictor = benchmark.pedantic(HousePricePredictor, args=(artifact,), rounds=5)
+    assert predictor.model is not None
+
+
+@pytest.mark.benchmark(group='predict_price')
+def test_predict_price_cold(benchmark, artifact):
+    """First prediction of a freshly loaded predictor, cache miss included"""
+    def fresh():
+        return (HousePricePredictor(artifact, cache_size=4096),), {}
+
+    price, error = benchmark.pedantic(lambda predictor: predictor.predict_price(SAMPLE_HOUSE),
+                                      setup=fresh, rounds=20)
+    assert error is None
+
+
+@pytest.mark.benchmark(group='predict_price')
+@pytest.mark.parametrize('cache', ['uncached', 'cached'])
+def test_predict_price_warm(benchmark, artifact, cache):
+    """Repeated predictions over 1000 houses; 'cached' answers them all from the cache"""
+    predictor = HousePricePredictor(artifact, cache_size=4096 if cache == 'cached' else 0)
+    houses = make_houses(1000)
+    for house in houses:
+        predictor.predict_price(house)
+    cycle = itertools.cycle(houses)
+
+    price, error = benchmark(lambda: predictor.predict_price(next(cycle)))
+    assert error is None
+
+
+@pytest.mark.benchmark(group='stages')
+def test_preprocess_input(benchmark, model_path):
+    predictor = HousePricePredictor(model_path)
+
+    assert benchmark(predictor.preprocess_input, SAMPLE_HOUSE) is not None
+
+
+@pytest.mark.benchmark(group='stages')
+def test_fallback_prediction(benchmark, model_path):
+    predictor = HousePricePredictor(model_path)
+
+    price, error = benchmark(predictor._fallback_prediction, SAMPLE_HOUSE)
+    assert error == 'Fallback prediction used'
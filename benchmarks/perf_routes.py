@@ -0,0 +1,82 @@
+"""pytest-benchmark suite: /predict, /dashboard and /history per history size
+
+Seeds a SQLite file with one user per PERF_HISTORY_SIZES entry
+(default 10, 10k and 1M predictions; seeding 1M rows takes a minute or
+so) and times each route through the test client as that user. POST
+/predict goes to a small trained model with the prediction cache off.
+See perf_predictor.py for how to run and compare the suite.
+
+    PERF_HISTORY_SIZES=10,10000 python -m pytest benchmarks/perf_routes.py
+"""
+import contextlib
+import io
+import os
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+from fixtures import SAMPLE_HOUSE, train_artifact
+from seeding import PASSWORD, seed_users, username
+
+SIZES = [int(n) for n in os.environ.get('PERF_HISTORY_SIZES', '10,10000,1000000').split(',')]
+
+
+@pytest.fixture(scope='module')
+def seeded_app(tmp_path_factory):
+    from app import create_app
+    from config import config, TestingConfig
+    from model_registry import ModelRegistry
+
+    tmp = tmp_path_factory.mktemp('perf')
+    with contextlib.redirect_stdout(io.StringIO()):
+        model_path = train_artifact(tmp / 'model.joblib', n=1000)
+    registry_dir = str(tmp / 'registry')
+    ModelRegistry(registry_dir).publish(str(model_path), version='perf')
+
+    class PerfConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp / 'perf.db'}"
+        MODEL_REGISTRY_DIR = registry_dir
+        PREDICTION_CACHE_SIZE = 0
+
+    config['perf'] = PerfConfig
+    try:
+        app = create_app('perf')
+    finally:
+        del config['perf']
+    seed_users(app, SIZES)
+    return app
+
+
+@pytest.fixture(scope='module')
+def clients(seeded_app):
+    """A logged-in test client per history size"""
+    clients = {}
+    for size in SIZES:
+        client = seeded_app.test_client()
+        response = client.post('/login', data={'username': username(size), 'password': PASSWORD})
+        assert response.status_code == 302
+        clients[size] = client
+    return clients
+
+
+@pytest.mark.benchmark(group='POST /predict')
+@pytest.mark.parametrize('size', SIZES)
+def test_predict_route(benchmark, clients, size):
+    response = benchmark(clients[size].post, '/predict', data=SAMPLE_HOUSE)
+    assert response.status_code == 200
+    assert b'Fallback' not in response.data
+
+
+@pytest.mark.benchmark(group='GET /dashboard')
+@pytest.mark.parametrize('size', SIZES)
+def test_dashboard_route(benchmark, clients, size):
+    response = benchmark(clients[size].get, '/dashboard')
+    assert response.status_code == 200
+
+
+@pytest.mark.benchmark(group='GET /history')
+@pytest.mark.parametrize('size', SIZES)
+def test_history_route(benchmark, clients, size):
+    response = benchmark(clients[size].get, '/history')
+    assert response.status_code == 200
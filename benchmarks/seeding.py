@@ -0,0 +1,50 @@
+"""Seeded users for the benchmark suite and the load generator
+
+seed_users(app, sizes) creates one user per size, named 'user<size>'
+with password PASSWORD, holding exactly that many predictions spread
+over the past two years, and backfills their prediction stats. The
+same seed always produces the same rows.
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from fixtures import make_houses
+
+PASSWORD = 'secret123'
+CHUNK = 50000
+
+
+def username(size):
+    return f'user{size}'
+
+
+def seed_users(app, sizes, seed=0):
+    """{size: user_id} for newly created users holding size predictions each"""
+    from models import db, User, Prediction, rebuild_prediction_stats
+
+    rng = np.random.default_rng(seed)
+    houses = make_houses(1000, seed=seed)
+    start = datetime(2024, 1, 1)
+    user_ids = {}
+    with app.app_context():
+        for size in sizes:
+            user = User(username=username(size), email=f'{username(size)}@example.com')
+            user.set_password(PASSWORD)
+            db.session.add(user)
+            db.session.commit()
+            user_ids[size] = user.id
+
+            step = timedelta(days=730) / max(size, 1)
+            for offset in range(0, size, CHUNK):
+                count = min(CHUNK, size - offset)
+                prices = rng.uniform(50000, 2000000, count)
+                db.session.execute(db.insert(Prediction), [
+                    dict(houses[(offset + i) % len(houses)], user_id=user.id,
+                         predicted_price=float(prices[i]), prediction_date=start + step * (offset + i))
+                    for i in range(count)
+                ])
+                db.session.commit()
+            rebuild_prediction_stats(user.id)
+            db.session.commit()
+    return user_ids
@@ -4,4 +4,5 @@ set -o errexit  # Exit on error
 # Install dependencies
 pip install -r requirements.txt
 
-# Create database tables
+# Create database tables, add new columns and build missing indexes
+flask --app app ensure-schema
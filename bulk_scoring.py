@@ -0,0 +1,144 @@
+"""Offline scoring of CSV and Parquet files of houses
+
+The input is read in chunks of chunk_size rows. Each chunk is scored with
+HousePricePredictor.predict_batch, so the encoders and the price clipping
+are the same as in the web app. Results are appended to the output file
+as they come back. At most two chunks per worker are in flight at once,
+so memory stays flat no matter how big the file is.
+
+With workers > 1 the chunks are scored in a process pool. Each worker
+process loads the model once, in its initializer.
+"""
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+PARQUET_EXTENSIONS = ('.parquet', '.pq')
+
+# Predictor of the current scoring process (set once per pool worker)
+_worker_predictor = None
+
+
+def _is_parquet(path):
+    return path.lower().endswith(PARQUET_EXTENSIONS)
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet files need pyarrow (pip install pyarrow)")
+    return pq
+
+
+def read_chunks(path, chunk_size):
+    """Yield DataFrames of up to chunk_size rows from a CSV or Parquet file"""
+    if _is_parquet(path):
+        pq = _require_pyarrow()
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        import pandas as pd
+
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+class ChunkWriter:
+    """Appends scored chunks to a CSV or Parquet file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._parquet = None
+        self._header = True
+
+    def write(self, frame):
+        if _is_parquet(self.path):
+            pq = _require_pyarrow()
+            import pyarrow as pa
+
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._parquet is None:
+                self._parquet = pq.ParquetWriter(self.path, table.schema)
+            self._parquet.write_table(table)
+        else:
+            frame.to_csv(self.path, mode='w' if self._header else 'a',
+                         header=self._header, index=False)
+            self._header = False
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+
+
+def _init_worker(model_path, load_options):
+    global _worker_predictor
+    from ml_model import HousePricePredictor
+
+    _worker_predictor = HousePricePredictor(model_path, **load_options)
+
+
+def score_chunk(frame, predictor=None):
+    """Add predicted_price and prediction_error columns to a chunk"""
+    predictor = predictor or _worker_predictor
+    results = predictor.predict_batch(frame)
+    frame = frame.copy()
+    frame['predicted_price'] = [price for price, _ in results]
+    frame['prediction_error'] = [error for _, error in results]
+    return frame
+
+
+def score_file(input_path, output_path, model_path, chunk_size=10000, workers=1,
+               load_options=None):
+    """Score every row of input_path into output_path
+
+    Returns a dict with the row count, the number of rows that used the
+    fallback formula, the elapsed seconds and rows per second.
+    """
+    load_options = load_options or {}
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(f"Model file not found: {model_path}")
+
+    writer = ChunkWriter(output_path)
+    rows = fallback_rows = 0
+    start = time.perf_counter()
+
+    def collect(scored):
+        nonlocal rows, fallback_rows
+        writer.write(scored)
+        rows += len(scored)
+        fallback_rows += int(scored['prediction_error'].notna().sum())
+
+    try:
+        if workers <= 1:
+            from ml_model import HousePricePredictor
+
+            predictor = HousePricePredictor(model_path, **load_options)
+            for chunk in read_chunks(input_path, chunk_size):
+                collect(score_chunk(chunk, predictor))
+        else:
+            with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                     initargs=(model_path, load_options)) as pool:
+                # Bounded window of chunks in flight, written back in input order
+                pending = deque()
+                for chunk in read_chunks(input_path, chunk_size):
+                    pending.append(pool.submit(score_chunk, chunk))
+                    if len(pending) >= workers * 2:
+                        collect(pending.popleft().result())
+                while pending:
+                    collect(pending.popleft().result())
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    stats = {
+        'rows': rows,
+        'fallback_rows': fallback_rows,
+        'seconds': elapsed,
+        'rows_per_second': rows / elapsed if elapsed > 0 else 0.0
+    }
+    logger.info(f"Scored {rows} rows in {elapsed:.2f}s ({stats['rows_per_second']:,.0f} rows/s)")
+    return stats
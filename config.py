@@ -1,4 +1,5 @@
 import os
+import tempfile
 from datetime import timedelta
 
 class Config:
@@ -21,6 +22,106 @@ class Config:
         'pool_size': 10,
         'max_overflow': 20
     }
+    
+    # Root log level. With LOG_QUEUE request threads only enqueue log
+    # records and a background thread writes them (see log_queue.py).
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+    LOG_QUEUE = os.environ.get('LOG_QUEUE', 'true').lower() == 'true'
+    
+    # Expose per-stage latency histograms and counters on /metrics. Off by
+    # default: the numbers reveal traffic and model behaviour. With
+    # METRICS_TOKEN set, scrapes must send 'Authorization: Bearer <token>'
+    # (Prometheus: authorization: {credentials_file: ...} in the scrape
+    # config); without it, only enable metrics where /metrics is not
+    # reachable from outside, e.g. behind a proxy that blocks the path.
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'false').lower() == 'true'
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN') or None
+    
+    # Write-behind persistence of /predict results (see prediction_writer.py):
+    # rows are queued and inserted in batches by a background thread
+    PREDICTION_WRITE_BEHIND = os.environ.get('PREDICTION_WRITE_BEHIND', 'false').lower() == 'true'
+    PREDICTION_WRITE_QUEUE_SIZE = int(os.environ.get('PREDICTION_WRITE_QUEUE_SIZE', 10000))
+    PREDICTION_WRITE_BATCH_SIZE = int(os.environ.get('PREDICTION_WRITE_BATCH_SIZE', 500))
+    PREDICTION_WRITE_FLUSH_INTERVAL = float(os.environ.get('PREDICTION_WRITE_FLUSH_INTERVAL', 0.5))
+    # How long a request waits for room in a full queue before writing itself
+    PREDICTION_WRITE_PUT_TIMEOUT = float(os.environ.get('PREDICTION_WRITE_PUT_TIMEOUT', 0.05))
+    
+    # Werkzeug hash method and cost for new passwords, e.g. 'pbkdf2:sha256:600000'
+    # or 'scrypt:32768:8:1' (a bare 'pbkdf2' or 'scrypt' means Werkzeug's default
+    # cost). Users whose stored hash differs are rehashed on login.
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+    
+    # Seconds a worker reuses a loaded user before reading it again (0 size disables)
+    USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', 30))
+    USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 10000))
+    
+    # Rows fetched and serialized per chunk by /history/export.*
+    HISTORY_EXPORT_BATCH_SIZE = int(os.environ.get('HISTORY_EXPORT_BATCH_SIZE', 1000))
+    
+    # Token-authenticated JSON API (/api/v1/predict, see prediction_api.py).
+    # Valid tokens are remembered for TOKEN_CACHE_TTL seconds per worker;
+    # INFERENCE_THREADS is the executor asgi.py runs predictions on.
+    API_TOKEN_CACHE_TTL = float(os.environ.get('API_TOKEN_CACHE_TTL', 60))
+    API_MAX_BODY_BYTES = int(os.environ.get('API_MAX_BODY_BYTES', 65536))
+    API_INFERENCE_THREADS = int(os.environ.get('API_INFERENCE_THREADS', 8))
+    
+    # Upper bound on houses per /api/predict/batch request
+    BATCH_PREDICTION_MAX_ROWS = int(os.environ.get('BATCH_PREDICTION_MAX_ROWS', 50000))
+    
+    # Largest request body accepted, in bytes (Flask answers 413 above it;
+    # asgi.py checks it before buffering a body for Flask). Room for a
+    # full batch of BATCH_PREDICTION_MAX_ROWS houses.
+    MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH', 32 * 1024 * 1024))
+    
+    # When to import the ML stack and load the model: 'eager' in create_app,
+    # 'lazy' on the first prediction, or 'background' in a warm-up thread
+    # started by create_app. Use eager with Gunicorn preload_app.
+    MODEL_LOAD_MODE = os.environ.get('MODEL_LOAD_MODE', 'eager')
+    
+    # Model artifact served when there is no registry (or it has no
+    # current version yet)
+    MODEL_PATH = os.environ.get('MODEL_PATH', 'models/house_price_model.joblib')
+    
+    # Versioned model registry (see model_registry.py). When set, workers
+    # poll its manifest and hot-swap new versions.
+    MODEL_REGISTRY_DIR = os.environ.get('MODEL_REGISTRY_DIR')
+    MODEL_RELOAD_INTERVAL = float(os.environ.get('MODEL_RELOAD_INTERVAL', 10))
+    
+    # joblib mmap_mode for model artifacts ('' disables). Uncompressed
+    # artifacts from ml_model.save_model_artifact are then shared read-only
+    # between workers instead of copied into each one.
+    MODEL_MMAP_MODE = os.environ.get('MODEL_MMAP_MODE', 'r') or None
+    
+    # Flatten sklearn tree ensembles into ml_model.TreeEnsembleEngine on load
+    MODEL_TREE_ENGINE = os.environ.get('MODEL_TREE_ENGINE', 'false').lower() == 'true'
+    
+    # Precompute the model's output over the form's input grid at load time
+    # (ml_model.PriceTable); dense tables are capped at MAX_CELLS float64s
+    MODEL_PRICE_TABLE = os.environ.get('MODEL_PRICE_TABLE', 'false').lower() == 'true'
+    MODEL_PRICE_TABLE_MAX_CELLS = int(os.environ.get('MODEL_PRICE_TABLE_MAX_CELLS', 2000000))
+    
+    # Where model.predict runs: 'local' in the request thread, or 'process'
+    # in MODEL_INFERENCE_PROCESSES dedicated processes per worker (see
+    # inference_pool.py), falling back to the formula after TIMEOUT_MS
+    MODEL_INFERENCE_BACKEND = os.environ.get('MODEL_INFERENCE_BACKEND', 'local')
+    MODEL_INFERENCE_PROCESSES = int(os.environ.get('MODEL_INFERENCE_PROCESSES', 2))
+    MODEL_INFERENCE_TIMEOUT_MS = float(os.environ.get('MODEL_INFERENCE_TIMEOUT_MS', 1000))
+    
+    # Score linear models with a folded dot product instead of model.predict
+    MODEL_FOLD_LINEAR = os.environ.get('MODEL_FOLD_LINEAR', 'true').lower() == 'true'
+    
+    # Micro-batching of concurrent predict_price calls (ml_model.MicroBatcher):
+    # wait up to WINDOW_MS for up to MAX_BATCH requests, 0 disables it
+    PREDICTION_BATCH_WINDOW_MS = float(os.environ.get('PREDICTION_BATCH_WINDOW_MS', 0))
+    PREDICTION_MAX_BATCH = int(os.environ.get('PREDICTION_MAX_BATCH', 32))
+    
+    # Cache in front of predict_price (size 0 disables it). 'memory' is a
+    # per-process LRU, 'sqlite' a file shared by all workers on the host.
+    PREDICTION_CACHE_BACKEND = os.environ.get('PREDICTION_CACHE_BACKEND', 'memory')
+    PREDICTION_CACHE_SIZE = int(os.environ.get('PREDICTION_CACHE_SIZE', 4096))
+    PREDICTION_CACHE_TTL = int(os.environ.get('PREDICTION_CACHE_TTL', 3600))
+    PREDICTION_CACHE_PATH = os.environ.get('PREDICTION_CACHE_PATH') or \
+        os.path.join(tempfile.gettempdir(), 'house_price_prediction_cache.sqlite')
 
 class DevelopmentConfig(Config):
     DEBUG = True
@@ -30,8 +131,20 @@ class ProductionConfig(Config):
     DEBUG = False
     SQLALCHEMY_ECHO = False
 
+class TestingConfig(Config):
+    TESTING = True
+    WTF_CSRF_ENABLED = False
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    LOG_QUEUE = False
+    # Cheap hashes keep the suite fast; production cost is set above
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
+    METRICS_ENABLED = True
+    METRICS_TOKEN = None
+
 config = {
     'development': DevelopmentConfig,
     'production': ProductionConfig,
+    'testing': TestingConfig,
     'default': ProductionConfig
 }
@@ -0,0 +1,43 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+# pytest captures logs with its own root handlers, keep them in place
+os.environ.setdefault('LOG_QUEUE', 'false')
+
+# Shared with the benchmark scripts, which must not depend on pytest
+from benchmarks.fixtures import SAMPLE_HOUSE, make_houses, train_artifact
+
+
+@pytest.fixture
+def model_path(tmp_path):
+    return str(train_artifact(tmp_path / 'model.joblib'))
+
+
+@pytest.fixture
+def app():
+    from app import create_app
+    from models import db
+
+    app = create_app('testing')
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    from models import db, User
+
+    with app.app_context():
+        user = User(username='tester', email='tester@example.com')
+        user.set_password('secret123')
+        db.session.add(user)
+        db.session.commit()
+
+    client = app.test_client()
+    client.post('/login', data={'username': 'tester', 'password': 'secret123'})
+    return client
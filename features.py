@@ -0,0 +1,95 @@
+"""House features shared by the form, the web app and the model
+
+Kept free of numpy/pandas so the web process can import it without
+pulling in the ML stack.
+"""
+import math
+import numbers
+
+# Feature names matching the Flask prediction form
+NUMERIC_FEATURES = ['area', 'bedrooms', 'bathrooms', 'stories', 'parking']
+CATEGORICAL_FEATURES = ['mainroad', 'guestroom', 'basement', 'hotwaterheating',
+                        'airconditioning', 'prefarea', 'furnishingstatus']
+HOUSE_FEATURES = NUMERIC_FEATURES + CATEGORICAL_FEATURES
+
+# Values the prediction form offers for each categorical feature
+CATEGORY_VALUES = {
+    'mainroad': ('yes', 'no'),
+    'guestroom': ('yes', 'no'),
+    'basement': ('yes', 'no'),
+    'hotwaterheating': ('yes', 'no'),
+    'airconditioning': ('yes', 'no'),
+    'prefarea': ('yes', 'no'),
+    'furnishingstatus': ('furnished', 'semi-furnished', 'unfurnished')
+}
+
+# Whole-number range the prediction form accepts for each numeric feature
+NUMERIC_BOUNDS = {
+    'area': (500, 50000),
+    'bedrooms': (1, 10),
+    'bathrooms': (1, 10),
+    'stories': (1, 5),
+    'parking': (0, 10)
+}
+
+# Predictions are clipped to this range
+MIN_PRICE = 50000
+MAX_PRICE = 2000000
+
+
+def parse_house(payload):
+    """(house, errors): the validated features, or a dict of field errors
+
+    Checks a JSON house against the form's bounds and choices, so whatever
+    passes fits the prediction columns. Used by the JSON API and each row
+    of the batch endpoint.
+    """
+    if not isinstance(payload, dict):
+        return None, {'_': 'Expected a JSON object of house features'}
+
+    house = {}
+    errors = {}
+    for name in HOUSE_FEATURES:
+        value = payload.get(name)
+        if name in NUMERIC_BOUNDS:
+            low, high = NUMERIC_BOUNDS[name]
+            # JSON allows Infinity, NaN and 1e400; int() of them raises
+            if (not isinstance(value, numbers.Real) or isinstance(value, bool) or not math.isfinite(value)
+                    or value != int(value) or not low <= value <= high):
+                errors[name] = f'Whole number from {low} to {high}'
+                continue
+            house[name] = int(value)
+        elif value in CATEGORY_VALUES[name]:
+            house[name] = value
+        else:
+            errors[name] = f"One of {', '.join(CATEGORY_VALUES[name])}"
+    return (None, errors) if errors else (house, None)
+
+
+def make_cache_key(house_features):
+    """Normalized feature tuple for a house, or None if it cannot be cached
+
+    Numbers are reduced to one canonical form so 2400 and 2400.0 share an
+    entry. Strings are kept exactly as given because the encoders are case
+    and whitespace sensitive.
+    """
+    key = []
+    try:
+        for name in HOUSE_FEATURES:
+            value = house_features.get(name)
+            if isinstance(value, numbers.Real) and not isinstance(value, bool):
+                value = float(value)
+                value = int(value) if value.is_integer() else value
+            elif not isinstance(value, str) and value is not None:
+                return None
+            key.append(value)
+
+        # Anything else in the dict could still reach the model
+        extra = sorted((k, v) for k, v in house_features.items() if k not in HOUSE_FEATURES)
+        if extra:
+            key.append(tuple(extra))
+        key = tuple(key)
+        hash(key)
+    except (TypeError, ValueError, AttributeError):
+        return None
+    return key
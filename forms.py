@@ -1,7 +1,12 @@
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, IntegerField, SelectField, SubmitField
-from wtforms.validators import DataRequired, Email, Length, EqualTo, NumberRange, ValidationError
+from wtforms.validators import DataRequired, Email, Length, EqualTo, NumberRange
 from models import User
+from features import NUMERIC_BOUNDS
+
+def _bounds(name):
+    low, high = NUMERIC_BOUNDS[name]
+    return NumberRange(min=low, max=high)
 
 class LoginForm(FlaskForm):
     username = StringField('Username', validators=[DataRequired(), Length(min=4, max=20)])
@@ -18,22 +23,32 @@ class SignupForm(FlaskForm):
                                    validators=[DataRequired(), EqualTo('password')])
     submit = SubmitField('Sign Up')
     
-    def validate_username(self, username):
-        user = User.query.filter_by(username=username.data).first()
-        if user:
-            raise ValidationError('Username already taken. Please choose a different one.')
+    def validate(self, extra_validators=None):
+        if not super().validate(extra_validators):
+            return False
+        return not self.check_taken()
     
-    def validate_email(self, email):
-        user = User.query.filter_by(email=email.data).first()
-        if user:
-            raise ValidationError('Email already registered. Please choose a different one.')
+    def check_taken(self):
+        """One query for both unique fields; flags each one already in use
+        
+        Advisory only: a concurrent signup can still win the race, so the
+        caller treats an IntegrityError on commit as the real conflict.
+        """
+        taken = User.query.with_entities(User.username, User.email).filter(
+            (User.username == self.username.data) | (User.email == self.email.data)
+        ).limit(2).all()
+        if any(row.username == self.username.data for row in taken):
+            self.username.errors.append('Username already taken. Please choose a different one.')
+        if any(row.email == self.email.data for row in taken):
+            self.email.errors.append('Email already registered. Please choose a different one.')
+        return bool(taken)
 
 class HousePredictionForm(FlaskForm):
-    area = IntegerField('Area (sq ft)', validators=[DataRequired(), NumberRange(min=500, max=50000)])
-    bedrooms = IntegerField('Bedrooms', validators=[DataRequired(), NumberRange(min=1, max=10)])
-    bathrooms = IntegerField('Bathrooms', validators=[DataRequired(), NumberRange(min=1, max=10)])
-    stories = IntegerField('Stories', validators=[DataRequired(), NumberRange(min=1, max=5)])
-    parking = IntegerField('Parking Spaces', validators=[DataRequired(), NumberRange(min=0, max=10)])
+    area = IntegerField('Area (sq ft)', validators=[DataRequired(), _bounds('area')])
+    bedrooms = IntegerField('Bedrooms', validators=[DataRequired(), _bounds('bedrooms')])
+    bathrooms = IntegerField('Bathrooms', validators=[DataRequired(), _bounds('bathrooms')])
+    stories = IntegerField('Stories', validators=[DataRequired(), _bounds('stories')])
+    parking = IntegerField('Parking Spaces', validators=[DataRequired(), _bounds('parking')])
     
     mainroad = SelectField('Main Road Access', 
                           choices=[('yes', 'Yes'), ('no', 'No')], 
@@ -0,0 +1,58 @@
+"""Gunicorn settings
+
+With preload_app the master imports app.py once: the model is loaded,
+its preprocessing plan compiled and the tables created before any
+worker forks. Workers then share those pages copy-on-write instead of
+each deserializing their own copy.
+"""
+import gc
+import logging
+import os
+import sys
+import time
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+
+# Lazy and background model loading are for fast single-process cold
+# starts; a warm-up thread started in the master would not survive the fork.
+# The model registry watcher is started by each worker on its first request.
+eager_model = os.environ.get('MODEL_LOAD_MODE', 'eager') == 'eager'
+preload_app = os.environ.get('GUNICORN_PRELOAD', str(eager_model)).lower() == 'true'
+
+logger = logging.getLogger('gunicorn.error')
+
+
+def when_ready(server):
+    if server.cfg.preload_app:
+        # Everything loaded so far lives as long as the master. Moving it to
+        # the permanent generation stops the workers' garbage collector from
+        # touching (and so copying) those shared pages.
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    worker.boot_started = time.time()
+
+    if server.cfg.preload_app:
+        from app import app
+        from models import db
+
+        # Pooled connections were opened by the master and must not be
+        # shared; give this worker a fresh pool without closing them
+        with app.app_context():
+            db.engine.dispose(close=False)
+
+
+def post_worker_init(worker):
+    logger.info("Worker %s booted in %.3fs", worker.pid, time.time() - worker.boot_started)
+
+
+def worker_exit(server, worker):
+    # Drain write-behind predictions before the worker goes away. Skip
+    # workers that never got as far as importing the app.
+    app = getattr(sys.modules.get('app'), 'app', None)
+    writer = app.extensions.get('prediction_writer') if app is not None else None
+    if writer is not None:
+        writer.close()
@@ -0,0 +1,69 @@
+"""Streaming export of a user's prediction history as CSV or JSON Lines
+
+Rows come from a plain column select executed with yield_per, so the
+driver hands them over in batches (a server-side cursor on PostgreSQL)
+and no Prediction objects are built. Each batch is serialized and
+yielded as one chunk, which keeps memory flat however many rows a user
+has. The generators must run inside the request context, so wrap them
+in stream_with_context.
+"""
+import csv
+import io
+import json
+
+from sqlalchemy import select
+
+from models import db, Prediction
+
+# Same fields and order as Prediction.to_dict
+EXPORT_COLUMNS = [
+    Prediction.id, Prediction.area, Prediction.bedrooms, Prediction.bathrooms, Prediction.stories,
+    Prediction.parking, Prediction.mainroad, Prediction.guestroom, Prediction.basement,
+    Prediction.hotwaterheating, Prediction.airconditioning, Prediction.prefarea,
+    Prediction.furnishingstatus, Prediction.predicted_price, Prediction.prediction_date,
+    Prediction.model_version
+]
+EXPORT_FIELDS = [column.key for column in EXPORT_COLUMNS]
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+_DATE_INDEX = EXPORT_FIELDS.index('prediction_date')
+
+
+def export_batches(user_id, batch_size=1000):
+    """Lists of row tuples for user_id's predictions, oldest first"""
+    stmt = select(*EXPORT_COLUMNS).where(Prediction.user_id == user_id)\
+        .order_by(Prediction.prediction_date, Prediction.id)\
+        .execution_options(yield_per=batch_size)
+    result = db.session.execute(stmt)
+    try:
+        for batch in result.partitions():
+            yield [_formatted(row) for row in batch]
+    finally:
+        # Releases the cursor if the client disconnects mid-download
+        result.close()
+
+
+def _formatted(row):
+    row = list(row)
+    if row[_DATE_INDEX] is not None:
+        row[_DATE_INDEX] = row[_DATE_INDEX].strftime(DATE_FORMAT)
+    return row
+
+
+def iter_csv(user_id, batch_size=1000):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    for batch in export_batches(user_id, batch_size):
+        writer.writerows(batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Header only when there are no rows
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def iter_jsonl(user_id, batch_size=1000):
+    dumps = json.JSONEncoder(separators=(',', ':')).encode
+    for batch in export_batches(user_id, batch_size):
+        yield ''.join(dumps(dict(zip(EXPORT_FIELDS, row))) + '\n' for row in batch)
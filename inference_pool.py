@@ -0,0 +1,190 @@
+"""Model inference in dedicated processes (HousePricePredictor's 'process' backend)
+
+model.predict for large tree ensembles is CPU-bound and mostly holds the
+GIL, so in a threaded Gunicorn worker one prediction stalls every other
+request thread of that worker, page views included. With the process
+backend the request thread only encodes and scales the house, sends the
+float64 rows to one of a few inference processes over the pool's pipe,
+and waits for the prices with a timeout. The GIL is released while it
+waits.
+
+Each inference process loads the model artifact once, in the pool's
+initializer, exactly as bulk_scoring does. Processes are started with
+'spawn' on first use in each serving process: forking a threaded worker
+is unsafe, and a pool created in a preloading Gunicorn master would not
+survive the fork anyway. Starting takes seconds, so it runs in a
+background thread and predictions use the fallback formula until the
+processes are up. After a failed start or a crashed process the pool
+waits RETRY_MIN seconds, doubling up to RETRY_MAX, before starting again.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from metrics import INFERENCE_TIMEOUTS
+
+logger = logging.getLogger(__name__)
+
+_worker_predictor = None
+
+
+def _init_worker(model_path, load_options):
+    global _worker_predictor
+    from ml_model import HousePricePredictor
+
+    _worker_predictor = HousePricePredictor(model_path, **load_options)
+
+
+def _ready():
+    return _worker_predictor is not None and _worker_predictor.model is not None
+
+
+def _model_predict(rows):
+    return _worker_predictor._model_predict(rows)
+
+
+class InferenceTimeout(Exception):
+    """The inference processes did not answer in time"""
+
+
+class InferenceUnavailable(Exception):
+    """The inference processes are not running (starting, failed or closed)"""
+
+
+class InferencePool:
+    """A few processes that run model.predict on scaled feature rows
+
+    predict(rows) blocks for at most timeout seconds and raises
+    InferenceTimeout after that, or InferenceUnavailable when the
+    processes are not running, and HousePricePredictor then uses its
+    fallback formula. A request that timed out keeps its inference
+    process busy until the model returns. If an inference process dies,
+    the pool is rebuilt in the background after the retry delay.
+    """
+
+    RETRY_MIN = 1.0
+    RETRY_MAX = 60.0
+
+    def __init__(self, model_path, load_options=None, processes=2, timeout=1.0, start_timeout=120.0):
+        self.model_path = model_path
+        self.load_options = dict(load_options or {})
+        self.processes = processes
+        self.timeout = timeout
+        self.start_timeout = start_timeout
+        self._executor = None
+        self._pid = None
+        self._closed = False
+        self._starting = False
+        self._failures = 0
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+        self._started = threading.Condition(self._lock)
+
+    def predict(self, rows):
+        """model.predict(rows) in an inference process, as a float array"""
+        executor = self._executor if self._pid == os.getpid() else None
+        if executor is None:
+            self.start()
+            raise InferenceUnavailable("Inference pool is closed" if self._closed
+                                       else "Inference processes are not running yet")
+        try:
+            future = executor.submit(_model_predict, rows)
+            prices = future.result(self.timeout)
+        except TimeoutError:
+            future.cancel()
+            INFERENCE_TIMEOUTS.inc()
+            raise InferenceTimeout(f"No answer from the inference pool within {self.timeout:g}s")
+        except BrokenProcessPool as e:
+            self._discard(executor)
+            raise InferenceUnavailable(f"Inference pool failed: {e}")
+        return prices
+
+    def start(self, wait=False):
+        """Start the processes unless they are running, starting or backing off
+
+        Returns at once and starts them in a background thread, or with
+        wait=True in the calling thread (or waits for a start already
+        running). True when the pool is ready.
+        """
+        with self._lock:
+            if self._closed:
+                return False
+            if self._pid != os.getpid():
+                # Nothing carries over from the process that created the pool
+                self._executor, self._starting, self._pid = None, False, os.getpid()
+            if self._starting and wait:
+                self._started.wait_for(lambda: not self._starting, self.start_timeout)
+            if self._executor is not None:
+                return True
+            if self._starting or time.monotonic() < self._retry_at:
+                return False
+            self._starting = True
+        if not wait:
+            threading.Thread(target=self._start_processes, name='inference-pool-start', daemon=True).start()
+            return False
+        return self._start_processes()
+
+    def _start_processes(self):
+        try:
+            executor = self._start()
+        except Exception as e:
+            with self._lock:
+                self._starting = False
+                delay = self._back_off()
+                self._started.notify_all()
+            logger.error(f"Could not start inference processes, retrying in {delay:g}s: {e}")
+            return False
+        with self._lock:
+            self._starting = False
+            current = not self._closed and self._pid == os.getpid()
+            if current:
+                self._executor, self._failures = executor, 0
+            self._started.notify_all()
+        if not current:
+            executor.shutdown(wait=False, cancel_futures=True)
+        return current
+
+    def _start(self):
+        """New executor with every inference process up and its model loaded"""
+        start = time.perf_counter()
+        executor = ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context('spawn'),
+                                       initializer=_init_worker,
+                                       initargs=(self.model_path, self.load_options))
+        try:
+            # Processes are spawned as work arrives; one check each starts them all
+            ready = [executor.submit(_ready) for _ in range(self.processes)]
+            if not all(f.result(self.start_timeout) for f in ready):
+                raise RuntimeError(f"Inference processes could not load {self.model_path}")
+        except Exception:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        logger.info(f"Started {self.processes} inference processes in {time.perf_counter() - start:.2f}s")
+        return executor
+
+    def _back_off(self):
+        """Delay the next start after a failure; call with the lock held"""
+        delay = min(self.RETRY_MAX, self.RETRY_MIN * 2 ** self._failures)
+        self._failures += 1
+        self._retry_at = time.monotonic() + delay
+        return delay
+
+    def _discard(self, executor):
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+            delay = self._back_off()
+        logger.warning(f"Inference pool broke, restarting it in {delay:g}s")
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def close(self):
+        """Stop the processes once the work already queued has finished"""
+        with self._lock:
+            self._closed = True
+            executor, self._executor = self._executor, None
+        if executor is not None and self._pid == os.getpid():
+            executor.shutdown(wait=False)
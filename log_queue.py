@@ -0,0 +1,55 @@
+"""Non-blocking logging for request threads
+
+configure_logging moves the root logger's handlers behind a QueueListener
+and leaves a single QueueHandler on the root logger. Request threads only
+enqueue records; a listener thread formats them and hands them to the
+original handlers (stderr for basicConfig's StreamHandler).
+Forked children (Gunicorn workers) get a fresh queue and listener,
+because the parent's listener thread does not survive the fork.
+"""
+import atexit
+import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+_handler = None
+_listener = None
+
+
+def configure_logging(level='INFO', use_queue=True):
+    """Set the root log level and, once per process, install the queue"""
+    global _handler, _listener
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    if not use_queue or _handler is not None:
+        return
+
+    handlers = list(root.handlers) or [logging.StreamHandler()]
+    for handler in handlers:
+        root.removeHandler(handler)
+
+    _handler = QueueHandler(queue.SimpleQueue())
+    root.addHandler(_handler)
+    _listener = QueueListener(_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    os.register_at_fork(after_in_child=_restart_after_fork)
+
+
+def stop_logging():
+    """Flush queued records and stop the listener thread"""
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+
+
+def _restart_after_fork():
+    global _listener
+
+    if _handler is None:
+        return
+    # Records queued before the fork belong to the parent
+    _handler.queue = queue.SimpleQueue()
+    _listener = QueueListener(_handler.queue, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
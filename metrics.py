@@ -0,0 +1,215 @@
+"""Process-local counters and latency histograms in Prometheus text format
+
+Deliberately tiny so it can stay on in production: an observation on a
+series bound with labels() is a bisect into the bucket bounds and two
+additions under a lock. Each
+Gunicorn worker keeps its own numbers, so a scrape of /metrics reports
+the worker that answered it (label series by instance when scraping
+several workers).
+"""
+import threading
+import time
+from bisect import bisect_left
+
+# Upper bounds in seconds, from sub-millisecond model calls to slow commits
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _format_labels(labelnames, values, extra=''):
+    pairs = [f'{name}="{value}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _CounterSeries:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self, lock):
+        self.value = 0
+        self._lock = lock
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class Counter:
+    """Monotonic counter, one series per combination of label values"""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def labels(self, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        series = self._series.get(key)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(key, _CounterSeries(self._lock))
+        return series
+
+    def inc(self, amount=1, **labels):
+        self.labels(**labels).inc(amount)
+
+    def value(self, **labels):
+        return self.labels(**labels).value
+
+    def samples(self):
+        with self._lock:
+            values = {key: series.value for key, series in self._series.items()}
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+
+
+class _HistogramSeries:
+    """One label combination of a Histogram; bind it once, observe often"""
+
+    __slots__ = ('buckets', 'counts', 'total', '_lock')
+
+    def __init__(self, buckets, lock):
+        self.buckets = buckets
+        # Per-bucket counts, the last one is +Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self._lock = lock
+
+    def observe(self, seconds):
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.total += seconds
+
+    def time(self):
+        """Context manager observing the duration of its block"""
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ('series', 'start')
+
+    def __init__(self, series):
+        self.series = series
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.series.observe(time.perf_counter() - self.start)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram, one series per label combination"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def labels(self, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        series = self._series.get(key)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(key, _HistogramSeries(self.buckets, self._lock))
+        return series
+
+    def observe(self, seconds, **labels):
+        self.labels(**labels).observe(seconds)
+
+    def time(self, **labels):
+        return self.labels(**labels).time()
+
+    def count(self, **labels):
+        return sum(self.labels(**labels).counts)
+
+    def samples(self):
+        with self._lock:
+            snapshot = {key: (list(series.counts), series.total)
+                        for key, series in self._series.items()}
+        bounds = [repr(float(b)) for b in self.buckets] + ['+Inf']
+        for key, (counts, total) in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, f'le="{bound}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {total}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, documentation, labelnames, buckets)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for name, metric in sorted(self._metrics.items()):
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+PREDICT_STAGE_SECONDS = REGISTRY.histogram(
+    'predict_stage_seconds', 'Time spent in each stage of a prediction', ['stage'])
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    'http_request_seconds', 'Time to handle a request', ['endpoint', 'method', 'status'])
+MICRO_BATCH_SIZE = REGISTRY.histogram(
+    'predict_micro_batch_size', 'Houses scored together by the micro-batcher',
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+PREDICTION_FALLBACKS = REGISTRY.counter(
+    'prediction_fallbacks_total', 'Predictions served by a fallback formula', ['predictor'])
+INFERENCE_TIMEOUTS = REGISTRY.counter(
+    'prediction_inference_timeouts_total', 'Predictions the inference pool did not answer in time')
+PREDICTION_CACHE_LOOKUPS = REGISTRY.counter(
+    'prediction_cache_lookups_total', 'Prediction cache lookups by result', ['result'])
+
+# Series bound once at import, so the hot path skips the label lookup
+CACHE_LOOKUP_SECONDS = PREDICT_STAGE_SECONDS.labels(stage='cache_lookup')
+PREPROCESS_SECONDS = PREDICT_STAGE_SECONDS.labels(stage='preprocess')
+SCALE_SECONDS = PREDICT_STAGE_SECONDS.labels(stage='scale')
+MODEL_SECONDS = PREDICT_STAGE_SECONDS.labels(stage='model')
+BATCH_PREPROCESS_SECONDS = PREDICT_STAGE_SECONDS.labels(stage='batch_preprocess')
+BATCH_MODEL_SECONDS = PREDICT_STAGE_SECONDS.labels(stage='batch_model')
+TABLE_LOOKUP_SECONDS = PREDICT_STAGE_SECONDS.labels(stage='table_lookup')
+BATCH_WAIT_SECONDS = PREDICT_STAGE_SECONDS.labels(stage='batch_wait')
+VALIDATE_SECONDS = PREDICT_STAGE_SECONDS.labels(stage='validate')
+PREDICT_SECONDS = PREDICT_STAGE_SECONDS.labels(stage='predict')
+DB_COMMIT_SECONDS = PREDICT_STAGE_SECONDS.labels(stage='db_commit')
+RENDER_SECONDS = PREDICT_STAGE_SECONDS.labels(stage='render')
+CACHE_HITS = PREDICTION_CACHE_LOOKUPS.labels(result='hit')
+CACHE_MISSES = PREDICTION_CACHE_LOOKUPS.labels(result='miss')
+FORMULA_FALLBACKS = PREDICTION_FALLBACKS.labels(predictor='formula')
+MINIMAL_FALLBACKS = PREDICTION_FALLBACKS.labels(predictor='minimal')
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
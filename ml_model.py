@@ -1,33 +1,617 @@
+import collections
+import hashlib
 import os
+import threading
+import time
 import joblib
 import pandas as pd
 import numpy as np
 import logging
+import warnings
+from concurrent.futures import Future
+
+from features import (NUMERIC_FEATURES, CATEGORICAL_FEATURES, HOUSE_FEATURES, NUMERIC_BOUNDS,
+                      MIN_PRICE, MAX_PRICE, make_cache_key)
+from prediction_cache import LRUPredictionCache, create_prediction_cache
+from inference_pool import InferencePool, InferenceTimeout, InferenceUnavailable
+from metrics import (CACHE_LOOKUP_SECONDS, PREPROCESS_SECONDS, SCALE_SECONDS, MODEL_SECONDS,
+                     BATCH_PREPROCESS_SECONDS, BATCH_MODEL_SECONDS, CACHE_HITS, CACHE_MISSES,
+                     TABLE_LOOKUP_SECONDS, BATCH_WAIT_SECONDS, MICRO_BATCH_SIZE, FORMULA_FALLBACKS,
+                     MINIMAL_FALLBACKS)
 
 logger = logging.getLogger(__name__)
 
+
+class PreprocessingPlan:
+    """Pandas-free version of preprocess_input plus scaling
+
+    Compiled once per loaded model: the column order is fixed, categories are
+    mapped through plain dicts built from each LabelEncoder's classes_, and a
+    StandardScaler is folded into one multiply-add over a float64 row. It
+    produces the same model input as preprocess_input followed by
+    scaler.transform.
+    """
+    
+    def __init__(self, columns, lookups, scale=None, offset=None):
+        self.columns = list(columns)
+        self.lookups = lookups
+        self.scale = scale
+        self.offset = offset
+        self._steps = list(zip(self.columns, self.lookups))
+    
+    @classmethod
+    def compile(cls, model, scaler, label_encoders, feature_columns):
+        """Build a plan, or return None if the components are not supported"""
+        from sklearn.preprocessing import StandardScaler
+        
+        if hasattr(model, 'feature_names_in_'):
+            columns = [str(col) for col in model.feature_names_in_]
+        else:
+            columns = list(feature_columns or [])
+        if not columns:
+            return None
+        
+        label_encoders = label_encoders or {}
+        lookups = []
+        for col in columns:
+            if col in CATEGORICAL_FEATURES and col in label_encoders:
+                classes = label_encoders[col].classes_
+                lookups.append({value: code for code, value in enumerate(classes)})
+            else:
+                lookups.append(None)
+        
+        if scaler is None:
+            return cls(columns, lookups)
+        
+        # Anything else keeps going through scaler.transform
+        if type(scaler) is not StandardScaler or not hasattr(scaler, 'n_features_in_'):
+            return None
+        if scaler.n_features_in_ != len(columns):
+            return None
+        if hasattr(scaler, 'feature_names_in_') and list(scaler.feature_names_in_) != columns:
+            return None
+        
+        mean = scaler.mean_ if scaler.with_mean else np.zeros(len(columns))
+        std = scaler.scale_ if scaler.with_std else np.ones(len(columns))
+        scale = 1.0 / np.asarray(std, dtype=np.float64)
+        offset = -np.asarray(mean, dtype=np.float64) * scale
+        return cls(columns, lookups, scale, offset)
+    
+    def transform(self, house_features):
+        """Encode and scale one house into a (1, n_features) float64 array
+
+        Raises TypeError or ValueError for values that are not numeric.
+        """
+        return self.scale_rows(self.encode(house_features)).reshape(1, -1)
+    
+    def encode(self, house_features):
+        """Encode one house into an unscaled float64 row"""
+        row = np.empty(len(self._steps), dtype=np.float64)
+        for i, (col, lookup) in enumerate(self._steps):
+            value = house_features.get(col, 0)
+            if lookup is not None:
+                # Unknown categories map to 0, same as preprocess_input
+                value = lookup.get(value, 0)
+            row[i] = value
+        return row
+    
+    def scale_rows(self, values):
+        """Apply the folded scaler to already encoded values"""
+        if self.scale is None:
+            return values
+        return values * self.scale + self.offset
+
+
+class LinearKernel:
+    """Linear model with the scaler folded into its weights
+
+    Scores encoded (unscaled) rows from a PreprocessingPlan with a single dot
+    product: price = row . weights + bias. This skips the input validation
+    and feature-name checks sklearn runs on every predict call.
+    """
+    
+    def __init__(self, weights, bias):
+        self.weights = weights
+        self.bias = bias
+    
+    @classmethod
+    def fold(cls, model, plan):
+        """Fold plan scaling into the model, or return None if it is not linear"""
+        coef = getattr(model, 'coef_', None)
+        intercept = getattr(model, 'intercept_', None)
+        if coef is None or intercept is None:
+            return None
+        
+        coef = np.asarray(coef, dtype=np.float64)
+        intercept = np.asarray(intercept, dtype=np.float64)
+        if coef.ndim == 2 and coef.shape[0] == 1:
+            coef = coef[0]
+        if coef.ndim != 1 or coef.shape[0] != len(plan.columns) or intercept.size != 1:
+            return None
+        
+        bias = float(intercept.ravel()[0])
+        if plan.scale is None:
+            return cls(coef.copy(), bias)
+        # (x * scale + offset) . coef + b  ==  x . (coef * scale) + (offset . coef + b)
+        return cls(coef * plan.scale, bias + float(plan.offset @ coef))
+    
+    def score(self, rows):
+        """Raw predictions for a row or a 2D array of encoded rows"""
+        return rows @ self.weights + self.bias
+    
+    def matches(self, model, plan):
+        """Parity check against model.predict on a few probe rows"""
+        n = len(plan.columns)
+        probes = np.vstack([np.zeros(n), np.ones(n), np.eye(n) * 3.0])
+        if plan.scale is not None:
+            # The scaler mean is a typical house
+            probes = np.vstack([probes, -plan.offset / plan.scale])
+        
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            expected = np.asarray(model.predict(plan.scale_rows(probes)), dtype=np.float64).ravel()
+        return np.allclose(self.score(probes), expected, rtol=1e-6, atol=1e-3)
+
+
+class TreeEnsembleEngine:
+    """Tree ensemble stored as flat NumPy arrays
+
+    All trees share contiguous feature/threshold/left/right/value arrays and
+    are evaluated level by level for every row at once. Leaves point back
+    to themselves, so every row simply takes max_depth steps. The object
+    holds nothing but arrays, so an artifact saved with
+    save_model_artifact can be joblib-loaded with mmap_mode='r' and every
+    worker maps the same read-only pages (sklearn's own trees copy their
+    nodes into private memory when unpickled).
+
+    Supports DecisionTreeRegressor, RandomForestRegressor,
+    ExtraTreesRegressor and GradientBoostingRegressor.
+    """
+    
+    # Rows evaluated per chunk, bounds the (rows, trees) index matrix
+    CHUNK_SIZE = 4096
+    
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth,
+                 scale=1.0, base=0.0, feature_names_in_=None, n_features_in_=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.scale = scale
+        self.base = base
+        self.n_features_in_ = n_features_in_
+        if feature_names_in_ is not None:
+            self.feature_names_in_ = feature_names_in_
+    
+    @classmethod
+    def from_sklearn(cls, model):
+        """Flatten a fitted sklearn tree ensemble, or return None if unsupported"""
+        name = type(model).__name__
+        if name == 'DecisionTreeRegressor':
+            trees, scale, base = [model], 1.0, 0.0
+        elif name in ('RandomForestRegressor', 'ExtraTreesRegressor'):
+            trees = list(model.estimators_)
+            scale, base = 1.0 / len(trees), 0.0
+        elif name == 'GradientBoostingRegressor':
+            trees = list(model.estimators_[:, 0])
+            scale = model.learning_rate
+            if model.init_ == 'zero':
+                base = 0.0
+            else:
+                zeros = np.zeros((1, model.n_features_in_))
+                base = float(np.ravel(model.init_.predict(zeros))[0])
+        else:
+            return None
+        
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in trees:
+            tree = estimator.tree_
+            if tree.n_outputs != 1:
+                return None
+            n = tree.node_count
+            nodes = np.arange(n)
+            leaf = tree.children_left < 0
+            
+            feature = tree.feature.astype(np.int32)
+            threshold = tree.threshold.astype(np.float64)
+            left = tree.children_left.astype(np.int64)
+            right = tree.children_right.astype(np.int64)
+            # Leaves loop back to themselves: feature 0, always go left
+            feature[leaf] = 0
+            threshold[leaf] = np.inf
+            left[leaf] = nodes[leaf]
+            right[leaf] = nodes[leaf]
+            
+            features.append(feature)
+            thresholds.append(threshold)
+            lefts.append((left + offset).astype(np.int32))
+            rights.append((right + offset).astype(np.int32))
+            values.append(tree.value[:, 0, 0].astype(np.float64))
+            roots.append(offset)
+            offset += n
+            max_depth = max(max_depth, tree.max_depth)
+        
+        return cls(
+            np.concatenate(features), np.concatenate(thresholds),
+            np.concatenate(lefts), np.concatenate(rights), np.concatenate(values),
+            np.asarray(roots, dtype=np.int32), int(max_depth), float(scale), float(base),
+            getattr(model, 'feature_names_in_', None), model.n_features_in_
+        )
+    
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        # sklearn compares float32 features against the thresholds
+        X = X.astype(np.float32).astype(np.float64)
+        
+        out = np.empty(len(X))
+        for start in range(0, len(X), self.CHUNK_SIZE):
+            chunk = X[start:start + self.CHUNK_SIZE]
+            rows = np.arange(len(chunk))[:, None]
+            nodes = np.broadcast_to(self.roots, (len(chunk), len(self.roots)))
+            for _ in range(self.max_depth):
+                go_left = chunk[rows, self.feature[nodes]] <= self.threshold[nodes]
+                nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+            out[start:start + len(chunk)] = self.value[nodes].sum(axis=1) * self.scale + self.base
+        return out
+    
+    def single_feature_trees(self):
+        """True if no tree splits on more than one feature (the ensemble is additive)"""
+        split = np.isfinite(self.threshold)
+        tree = np.searchsorted(self.roots, np.arange(len(self.feature)), side='right') - 1
+        pairs = np.unique(np.column_stack([tree[split], self.feature[split]]), axis=0)
+        return len(pairs) == 0 or np.bincount(pairs[:, 0]).max() <= 1
+    
+    def matches(self, model, n_probes=256):
+        """Parity check against model.predict on random probe rows"""
+        rng = np.random.default_rng(0)
+        probes = rng.normal(size=(n_probes, self.n_features_in_))
+        # Also probe exactly on the split points, where float32 rounding matters
+        split_rows = np.zeros((min(n_probes, len(self.feature)), self.n_features_in_))
+        split_rows[np.arange(len(split_rows)), self.feature[:len(split_rows)]] = \
+            np.where(np.isfinite(self.threshold[:len(split_rows)]), self.threshold[:len(split_rows)], 0)
+        probes = np.vstack([probes, split_rows])
+        
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            expected = np.asarray(model.predict(probes), dtype=np.float64).ravel()
+        return np.allclose(self.predict(probes), expected, rtol=1e-7, atol=1e-6)
+
+
+class PriceTable:
+    """Model output over the form's input domain, precomputed at load time
+
+    Every feature has a small domain: the whole numbers in NUMERIC_BOUNDS
+    or the label encoder's categories. Each feature gets a list indexed by
+    its domain position, so a prediction is a handful of list lookups:
+
+    - additive: price = bias + sum of per-feature contributions. Holds for
+      linear models and anything else that is a sum of one-feature terms
+      (e.g. boosted stumps); found by probing and then verified.
+    - dense: tree ensembles are constant between their split thresholds,
+      so each domain value maps to the threshold interval it falls in and
+      the model is tabulated once per combination of intervals, as long as
+      that stays under max_cells.
+
+    price() returns None for inputs outside the domain (fractional or out
+    of range numbers, odd types) so the caller can ask the model instead.
+    """
+    
+    # Rows per model.predict call while tabulating
+    CHUNK_SIZE = 65536
+    
+    def __init__(self, kind, steps, bias=0.0, grid=None):
+        self.kind = kind
+        self.steps = steps
+        self.bias = bias
+        self.grid = grid
+    
+    @classmethod
+    def build(cls, model, plan, max_cells=2000000, n_probes=2000, rtol=1e-6, atol=0.01):
+        """Tabulate model over plan's columns, or return None if it cannot"""
+        domains = cls._domains(plan)
+        if domains is None:
+            return None
+        
+        engine = model if isinstance(model, TreeEnsembleEngine) else TreeEnsembleEngine.from_sklearn(model)
+        # Trees that each split on a single feature always add up; any other
+        # tree ensemble has interactions the probes could miss, so it has to
+        # be tabulated densely. Other models are judged by the probes alone.
+        if engine is None or engine.single_feature_trees():
+            table = cls._additive(model, plan, domains)
+            if table.matches(model, plan, domains, n_probes, rtol, atol):
+                return table
+        if engine is None:
+            return None
+        
+        table = cls._dense(model, engine, plan, domains, max_cells)
+        if table is not None and not table.matches(model, plan, domains, n_probes, rtol, atol):
+            logger.warning("Dense price table does not match model.predict, not using it")
+            return None
+        return table
+    
+    @staticmethod
+    def _domains(plan):
+        """Per column: (name, lookup, low, encoded values), or None if unbounded"""
+        domains = []
+        for col, lookup in zip(plan.columns, plan.lookups):
+            if lookup is not None:
+                values = np.arange(max(lookup.values(), default=0) + 1, dtype=np.float64)
+                domains.append((col, lookup, 0, values))
+            elif col in NUMERIC_BOUNDS:
+                low, high = NUMERIC_BOUNDS[col]
+                domains.append((col, None, low, np.arange(low, high + 1, dtype=np.float64)))
+            else:
+                return None
+        return domains
+    
+    @staticmethod
+    def _predict(model, plan, rows):
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            return np.asarray(model.predict(plan.scale_rows(rows)), dtype=np.float64).ravel()
+    
+    @classmethod
+    def _additive(cls, model, plan, domains):
+        base = np.array([values[len(values) // 2] for _, _, _, values in domains])
+        rows = [base]
+        for i, (_, _, _, values) in enumerate(domains):
+            varied = np.tile(base, (len(values), 1))
+            varied[:, i] = values
+            rows.append(varied)
+        predictions = cls._predict(model, plan, np.vstack(rows))
+        bias = float(predictions[0])
+        
+        steps, start = [], 1
+        for col, lookup, low, values in domains:
+            contributions = predictions[start:start + len(values)] - bias
+            steps.append((col, lookup, low, contributions.tolist()))
+            start += len(values)
+        return cls('additive', steps, bias)
+    
+    @classmethod
+    def _dense(cls, model, engine, plan, domains, max_cells):
+        interval_ids, representatives = [], []
+        for i, (_, _, _, values) in enumerate(domains):
+            split = engine.threshold[(engine.feature == i) & np.isfinite(engine.threshold)]
+            column = np.zeros((len(values), len(domains)))
+            column[:, i] = values
+            # Compared the way sklearn does, as float32 against the thresholds
+            scaled = plan.scale_rows(column)[:, i].astype(np.float32).astype(np.float64)
+            interval = np.searchsorted(np.unique(split), scaled, side='left')
+            _, first, ids = np.unique(interval, return_index=True, return_inverse=True)
+            interval_ids.append(ids)
+            representatives.append(values[first])
+        
+        shape = [len(r) for r in representatives]
+        cells = int(np.prod(shape, dtype=np.float64))
+        if cells > max_cells:
+            logger.info(f"Dense price table would need {cells:,} cells (limit {max_cells:,}), not building it")
+            return None
+        
+        grid = np.empty(cells)
+        for start in range(0, cells, cls.CHUNK_SIZE):
+            index = np.unravel_index(np.arange(start, min(start + cls.CHUNK_SIZE, cells)), shape)
+            rows = np.column_stack([r[idx] for r, idx in zip(representatives, index)])
+            grid[start:start + len(rows)] = cls._predict(model, plan, rows)
+        
+        # Row-major strides folded into the per-value lists, so lookups just add
+        strides = np.cumprod([1] + shape[:0:-1])[::-1]
+        steps = [(col, lookup, low, (ids * stride).tolist())
+                 for (col, lookup, low, _), ids, stride in zip(domains, interval_ids, strides)]
+        return cls('dense', steps, grid=grid)
+    
+    def price(self, house_features):
+        """Raw model output for one house, or None if it is outside the table"""
+        total = 0
+        try:
+            for col, lookup, low, values in self.steps:
+                value = house_features.get(col, 0)
+                if lookup is not None:
+                    # Unknown categories map to 0, same as preprocess_input
+                    total += values[lookup.get(value, 0)]
+                    continue
+                if not isinstance(value, (int, float, np.number)) or isinstance(value, bool):
+                    return None
+                index = int(value) - low
+                if index < 0 or index + low != value:
+                    return None
+                total += values[index]
+        except (TypeError, ValueError, OverflowError, IndexError):
+            return None
+        if self.grid is not None:
+            return float(self.grid[total])
+        return self.bias + total
+    
+    def matches(self, model, plan, domains, n_probes, rtol, atol):
+        """Parity check against model.predict on random rows of the domain"""
+        rng = np.random.default_rng(0)
+        rows = np.column_stack([rng.choice(values, n_probes) for _, _, _, values in domains])
+        # Probe through price() with the raw values a request would carry
+        decoders = [int if lookup is None else {code: value for value, code in lookup.items()}.get
+                    for _, lookup, _, _ in domains]
+        columns = [col for col, _, _, _ in domains]
+        prices = np.array([
+            self.price({col: decode(int(value)) for col, decode, value in zip(columns, decoders, row)})
+            for row in rows
+        ], dtype=np.float64)
+        return np.allclose(prices, self._predict(model, plan, rows), rtol=rtol, atol=atol)
+    
+    @property
+    def nbytes(self):
+        """Approximate memory held by the tables"""
+        # A list slot is 8 bytes; a distinct float object 24, ints below 257 are shared
+        size = self.grid.nbytes if self.grid is not None else 0
+        for _, _, _, values in self.steps:
+            size += 8 * len(values) + sum(24 for v in values if isinstance(v, float) or v > 256)
+        return size
+
+
+class MicroBatcher:
+    """Coalesces concurrent single predictions into one vectorized call
+
+    submit() queues a house and returns a Future. A worker thread takes
+    the first waiting house, keeps collecting until max_batch houses are
+    queued or max_wait seconds have passed, then scores them all with one
+    score_batch call (a list of houses in, a list of (price, error) out)
+    and resolves the futures. The thread is started on demand in each
+    process and exits after idle_timeout seconds without work, so forked
+    workers and replaced predictors don't keep threads around.
+    """
+    
+    def __init__(self, score_batch, max_batch=32, max_wait=0.002, idle_timeout=5.0):
+        self.score_batch = score_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.idle_timeout = idle_timeout
+        self._pending = collections.deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._pid = None
+    
+    def submit(self, house_features):
+        future = Future()
+        with self._cond:
+            self._pending.append((house_features, future, time.perf_counter()))
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+                self._thread.start()
+            elif len(self._pending) == 1 or len(self._pending) >= self.max_batch:
+                # Only the first house and a full batch change what the worker does
+                self._cond.notify()
+        return future
+    
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._pending:
+                    self._cond.wait(self.idle_timeout)
+                    if not self._pending:
+                        self._thread = None
+                        return
+                deadline = time.monotonic() + self.max_wait
+                while len(self._pending) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = [self._pending.popleft() for _ in range(min(len(self._pending), self.max_batch))]
+            self._score(batch)
+    
+    def _score(self, batch):
+        start = time.perf_counter()
+        for _, _, queued in batch:
+            BATCH_WAIT_SECONDS.observe(start - queued)
+        MICRO_BATCH_SIZE.observe(len(batch))
+        try:
+            results = self.score_batch([house for house, _, _ in batch])
+        except Exception as e:
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+        for (_, future, _), result in zip(batch, results):
+            future.set_result(result)
+
+
+def save_model_artifact(path, model_data, flatten_trees=True):
+    """Save a model artifact that workers can memory-map
+
+    model_data is the usual dict (model, scaler, label_encoders,
+    feature_columns, ...). Supported tree ensembles are replaced by a
+    TreeEnsembleEngine, and the file is written uncompressed because
+    joblib can only memory-map uncompressed arrays.
+    """
+    model_data = dict(model_data)
+    if flatten_trees:
+        engine = TreeEnsembleEngine.from_sklearn(model_data['model'])
+        if engine is not None:
+            model_data['model'] = engine
+    joblib.dump(model_data, path, compress=0)
+    return path
+
+
 class HousePricePredictor:
-    def __init__(self, model_path='models/house_price_model.joblib'):
-        """Initialize with your existing trained model"""
+    # Batches at least this large go to the sklearn trees kept by tree_engine
+    TREE_ENGINE_MAX_BATCH = 32
+    INFERENCE_BACKENDS = ('local', 'process')
+    
+    def __init__(self, model_path='models/house_price_model.joblib', fold_linear=True,
+                 cache_size=0, cache_ttl=None, version=None, mmap_mode=None,
+                 tree_engine=False, price_table=False, price_table_max_cells=2000000,
+                 inference_backend='local', inference_processes=2, inference_timeout=1.0):
+        """Initialize with your existing trained model
+
+        fold_linear scores linear models with a LinearKernel instead of
+        model.predict. cache_size > 0 puts an LRUPredictionCache in front of
+        predict_price, with entries expiring after cache_ttl seconds.
+        version names the model (e.g. its registry version); by default
+        it is derived from the artifact. mmap_mode='r' memory-maps the
+        artifact's arrays so workers share them (see save_model_artifact).
+        tree_engine flattens sklearn tree ensembles into a TreeEnsembleEngine
+        at load time; batches of TREE_ENGINE_MAX_BATCH rows or more still
+        use sklearn's compiled traversal, which wins on large inputs.
+        price_table precomputes a PriceTable over the form's input domain
+        at load time (dense tables up to price_table_max_cells entries);
+        predict_price then answers in-domain houses from it.
+        inference_backend='process' runs model.predict in an InferencePool
+        of inference_processes processes, falling back to the formula when
+        no answer comes within inference_timeout seconds. Table lookups and
+        folded linear models are cheap enough to stay in-process.
+        """
+        if inference_backend not in self.INFERENCE_BACKENDS:
+            raise ValueError(f"Unknown inference backend: {inference_backend}")
         self.model_path = model_path
+        self.version = version
+        self.mmap_mode = mmap_mode
+        self.tree_engine = tree_engine
+        self.price_table = price_table
+        self.price_table_max_cells = price_table_max_cells
+        self.inference_backend = inference_backend
+        self.inference_processes = inference_processes
+        self.inference_timeout = inference_timeout
+        self.fold_linear = fold_linear
+        self.cache = LRUPredictionCache(cache_size, cache_ttl) if cache_size > 0 else None
         self.model_data = None
         self.model = None
         self.scaler = None
         self.label_encoders = None
         self.feature_columns = None
+        self.model_version = None
+        self._plan = None
+        self._linear = None
+        self._sklearn_trees = None
+        self._table = None
+        self.batcher = None
+        self.inference_pool = None
         
         logger.info(f"Loading trained model from: {model_path}")
         self.load_model()
     
     def load_model(self):
         """Load your existing trained model"""
+        self._plan = None
+        self._linear = None
+        self._sklearn_trees = None
+        self._table = None
+        if self.cache is not None and not self.cache.shared:
+            # Cached prices belong to the previous model. Shared caches
+            # check model_version on every lookup instead.
+            self.cache.clear()
         try:
             if not os.path.exists(self.model_path):
                 logger.warning(f"Model file not found: {self.model_path}")
                 return False
             
             logger.info("Loading trained model...")
-            self.model_data = joblib.load(self.model_path)
+            self.model_data = joblib.load(self.model_path, mmap_mode=self.mmap_mode)
+            self.model_version = self.version or self._artifact_version()
             
             # Handle different model file structures
             if isinstance(self.model_data, dict):
@@ -52,12 +636,185 @@ class HousePricePredictor:
             if hasattr(self.model, 'feature_names_in_'):
                 logger.info(f"Model expects {len(self.model.feature_names_in_)} features")
             
+            if self.tree_engine:
+                self._flatten_trees()
+            self._compile_plan()
+            if self.price_table and self._plan is not None:
+                self._build_price_table()
+            if self.inference_backend == 'process':
+                self._start_inference_pool()
             return True
             
         except Exception as e:
             logger.error(f"Error loading model: {e}")
             return False
     
+    def _flatten_trees(self):
+        """Swap a sklearn tree ensemble for a TreeEnsembleEngine if it matches"""
+        try:
+            engine = TreeEnsembleEngine.from_sklearn(self.model)
+            if engine is None:
+                return
+            if not engine.matches(self.model):
+                logger.warning("Flattened trees do not match model.predict, not using them")
+                return
+        except Exception as e:
+            logger.warning(f"Could not flatten tree ensemble: {e}")
+            return
+        
+        logger.info(f"Flattened {len(engine.roots)} trees ({len(engine.feature)} nodes)")
+        self._sklearn_trees = self.model
+        self.model = engine
+    
+    def _build_price_table(self):
+        """Precompute a PriceTable for the loaded model if one fits"""
+        start = time.perf_counter()
+        try:
+            table = PriceTable.build(self.model, self._plan, self.price_table_max_cells)
+        except Exception as e:
+            logger.warning(f"Could not build price table: {e}")
+            return
+        if table is None:
+            logger.info("Model does not fit a price table, predicting with the model")
+            return
+        
+        self._table = table
+        logger.info(f"Built {table.kind} price table ({table.nbytes / 2 ** 20:.1f} MiB) "
+                    f"in {time.perf_counter() - start:.2f}s")
+    
+    def _start_inference_pool(self):
+        """Replace the InferencePool with one for the artifact just loaded"""
+        if self.inference_pool is not None:
+            self.inference_pool.close()
+        # The processes start in the background on the first prediction (or
+        # start_inference), in the process serving it
+        self.inference_pool = InferencePool(
+            self.model_path,
+            {'version': self.model_version, 'mmap_mode': self.mmap_mode, 'tree_engine': self.tree_engine},
+            self.inference_processes, self.inference_timeout
+        )
+    
+    def start_inference(self, wait=False):
+        """Start the inference processes ahead of the first prediction
+        
+        wait=True blocks until they are up. Returns True when predictions
+        can use the model, i.e. the pool is ready or there is none.
+        """
+        if self.inference_pool is None:
+            return True
+        return self.inference_pool.start(wait)
+    
+    def close(self):
+        """Stop the inference processes, if any (after queued work finishes)"""
+        if self.inference_pool is not None:
+            self.inference_pool.close()
+    
+    def _artifact_version(self):
+        """Version stamp for cached predictions: the artifact's content hash"""
+        if isinstance(self.model_data, dict) and self.model_data.get('version'):
+            return str(self.model_data['version'])
+        
+        digest = hashlib.sha256()
+        with open(self.model_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        return digest.hexdigest()[:16]
+    
+    def _compile_plan(self):
+        """Compile the preprocessing steps into a PreprocessingPlan"""
+        try:
+            self._plan = PreprocessingPlan.compile(
+                self.model, self.scaler, self.label_encoders, self.feature_columns
+            )
+        except Exception as e:
+            logger.warning(f"Could not compile preprocessing plan: {e}")
+            self._plan = None
+        
+        if self._plan is None:
+            logger.info("Using pandas preprocessing path")
+        else:
+            logger.info(f"Compiled preprocessing plan for {len(self._plan.columns)} features")
+        
+        self._linear = None
+        if self._plan is not None and self.fold_linear:
+            self._fold_linear_model()
+    
+    def _fold_linear_model(self):
+        """Fold a linear model into a LinearKernel if it passes the parity check"""
+        try:
+            kernel = LinearKernel.fold(self.model, self._plan)
+            if kernel is None:
+                return
+            if not kernel.matches(self.model, self._plan):
+                logger.warning("Folded linear model does not match model.predict, not using it")
+                return
+        except Exception as e:
+            logger.warning(f"Could not fold linear model: {e}")
+            return
+        
+        self._linear = kernel
+        logger.info("Linear model folded into a single dot product")
+    
+    def configure(self, fold_linear=None, cache_size=None, cache_ttl=None,
+                  cache_backend='memory', cache_path=None, batch_window=None, max_batch=32):
+        """Apply runtime options, recompiling when they change
+
+        batch_window > 0 sends predict_price cache misses through a
+        MicroBatcher that waits up to batch_window seconds for up to
+        max_batch concurrent requests; 0 turns it off.
+        """
+        if fold_linear is not None and fold_linear != self.fold_linear:
+            self.fold_linear = fold_linear
+            if self.model is not None:
+                self._compile_plan()
+            if self.cache is not None and not self.cache.shared:
+                self.cache.clear()
+        
+        if cache_size is not None:
+            self.cache = create_prediction_cache(cache_backend, cache_size, cache_ttl, cache_path)
+        
+        if batch_window is not None:
+            self.batcher = MicroBatcher(self._score_houses, max_batch, batch_window) if batch_window > 0 else None
+    
+    def cache_stats(self):
+        """Hit/miss/eviction counters of the prediction cache, or None"""
+        return self.cache.stats() if self.cache is not None else None
+    
+    def _table_price(self, house_features):
+        """Raw price from the precomputed PriceTable, or None if not covered"""
+        if self._table is None:
+            return None
+        start = time.perf_counter()
+        price = self._table.price(house_features)
+        TABLE_LOOKUP_SECONDS.observe(time.perf_counter() - start)
+        return price
+    
+    def _compiled_price(self, house_features):
+        """Raw price from the folded linear kernel, or None if not available"""
+        if self._linear is None:
+            return None
+        start = time.perf_counter()
+        try:
+            row = self._plan.encode(house_features)
+        except (TypeError, ValueError):
+            return None
+        encoded = time.perf_counter()
+        price = float(self._linear.score(row))
+        PREPROCESS_SECONDS.observe(encoded - start)
+        MODEL_SECONDS.observe(time.perf_counter() - encoded)
+        # NaN/inf inputs go through model.predict, which rejects them
+        return price if np.isfinite(price) else None
+    
+    def _compiled_input(self, house_features):
+        """Scaled model input from the compiled plan, or None to use preprocess_input"""
+        if self._plan is None:
+            return None
+        try:
+            return self._plan.transform(house_features)
+        except (TypeError, ValueError):
+            # Let the pandas path decide what to do with odd values
+            return None
+    
     def _create_default_preprocessing(self):
         """Create default preprocessing for models without explicit preprocessing"""
         from sklearn.preprocessing import StandardScaler, LabelEncoder
@@ -86,7 +843,7 @@ class HousePricePredictor:
         dummy_data = np.random.randn(10, len(self.feature_columns))
         self.scaler.fit(dummy_data)
         
-        print("⚙️ Created default preprocessing components")
+        logger.info("Created default preprocessing components")
     
     def _create_binary_encoder(self):
         """Create encoder for yes/no features"""
@@ -107,7 +864,7 @@ class HousePricePredictor:
         try:
             # Create DataFrame
             input_df = pd.DataFrame([house_features])
-            print(f"🔄 Preprocessing: {house_features}")
+            logger.debug("Preprocessing: %s", house_features)
             
             # Handle categorical encoding
             categorical_features = ['mainroad', 'guestroom', 'basement', 'hotwaterheating',
@@ -118,7 +875,7 @@ class HousePricePredictor:
                     try:
                         input_df[col] = self.label_encoders[col].transform(input_df[col])
                     except ValueError as e:
-                        print(f"⚠️ Unknown category in {col}: {input_df[col].iloc[0]}")
+                        logger.warning("Unknown category in %s: %r", col, input_df[col].iloc[0])
                         # Use most common value as fallback
                         if col == 'furnishingstatus':
                             input_df[col] = 0  # unfurnished
@@ -139,59 +896,248 @@ class HousePricePredictor:
                 # Use our default order
                 input_df = input_df[self.feature_columns]
             
-            print(f"✅ Preprocessed shape: {input_df.shape}")
+            logger.debug("Preprocessed shape: %s", input_df.shape)
             return input_df
             
         except Exception as e:
-            print(f"❌ Preprocessing error: {e}")
+            logger.error(f"Preprocessing error: {e}")
             return None
     
     def predict_price(self, house_features):
         """Make prediction using your trained model"""
+        cache = self.cache
+        if cache is None or not self.model:
+            return self._predict_uncached(house_features)
+        
+        key = make_cache_key(house_features)
+        if key is None:
+            return self._predict_uncached(house_features)
+        
+        start = time.perf_counter()
+        price = cache.get(key, self.model_version)
+        CACHE_LOOKUP_SECONDS.observe(time.perf_counter() - start)
+        if price is not None:
+            CACHE_HITS.inc()
+            return price, None
+        CACHE_MISSES.inc()
+        
+        price, error = self._predict_uncached(house_features)
+        # Fallback prices are not cached so the model gets another chance
+        if error is None:
+            cache.put(key, price, self.model_version)
+        return price, error
+    
+    def _predict_uncached(self, house_features):
+        """_predict_price, through the micro-batcher when one is configured"""
+        batcher = self.batcher
+        if batcher is None or not self.model:
+            return self._predict_price(house_features)
+        # A table lookup is cheaper than any wait for company
+        price = self._table_price(house_features)
+        if price is not None:
+            return max(MIN_PRICE, min(MAX_PRICE, price)), None
+        return batcher.submit(house_features).result()
+    
+    def _score_houses(self, houses):
+        """Price a list of houses with one model call (the micro-batcher's scorer)
+
+        Returns (price, error) per house like predict_price. Houses the
+        compiled plan cannot encode, and every house if the model call
+        fails, go through _predict_price one by one.
+        """
+        if self._plan is None:
+            return self.predict_batch(houses)
+        
+        results = [None] * len(houses)
+        rows, index = [], []
+        start = time.perf_counter()
+        for i, house in enumerate(houses):
+            try:
+                rows.append(self._plan.encode(house))
+                index.append(i)
+            except (TypeError, ValueError):
+                results[i] = self._predict_price(house)
+        BATCH_PREPROCESS_SECONDS.observe(time.perf_counter() - start)
+        if not rows:
+            return results
+        
+        start = time.perf_counter()
+        try:
+            values = np.vstack(rows)
+            if self._linear is not None:
+                prices = self._linear.score(values)
+            else:
+                prices = self._model_predict(self._plan.scale_rows(values))
+        except (InferenceTimeout, InferenceUnavailable) as e:
+            # Retrying one by one would wait out the timeout for every house
+            logger.warning(f"Micro-batch of {len(rows)} using fallback formula: {e}")
+            return [result or self._fallback_prediction(house) for house, result in zip(houses, results)]
+        except Exception as e:
+            logger.warning(f"Micro-batch of {len(rows)} failed, predicting one by one: {e}")
+            return [result or self._predict_price(house) for house, result in zip(houses, results)]
+        BATCH_MODEL_SECONDS.observe(time.perf_counter() - start)
+        
+        for i, price in zip(index, prices.tolist()):
+            if np.isfinite(price):
+                results[i] = (max(MIN_PRICE, min(MAX_PRICE, price)), None)
+            else:
+                # NaN/inf inputs go through model.predict, which rejects them
+                results[i] = self._predict_price(houses[i])
+        return results
+    
+    def _model_predict(self, scaled_input):
+        """model.predict as a flat float array, in the inference pool if configured"""
+        if self.inference_pool is not None:
+            return self.inference_pool.predict(np.asarray(scaled_input, dtype=np.float64))
+        model = self.model
+        if self._sklearn_trees is not None and len(scaled_input) >= self.TREE_ENGINE_MAX_BATCH:
+            model = self._sklearn_trees
+        return np.asarray(model.predict(scaled_input), dtype=float).ravel()
+    
+    def _predict_price(self, house_features):
+        """predict_price without the cache"""
         if not self.model:
             return self._fallback_prediction(house_features)
         
         try:
-            print(f"🤖 Using your trained model for prediction")
-            
-            # Preprocess input
-            processed_input = self.preprocess_input(house_features)
-            if processed_input is None:
-                return self._fallback_prediction(house_features)
-            
-            # Scale if scaler exists
-            if self.scaler is not None:
-                try:
-                    scaled_input = self.scaler.transform(processed_input)
-                    print("📊 Input scaled successfully")
-                except:
-                    print("⚠️ Scaling failed, using raw input")
-                    scaled_input = processed_input.values
-            else:
-                scaled_input = processed_input.values
+            # In-domain houses are a few lookups in the price table,
+            # linear models otherwise a single dot product
+            price = self._table_price(house_features)
+            if price is None:
+                price = self._compiled_price(house_features)
             
-            # Make prediction
-            prediction = self.model.predict(scaled_input)
+            if price is None:
+                # Compiled fast path, no pandas involved (scaling included)
+                start = time.perf_counter()
+                scaled_input = self._compiled_input(house_features)
             
-            # Handle different prediction formats
-            if isinstance(prediction, np.ndarray):
-                price = float(prediction[0])
-            else:
-                price = float(prediction)
+                if scaled_input is None:
+                    # Preprocess input
+                    processed_input = self.preprocess_input(house_features)
+                    if processed_input is None:
+                        return self._fallback_prediction(house_features)
+                    PREPROCESS_SECONDS.observe(time.perf_counter() - start)
+            
+                    # Scale if scaler exists
+                    start = time.perf_counter()
+                    if self.scaler is not None:
+                        try:
+                            scaled_input = self.scaler.transform(processed_input)
+                            logger.debug("Input scaled successfully")
+                        except:
+                            logger.warning("Scaling failed, using raw input")
+                            scaled_input = processed_input.values
+                    else:
+                        scaled_input = processed_input.values
+                    SCALE_SECONDS.observe(time.perf_counter() - start)
+                else:
+                    PREPROCESS_SECONDS.observe(time.perf_counter() - start)
+            
+                # Make prediction
+                start = time.perf_counter()
+                price = float(self._model_predict(scaled_input)[0])
+                MODEL_SECONDS.observe(time.perf_counter() - start)
             
             # Ensure reasonable range
-            price = max(50000, min(2000000, price))
+            price = max(MIN_PRICE, min(MAX_PRICE, price))
             
-            print(f"✅ Your model predicted: ${price:,.2f}")
+            logger.debug("Model predicted %.2f", price)
             return price, None
             
         except Exception as e:
-            print(f"⚠️ Your model prediction failed: {e}")
-            print(f"🔄 Falling back to formula-based prediction")
+            logger.warning(f"Model prediction failed, using fallback formula: {e}")
             return self._fallback_prediction(house_features)
     
+    def predict_batch(self, houses):
+        """Predict prices for many houses in one vectorized pass
+
+        Accepts a list of feature dicts or a DataFrame and returns a list of
+        (price, error) tuples in input order, like predict_price. Rows the
+        model cannot score use the fallback formula individually.
+        """
+        if isinstance(houses, pd.DataFrame):
+            input_df = houses.reset_index(drop=True)
+        else:
+            input_df = pd.DataFrame(list(houses))
+        
+        if input_df.empty:
+            return []
+        
+        if not self.model:
+            return [self._fallback_prediction(h) for h in input_df.to_dict('records')]
+        
+        try:
+            start = time.perf_counter()
+            processed_input = self._preprocess_frame(input_df)
+            valid = processed_input.notna().all(axis=1).to_numpy()
+            BATCH_PREPROCESS_SECONDS.observe(time.perf_counter() - start)
+            
+            start = time.perf_counter()
+            prices = np.empty(len(processed_input))
+            if valid.any() and self._linear is not None:
+                prediction = self._linear.score(processed_input[valid].to_numpy(dtype=np.float64))
+                prices[valid] = np.clip(prediction, MIN_PRICE, MAX_PRICE)
+            elif valid.any():
+                prediction = self._model_predict(self._scale(processed_input[valid]))
+                prices[valid] = np.clip(prediction, MIN_PRICE, MAX_PRICE)
+            BATCH_MODEL_SECONDS.observe(time.perf_counter() - start)
+        except Exception as e:
+            logger.warning(f"Batch prediction failed, using fallback for all rows: {e}")
+            return [self._fallback_prediction(h) for h in input_df.to_dict('records')]
+        
+        results = []
+        for i, ok in enumerate(valid):
+            if ok:
+                results.append((float(prices[i]), None))
+            else:
+                results.append(self._fallback_prediction(input_df.iloc[i].to_dict()))
+        
+        if not valid.all():
+            logger.info(f"Batch prediction: {int((~valid).sum())} of {len(valid)} rows used fallback")
+        return results
+    
+    def _preprocess_frame(self, input_df):
+        """Vectorized preprocess_input for many rows
+
+        Returns a float DataFrame in model feature order. Values that are not
+        numeric are left as NaN so the caller can route those rows to the
+        fallback.
+        """
+        input_df = input_df.copy()
+        
+        for col in CATEGORICAL_FEATURES:
+            if col in input_df.columns and col in self.label_encoders:
+                classes = self.label_encoders[col].classes_
+                codes = {value: code for code, value in enumerate(classes)}
+                # Unknown categories map to 0, same as preprocess_input
+                input_df[col] = input_df[col].map(codes).fillna(0)
+        
+        for col in self.feature_columns:
+            if col not in input_df.columns:
+                input_df[col] = 0
+        
+        if hasattr(self.model, 'feature_names_in_'):
+            input_df = input_df.reindex(columns=self.model.feature_names_in_, fill_value=0)
+        else:
+            input_df = input_df[self.feature_columns]
+        
+        return input_df.apply(pd.to_numeric, errors='coerce').astype(float)
+    
+    def _scale(self, processed_input):
+        """Apply the scaler, falling back to raw values like predict_price"""
+        if self._plan is not None:
+            return self._plan.scale_rows(processed_input.to_numpy(dtype=np.float64))
+        if self.scaler is None:
+            return processed_input.values
+        try:
+            return self.scaler.transform(processed_input)
+        except Exception as e:
+            logger.warning(f"Scaling failed, using raw input: {e}")
+            return processed_input.values
+    
     def _fallback_prediction(self, house_features):
         """Fallback prediction when your model fails"""
+        FORMULA_FALLBACKS.inc()
         try:
             area = int(house_features.get('area', 2000))
             bedrooms = int(house_features.get('bedrooms', 3))
@@ -212,25 +1158,35 @@ class HousePricePredictor:
             total = base_price + area_price + room_bonus + bonuses
             total = max(120000, min(900000, total))
             
-            print(f"🧮 Fallback prediction: ${total:,.2f}")
+            logger.debug("Fallback prediction %.2f", total)
             return float(total), "Fallback prediction used"
             
         except Exception as e:
-            print(f"❌ Fallback failed: {e}")
+            logger.error(f"Fallback failed: {e}")
             return 275000.0, "Default prediction used"
 
-# Initialize with your trained model
-try:
-    predictor = HousePricePredictor()
-    print("🚀 Your trained model predictor initialized")
-except Exception as e:
-    print(f"❌ Initialization failed: {e}")
-    
-    # Minimal fallback
-    class MinimalPredictor:
-        def predict_price(self, house_features):
-            area = house_features.get('area', 2000)
-            return float(200000 + area * 140), "Minimal predictor active"
-    
-    predictor = MinimalPredictor()
-    print("🔄 Using minimal predictor as fallback")
+
+class MinimalPredictor:
+    """Stand-in when HousePricePredictor cannot even be constructed"""
+    
+    def predict_price(self, house_features):
+        MINIMAL_FALLBACKS.inc()
+        area = house_features.get('area', 2000)
+        return float(200000 + area * 140), "Minimal predictor active"
+    
+    def configure(self, **options):
+        pass
+    
+    def cache_stats(self):
+        return None
+    
+    def start_inference(self, wait=False):
+        return True
+    
+    def close(self):
+        pass
+    
+    def predict_batch(self, houses):
+        if hasattr(houses, 'to_dict'):
+            houses = houses.to_dict('records')
+        return [self.predict_price(h) for h in houses]
@@ -0,0 +1,193 @@
+"""Versioned model artifacts and zero-downtime hot reload
+
+A registry is a directory of joblib artifacts plus manifest.json:
+
+    {
+      "current": "2025-08-01",
+      "versions": {
+        "2025-08-01": {"file": "model-2025-08-01.joblib", "sha256": "...",
+                       "published_at": "2025-08-01T09:00:00"}
+      }
+    }
+
+Workers poll the manifest. When "current" changes they load the new
+artifact in a background thread, smoke-test it and then swap it in, so
+requests keep using the old predictor until the new one is ready.
+"""
+import hashlib
+import json
+import logging
+import math
+import os
+import shutil
+import tempfile
+import threading
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = 'manifest.json'
+
+# Scored by every candidate model before it is swapped in
+SMOKE_TEST_HOUSE = {
+    'area': 2400,
+    'bedrooms': 3,
+    'bathrooms': 2,
+    'stories': 2,
+    'parking': 1,
+    'mainroad': 'yes',
+    'guestroom': 'no',
+    'basement': 'yes',
+    'hotwaterheating': 'no',
+    'airconditioning': 'yes',
+    'prefarea': 'no',
+    'furnishingstatus': 'semi-furnished'
+}
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ModelRegistry:
+    """Directory of versioned model artifacts with a manifest"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, MANIFEST)
+
+    def manifest(self):
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'current': None, 'versions': {}}
+
+    def current(self):
+        """(version, artifact path) of the active model, or (None, None)"""
+        manifest = self.manifest()
+        version = manifest.get('current')
+        if not version:
+            return None, None
+        entry = manifest['versions'][version]
+        return version, os.path.join(self.directory, entry['file'])
+
+    def publish(self, artifact_path, version=None, activate=True):
+        """Copy an artifact into the registry and optionally make it current"""
+        os.makedirs(self.directory, exist_ok=True)
+        version = version or datetime.utcnow().strftime('%Y%m%d%H%M%S')
+        manifest = self.manifest()
+        if version in manifest['versions']:
+            raise ValueError(f"Model version {version} is already published")
+
+        extension = os.path.splitext(artifact_path)[1] or '.joblib'
+        filename = f"model-{version}{extension}"
+        target = os.path.join(self.directory, filename)
+        # Copy under a temporary name so a watcher never sees half a file
+        shutil.copyfile(artifact_path, target + '.tmp')
+        os.replace(target + '.tmp', target)
+
+        manifest['versions'][version] = {
+            'file': filename,
+            'sha256': file_sha256(target),
+            'published_at': datetime.utcnow().isoformat(timespec='seconds')
+        }
+        if activate:
+            manifest['current'] = version
+        self._write_manifest(manifest)
+        return version
+
+    def activate(self, version):
+        """Point the registry at an already published version (e.g. a rollback)"""
+        manifest = self.manifest()
+        if version not in manifest['versions']:
+            raise ValueError(f"Unknown model version: {version}")
+        manifest['current'] = version
+        self._write_manifest(manifest)
+
+    def _write_manifest(self, manifest):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.manifest-')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+
+class ModelWatcher:
+    """Background thread that hot-swaps the predictor when the registry changes
+
+    load(path, version) builds a predictor and swap(predictor) publishes
+    it. Both run on the watcher thread, never on a request thread.
+    """
+
+    def __init__(self, registry, load, swap, interval=10.0):
+        self.registry = registry
+        self.load = load
+        self.swap = swap
+        self.interval = interval
+        self.version = None
+        self._failed_version = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def check(self):
+        """Poll the manifest once; returns True if a new model was swapped in"""
+        try:
+            version, path = self.registry.current()
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Could not read model registry: {e}")
+            return False
+        if version is None or version in (self.version, self._failed_version):
+            return False
+
+        logger.info(f"Loading model version {version} from {path}")
+        candidate = None
+        try:
+            candidate = self.load(path, version)
+            # Inference processes, if any, must be up before it takes traffic
+            if hasattr(candidate, 'start_inference') and not candidate.start_inference(wait=True):
+                raise RuntimeError("inference processes did not start")
+            self.smoke_test(candidate)
+        except Exception as e:
+            # Keep serving the current model and don't retry this version
+            logger.error(f"Model version {version} rejected: {e}")
+            self._failed_version = version
+            if candidate is not None:
+                candidate.close()
+            return False
+
+        self.swap(candidate)
+        self.version = version
+        logger.info(f"Now serving model version {version}")
+        return True
+
+    @staticmethod
+    def smoke_test(predictor):
+        if getattr(predictor, 'model', None) is None:
+            raise ValueError("artifact did not load a model")
+
+        price, error = predictor.predict_price(dict(SMOKE_TEST_HOUSE))
+        if error is not None or not math.isfinite(price):
+            raise ValueError(f"smoke prediction failed: {error}")
+
+        batch_price, batch_error = predictor.predict_batch([dict(SMOKE_TEST_HOUSE)])[0]
+        if batch_error is not None or not math.isclose(batch_price, price, rel_tol=1e-6):
+            raise ValueError("predict_batch does not match predict_price")
+
+    def start(self):
+        """Start polling; also restarts in a forked child, where threads are lost"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='model-watcher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
@@ -1,10 +1,41 @@
+from flask import current_app, has_app_context
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import case, func, inspect, literal, select, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.schema import CreateIndex
+from sqlalchemy.dialects import postgresql, sqlite
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, generate_password_hash, check_password_hash
 from datetime import datetime
+import hashlib
+import secrets
 
 db = SQLAlchemy()
 
+# Werkzeug's method string with the cost spelled out, as stored in front of
+# each hash, so a changed setting can be detected per user
+DEFAULT_PASSWORD_HASH_METHOD = 'pbkdf2:sha256:600000'
+
+def password_hash_method():
+    if has_app_context():
+        return current_app.config.get('PASSWORD_HASH_METHOD', DEFAULT_PASSWORD_HASH_METHOD)
+    return DEFAULT_PASSWORD_HASH_METHOD
+
+def stored_hash_method(method):
+    """method as Werkzeug writes it in front of a hash, default costs filled in
+    
+    'scrypt' is stored as 'scrypt:32768:8:1' and 'pbkdf2' as
+    'pbkdf2:sha256:<DEFAULT_PBKDF2_ITERATIONS>', so comparing the setting
+    with a stored prefix needs this form.
+    """
+    name, *args = method.split(':')
+    if name == 'scrypt' and not args:
+        return 'scrypt:32768:8:1'
+    if name == 'pbkdf2' and len(args) < 2:
+        hash_name = args[0] if args else 'sha256'
+        return f'pbkdf2:{hash_name}:{DEFAULT_PBKDF2_ITERATIONS}'
+    return method
+
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
     
@@ -21,11 +52,15 @@ class User(UserMixin, db.Model):
     predictions = db.relationship('Prediction', backref='user', lazy=True, cascade='all, delete-orphan')
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = generate_password_hash(password, password_hash_method())
     
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
     
+    def password_needs_rehash(self):
+        """True when the stored hash uses other parameters than PASSWORD_HASH_METHOD"""
+        return self.password_hash.split('$', 1)[0] != stored_hash_method(password_hash_method())
+    
     def get_full_name(self):
         if self.first_name and self.last_name:
             return f"{self.first_name} {self.last_name}"
@@ -57,6 +92,17 @@ class Prediction(db.Model):
     # Prediction result
     predicted_price = db.Column(db.Float, nullable=False)
     prediction_date = db.Column(db.DateTime, default=datetime.utcnow)
+    # Registry version (or artifact hash) of the model; None for fallback prices
+    model_version = db.Column(db.String(64), nullable=True)
+    
+    # Serves "this user's predictions, newest first" for the dashboard and
+    # the keyset-paginated history (ordered by date, then id) without a
+    # sort. predicted_price is carried along so the dashboard aggregates
+    # are an index-only scan.
+    __table_args__ = (
+        db.Index('ix_predictions_user_date', 'user_id', prediction_date.desc(), id.desc(),
+                 'predicted_price'),
+    )
     
     def to_dict(self):
         return {
@@ -74,8 +120,304 @@ class Prediction(db.Model):
             'prefarea': self.prefarea,
             'furnishingstatus': self.furnishingstatus,
             'predicted_price': self.predicted_price,
-            'prediction_date': self.prediction_date.strftime('%Y-%m-%d %H:%M:%S')
+            'prediction_date': self.prediction_date.strftime('%Y-%m-%d %H:%M:%S'),
+            'model_version': self.model_version
         }
     
+    def column_values(self):
+        """Column values for an INSERT, without the database-assigned id"""
+        return {column.name: getattr(self, column.name)
+                for column in self.__table__.columns if column.name != 'id'}
+    
     def __repr__(self):
         return f'<Prediction {self.id}: ${self.predicted_price:,.2f}>'
+
+# Per-user stats column counting each furnishing status
+FURNISHING_COUNT_COLUMNS = {
+    'furnished': 'furnished_count',
+    'semi-furnished': 'semi_furnished_count',
+    'unfurnished': 'unfurnished_count'
+}
+
+class UserPredictionStats(db.Model):
+    """Lifetime prediction statistics of one user, kept up to date on every
+    insert and delete so the dashboard reads one row instead of scanning
+    predictions. record_predictions/forget_prediction maintain it and
+    rebuild_prediction_stats backfills it."""
+    __tablename__ = 'user_prediction_stats'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    prediction_count = db.Column(db.Integer, nullable=False, default=0)
+    price_sum = db.Column(db.Float, nullable=False, default=0.0)
+    min_price = db.Column(db.Float, nullable=True)
+    max_price = db.Column(db.Float, nullable=True)
+    furnished_count = db.Column(db.Integer, nullable=False, default=0)
+    semi_furnished_count = db.Column(db.Integer, nullable=False, default=0)
+    unfurnished_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def summary(self):
+        """Dashboard stats; the keys match what dashboard.html expects"""
+        count = self.prediction_count
+        return {
+            'total_predictions': count,
+            'avg_price': self.price_sum / count if count else 0,
+            'max_price': self.max_price or 0,
+            'min_price': self.min_price or 0,
+            'by_furnishing': {status: getattr(self, column)
+                              for status, column in FURNISHING_COUNT_COLUMNS.items()}
+        }
+
+class ApiToken(db.Model):
+    """Bearer token for the JSON API; only its SHA-256 is stored"""
+    __tablename__ = 'api_tokens'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    name = db.Column(db.String(64), nullable=True)
+    token_hash = db.Column(db.String(64), unique=True, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    @staticmethod
+    def hash(token):
+        return hashlib.sha256(token.encode()).hexdigest()
+    
+    @classmethod
+    def issue(cls, user_id, name=None):
+        """Add a new token for user_id and return its secret (caller commits)"""
+        token = secrets.token_urlsafe(32)
+        db.session.add(cls(user_id=user_id, name=name, token_hash=cls.hash(token)))
+        return token
+
+class UserMonthlyPredictions(db.Model):
+    """Number of predictions a user made in each month ('YYYY-MM')"""
+    __tablename__ = 'user_monthly_predictions'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    month = db.Column(db.String(7), primary_key=True)
+    prediction_count = db.Column(db.Integer, nullable=False, default=0)
+
+def _field(row, name):
+    return row[name] if isinstance(row, dict) else getattr(row, name)
+
+def _upsert(table):
+    """INSERT that supports on_conflict_do_update on SQLite and PostgreSQL"""
+    dialect = db.session.get_bind().dialect.name
+    return (postgresql if dialect == 'postgresql' else sqlite).insert(table)
+
+def _month(column):
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return func.to_char(column, 'YYYY-MM')
+    return func.strftime('%Y-%m', column)
+
+def record_predictions(rows):
+    """Fold new predictions (dicts or Prediction objects) into the stats tables
+    
+    Call it after the rows are added to the session, and commit it together
+    with the INSERT. The updates are increments, safe against concurrent
+    writers. A user without a stats row yet (predictions from before the
+    stats tables existed) is rebuilt from predictions instead, new rows
+    included, so the first increment doesn't start the totals from zero.
+    """
+    now = datetime.utcnow()
+    totals = {}
+    months = {}
+    for row in rows:
+        user_id = _field(row, 'user_id')
+        price = float(_field(row, 'predicted_price'))
+        date = _field(row, 'prediction_date') or now
+        total = totals.setdefault(user_id, {
+            'prediction_count': 0, 'price_sum': 0.0, 'min_price': price, 'max_price': price,
+            'furnished_count': 0, 'semi_furnished_count': 0, 'unfurnished_count': 0
+        })
+        total['prediction_count'] += 1
+        total['price_sum'] += price
+        total['min_price'] = min(total['min_price'], price)
+        total['max_price'] = max(total['max_price'], price)
+        column = FURNISHING_COUNT_COLUMNS.get(_field(row, 'furnishingstatus'))
+        if column:
+            total[column] += 1
+        key = (user_id, date.strftime('%Y-%m'))
+        months[key] = months.get(key, 0) + 1
+    
+    stats = UserPredictionStats.__table__
+    tracked = set(db.session.execute(
+        select(stats.c.user_id).where(stats.c.user_id.in_(list(totals)))).scalars())
+    untracked = set(totals) - tracked
+    if untracked:
+        db.session.flush()
+        for user_id in list(untracked):
+            if not backfill_prediction_stats(user_id):
+                # A concurrent first prediction created the rows; add ours to them
+                untracked.discard(user_id)
+    
+    for user_id, total in totals.items():
+        if user_id in untracked:
+            continue
+        stmt = _upsert(stats).values(user_id=user_id, updated_at=now, **total)
+        new = stmt.excluded
+        stmt = stmt.on_conflict_do_update(index_elements=['user_id'], set_={
+            'prediction_count': stats.c.prediction_count + new.prediction_count,
+            'price_sum': stats.c.price_sum + new.price_sum,
+            'min_price': case((stats.c.min_price.is_(None) | (new.min_price < stats.c.min_price),
+                               new.min_price), else_=stats.c.min_price),
+            'max_price': case((stats.c.max_price.is_(None) | (new.max_price > stats.c.max_price),
+                               new.max_price), else_=stats.c.max_price),
+            'furnished_count': stats.c.furnished_count + new.furnished_count,
+            'semi_furnished_count': stats.c.semi_furnished_count + new.semi_furnished_count,
+            'unfurnished_count': stats.c.unfurnished_count + new.unfurnished_count,
+            'updated_at': new.updated_at
+        })
+        db.session.execute(stmt)
+    
+    monthly = UserMonthlyPredictions.__table__
+    for (user_id, month), count in months.items():
+        if user_id in untracked:
+            continue
+        stmt = _upsert(monthly).values(user_id=user_id, month=month, prediction_count=count)
+        stmt = stmt.on_conflict_do_update(index_elements=['user_id', 'month'], set_={
+            'prediction_count': monthly.c.prediction_count + stmt.excluded.prediction_count
+        })
+        db.session.execute(stmt)
+
+def forget_prediction(prediction):
+    """Take a deleted prediction back out of the stats tables (caller commits)"""
+    stats = UserPredictionStats.__table__
+    values = {
+        'prediction_count': stats.c.prediction_count - 1,
+        'price_sum': stats.c.price_sum - prediction.predicted_price,
+        'updated_at': datetime.utcnow()
+    }
+    column = FURNISHING_COUNT_COLUMNS.get(prediction.furnishingstatus)
+    if column:
+        values[column] = stats.c[column] - 1
+    db.session.execute(stats.update().where(stats.c.user_id == prediction.user_id).values(**values))
+    
+    row = db.session.get(UserPredictionStats, prediction.user_id, populate_existing=True)
+    if row is not None and prediction.predicted_price in (row.min_price, row.max_price):
+        # Only deleting an extreme needs the remaining rows (an index-only scan)
+        remaining = select(func.min(Prediction.predicted_price), func.max(Prediction.predicted_price))\
+            .where(Prediction.user_id == prediction.user_id, Prediction.id != prediction.id)
+        row.min_price, row.max_price = db.session.execute(remaining).one()
+    
+    monthly = UserMonthlyPredictions.__table__
+    month = (prediction.prediction_date or datetime.utcnow()).strftime('%Y-%m')
+    in_month = (monthly.c.user_id == prediction.user_id, monthly.c.month == month)
+    db.session.execute(monthly.update().where(*in_month)
+                       .values(prediction_count=monthly.c.prediction_count - 1))
+    db.session.execute(monthly.delete().where(*in_month, monthly.c.prediction_count <= 0))
+
+
+def backfill_prediction_stats(user_id):
+    """Rebuild a user's missing stats rows; False if another transaction won
+    
+    Two first predictions (or dashboard visits) of the same user can both
+    find the rows missing. The rebuild runs in a savepoint, so the one that
+    loses the race on the primary key rolls back only the rebuild and the
+    caller can use the rows the winner committed.
+    """
+    try:
+        with db.session.begin_nested():
+            rebuild_prediction_stats(user_id)
+    except IntegrityError:
+        return False
+    return True
+
+def rebuild_prediction_stats(user_id=None):
+    """Recompute the stats tables from predictions for one user or everyone
+    
+    Returns the user's UserPredictionStats when user_id is given. The
+    caller commits.
+    """
+    stats = UserPredictionStats.__table__
+    monthly = UserMonthlyPredictions.__table__
+    filters = []
+    stats_delete, monthly_delete = stats.delete(), monthly.delete()
+    if user_id is not None:
+        filters.append(Prediction.user_id == user_id)
+        stats_delete = stats_delete.where(stats.c.user_id == user_id)
+        monthly_delete = monthly_delete.where(monthly.c.user_id == user_id)
+    db.session.execute(stats_delete)
+    db.session.execute(monthly_delete)
+    
+    now = datetime.utcnow()
+    furnishing = [func.coalesce(func.sum(case((Prediction.furnishingstatus == status, 1), else_=0)), 0)
+                  for status in FURNISHING_COUNT_COLUMNS]
+    totals = select(
+        Prediction.user_id, func.count(), func.sum(Prediction.predicted_price),
+        func.min(Prediction.predicted_price), func.max(Prediction.predicted_price),
+        *furnishing, literal(now)
+    ).where(*filters).group_by(Prediction.user_id)
+    db.session.execute(stats.insert().from_select(
+        ['user_id', 'prediction_count', 'price_sum', 'min_price', 'max_price',
+         *FURNISHING_COUNT_COLUMNS.values(), 'updated_at'], totals))
+    
+    month = _month(Prediction.prediction_date)
+    volumes = select(Prediction.user_id, month, func.count())\
+        .where(*filters).group_by(Prediction.user_id, month)
+    db.session.execute(monthly.insert().from_select(['user_id', 'month', 'prediction_count'], volumes))
+    
+    if user_id is None:
+        return None
+    row = db.session.get(UserPredictionStats, user_id, populate_existing=True)
+    if row is None:
+        # No predictions yet; store zeros so the dashboard doesn't rebuild again
+        row = UserPredictionStats(user_id=user_id, prediction_count=0, price_sum=0.0,
+                                  furnished_count=0, semi_furnished_count=0, unfurnished_count=0)
+        db.session.add(row)
+    return row
+
+# Nullable columns and indexes added after the first release.
+# db.create_all() only creates missing tables, so existing databases get
+# the columns via ensure_schema and the indexes via create_missing_indexes.
+ADDED_COLUMNS = {
+    'predictions': ['model_version']
+}
+ADDED_INDEXES = {
+    'predictions': ['ix_predictions_user_date']
+}
+
+def ensure_schema():
+    """Add missing ADDED_COLUMNS to existing tables (call in an app context)
+    
+    Cheap enough to run from create_app: each is a nullable column without
+    a default. Indexes are left to create_missing_indexes.
+    """
+    inspector = inspect(db.engine)
+    for table_name, column_names in ADDED_COLUMNS.items():
+        table = db.metadata.tables[table_name]
+        existing = {column['name'] for column in inspector.get_columns(table_name)}
+        for name in column_names:
+            if name in existing:
+                continue
+            column_type = table.columns[name].type.compile(dialect=db.engine.dialect)
+            with db.engine.begin() as conn:
+                conn.execute(text(f'ALTER TABLE {table_name} ADD COLUMN {name} {column_type}'))
+
+
+def create_missing_indexes():
+    """Build missing ADDED_INDEXES; returns their names (call in an app context)
+    
+    Building an index on a large predictions table takes a while, so this
+    runs once per deploy from `flask ensure-schema`, not in every worker.
+    PostgreSQL builds them CONCURRENTLY, without blocking writes, and IF
+    NOT EXISTS turns a second run racing this one into a no-op.
+    """
+    inspector = inspect(db.engine)
+    postgres = db.engine.dialect.name == 'postgresql'
+    created = []
+    for table_name, index_names in ADDED_INDEXES.items():
+        existing = {index['name'] for index in inspector.get_indexes(table_name)}
+        for index in db.metadata.tables[table_name].indexes:
+            if index.name not in index_names or index.name in existing:
+                continue
+            options = index.dialect_options['postgresql']
+            options['concurrently'] = postgres
+            try:
+                # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+                with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+                    conn.execute(CreateIndex(index, if_not_exists=True))
+            finally:
+                options['concurrently'] = False
+            created.append(index.name)
+    return created
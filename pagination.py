@@ -0,0 +1,88 @@
+"""Keyset (seek) pagination over (prediction_date, id), newest first
+
+A page is found with WHERE (prediction_date, id) < (last seen key), which
+walks ix_predictions_user_date from the right place instead of counting
+off OFFSET rows, so page 5000 costs the same as page 1. Cursors are the
+boundary key plus a direction, base64-encoded so the URL stays opaque.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+NEXT = 'n'
+PREV = 'p'
+
+
+def encode_cursor(prediction, direction):
+    payload = [prediction.prediction_date.isoformat(), prediction.id, direction]
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(prediction_date, id, direction) from a cursor, or None if it is invalid"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        date, prediction_id, direction = json.loads(raw)
+        if direction not in (NEXT, PREV):
+            return None
+        return datetime.fromisoformat(date), int(prediction_id), direction
+    except (binascii.Error, ValueError, TypeError):
+        return None
+
+
+class KeysetPage:
+    """One page of rows plus cursors to its neighbours"""
+
+    def __init__(self, items, next_cursor=None, prev_cursor=None, total=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+
+def keyset_page(query, model, cursor=None, per_page=20):
+    """Page through query ordered by (prediction_date, id) descending"""
+    key = tuple_(model.prediction_date, model.id)
+    position = decode_cursor(cursor)
+    direction = position[2] if position else NEXT
+
+    if position is None:
+        query = query.order_by(model.prediction_date.desc(), model.id.desc())
+    elif direction == NEXT:
+        query = query.filter(key < tuple_(position[0], position[1]))\
+                     .order_by(model.prediction_date.desc(), model.id.desc())
+    else:
+        # Walk backwards from the cursor, then flip the rows into page order
+        query = query.filter(key > tuple_(position[0], position[1]))\
+                     .order_by(model.prediction_date.asc(), model.id.asc())
+
+    # One extra row tells us whether there is anything beyond this page
+    rows = query.limit(per_page + 1).all()
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if direction == PREV:
+        rows.reverse()
+
+    if not rows:
+        return KeysetPage([])
+    has_next = more if direction == NEXT else True
+    has_prev = position is not None if direction == NEXT else more
+    return KeysetPage(
+        rows,
+        next_cursor=encode_cursor(rows[-1], NEXT) if has_next else None,
+        prev_cursor=encode_cursor(rows[0], PREV) if has_prev else None
+    )
@@ -0,0 +1,78 @@
+"""JSON prediction API shared by the Flask route and the ASGI app
+
+POST /api/v1/predict with an 'Authorization: Bearer <token>' header and
+a JSON object of house features returns
+
+    {"predicted_price": 412345.67, "model_version": "...", "fallback": null}
+
+There is no session, CSRF form or template involved, and API predictions
+are not written to the user's history. Tokens come from
+`flask create-token USERNAME`.
+"""
+from models import db, ApiToken
+from ttl_cache import TTLCache
+
+API_PREDICT_PATH = '/api/v1/predict'
+
+
+def prediction_response(predictor, house):
+    """(body, status) for one validated house
+
+    'fallback' carries the reason when the price came from the heuristic
+    fallback instead of the model, as predict_price reports it.
+    """
+    price, error = predictor.predict_price(house)
+    if price is None:
+        return {'error': f'Prediction failed: {error}'}, 503
+    return {
+        'predicted_price': round(float(price), 2),
+        'model_version': getattr(predictor, 'model_version', None) if error is None else None,
+        'fallback': error
+    }, 200
+
+
+def bearer_token(header):
+    if not header:
+        return None
+    scheme, _, token = header.partition(' ')
+    return token.strip() or None if scheme.lower() == 'bearer' else None
+
+
+class TokenAuthenticator:
+    """Maps bearer tokens to user ids, remembering hits for ttl seconds
+
+    Only valid tokens are cached, keyed by their hash like the database
+    keeps them, so a revoked (deleted) token keeps working for at most ttl
+    seconds in each process.
+    """
+
+    def __init__(self, app, maxsize=10000, ttl=60):
+        self.app = app
+        self._cache = TTLCache(maxsize, ttl)
+
+    @classmethod
+    def from_config(cls, app):
+        return cls(app, ttl=app.config['API_TOKEN_CACHE_TTL'])
+
+    def cached(self, token):
+        """User id for token without touching the database, or None"""
+        if token is None:
+            return None
+        return self._cache.get(ApiToken.hash(token))
+
+    def lookup(self, token):
+        """User id for token, or None; may query the database"""
+        if token is None:
+            return None
+        token_hash = ApiToken.hash(token)
+        user_id = self._cache.get(token_hash)
+        if user_id is not None:
+            return user_id
+
+        with self.app.app_context():
+            user_id = db.session.execute(
+                db.select(ApiToken.user_id).where(ApiToken.token_hash == token_hash)
+            ).scalar()
+        if user_id is not None:
+            self._cache.put(token_hash, user_id)
+        return user_id
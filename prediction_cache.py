@@ -0,0 +1,164 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from ttl_cache import TTLCache
+
+
+class LRUPredictionCache(TTLCache):
+    """Bounded in-process LRU cache of predicted prices
+
+    Entries expire ttl seconds after they are stored (no expiry when ttl is
+    None). Safe to share between request threads. Each predictor owns its
+    cache and clears it on reload, so the model version is not checked.
+    """
+
+    shared = False
+
+    def get(self, key, version=None):
+        """Cached price for key, or None"""
+        return super().get(key)
+
+    def put(self, key, price, version=None):
+        super().put(key, price)
+
+
+class SQLitePredictionCache:
+    """Prediction cache shared by every worker process on a host
+
+    Backed by a SQLite file in WAL mode so readers never wait for writers.
+    Each entry is stamped with the model version that produced it and is
+    only served to callers asking for that same version, so nothing stale
+    is returned after a model swap. Workers on different versions during a
+    rolling reload keep separate entries. Size is bounded approximately: every
+    prune_every puts, expired rows and the oldest rows over maxsize are
+    deleted. Lock contention is treated as a miss rather than blocking the
+    request.
+    """
+
+    shared = True
+
+    def __init__(self, path, maxsize=100000, ttl=None, busy_timeout=0.05, prune_every=1000):
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.busy_timeout = busy_timeout
+        self.prune_every = prune_every
+        self._local = threading.local()
+        self._puts = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.errors = 0
+        # Guards the counters, which request threads update concurrently
+        self._lock = threading.Lock()
+        self._connection()
+
+    def _connection(self):
+        """One connection per thread, re-opened after a fork"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout,
+                               isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS prediction_cache ('
+            ' key TEXT NOT NULL,'
+            ' model_version TEXT NOT NULL,'
+            ' price REAL NOT NULL,'
+            ' stored_at REAL NOT NULL,'
+            ' expires_at REAL,'
+            ' PRIMARY KEY (key, model_version))'
+        )
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _serialize(key):
+        return json.dumps(key, separators=(',', ':'))
+
+    def get(self, key, version=None):
+        try:
+            row = self._connection().execute(
+                'SELECT price, expires_at FROM prediction_cache WHERE key = ? AND model_version = ?',
+                (self._serialize(key), str(version))
+            ).fetchone()
+        except sqlite3.Error:
+            self._count('errors')
+            row = None
+
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            self._count('misses')
+            return None
+        self._count('hits')
+        return row[0]
+
+    def _count(self, name, n=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    def put(self, key, price, version=None):
+        now = time.time()
+        expires_at = now + self.ttl if self.ttl else None
+        try:
+            conn = self._connection()
+            conn.execute(
+                'INSERT OR REPLACE INTO prediction_cache VALUES (?, ?, ?, ?, ?)',
+                (self._serialize(key), str(version), price, now, expires_at)
+            )
+            with self._lock:
+                self._puts += 1
+                prune = self._puts % self.prune_every == 0
+            if prune:
+                self._prune(conn, now)
+        except sqlite3.Error:
+            self._count('errors')
+
+    def _prune(self, conn, now):
+        expired = conn.execute(
+            'DELETE FROM prediction_cache WHERE expires_at IS NOT NULL AND expires_at <= ?', (now,)
+        ).rowcount
+        overflow = conn.execute(
+            'DELETE FROM prediction_cache WHERE rowid IN ('
+            ' SELECT rowid FROM prediction_cache ORDER BY stored_at DESC LIMIT -1 OFFSET ?)',
+            (self.maxsize,)
+        ).rowcount
+        self._count('evictions', max(expired, 0) + max(overflow, 0))
+
+    def clear(self):
+        try:
+            self._connection().execute('DELETE FROM prediction_cache')
+        except sqlite3.Error:
+            self._count('errors')
+
+    def stats(self):
+        try:
+            size = self._connection().execute('SELECT COUNT(*) FROM prediction_cache').fetchone()[0]
+        except sqlite3.Error:
+            size = None
+        with self._lock:
+            return {
+                'size': size,
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'errors': self.errors
+            }
+
+
+def create_prediction_cache(backend='memory', size=0, ttl=None, path=None):
+    """Build the cache selected in config, or None when disabled"""
+    if not size or backend == 'none':
+        return None
+    if backend == 'memory':
+        return LRUPredictionCache(size, ttl)
+    if backend == 'sqlite':
+        return SQLitePredictionCache(path, maxsize=size, ttl=ttl)
+    raise ValueError(f"Unknown prediction cache backend: {backend}")
@@ -0,0 +1,178 @@
+"""Write-behind persistence of Prediction rows
+
+/predict hands the row to PredictionWriter.submit and renders the result
+page from the in-memory Prediction object. A background thread drains
+the queue and writes rows with one multi-row INSERT per batch, flushing
+when batch_size rows are waiting or flush_interval seconds have passed.
+
+Backpressure: when the queue stays full for put_timeout seconds, submit
+writes the row synchronously on the request thread instead, so rows are
+never dropped and requests slow down to the speed of the database.
+
+close() (called at exit and from Gunicorn's worker_exit hook) drains the
+queue before returning. Rows still queued when a process is killed
+(SIGKILL, OOM) are lost, which is the price of not waiting for the
+commit; leave PREDICTION_WRITE_BEHIND off where that is unacceptable.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+PREDICTION_WRITES = REGISTRY.counter(
+    'prediction_writes_total', 'Prediction rows persisted by write path', ['path'])
+PREDICTION_FLUSH_SECONDS = REGISTRY.histogram(
+    'prediction_flush_seconds', 'Time to insert and commit one batch of predictions')
+
+_STOP = object()
+
+
+class PredictionWriter:
+    """Bounded queue of Prediction rows flushed by a background thread"""
+
+    def __init__(self, app, max_queue=10000, batch_size=500, flush_interval=0.5,
+                 put_timeout=0.05, max_retries=3):
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.max_retries = max_retries
+        self._queue = queue.Queue(max_queue)
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._closed = False
+        atexit.register(self.close)
+
+    @classmethod
+    def from_config(cls, app):
+        config = app.config
+        return cls(app, config['PREDICTION_WRITE_QUEUE_SIZE'], config['PREDICTION_WRITE_BATCH_SIZE'],
+                   config['PREDICTION_WRITE_FLUSH_INTERVAL'], config['PREDICTION_WRITE_PUT_TIMEOUT'])
+
+    def submit(self, row):
+        """Queue a dict of Prediction column values for insertion"""
+        self._ensure_started()
+        if not self._closed:
+            try:
+                self._queue.put(row, timeout=self.put_timeout)
+                PREDICTION_WRITES.inc(path='queued')
+                return
+            except queue.Full:
+                logger.warning("Prediction write queue is full, writing synchronously")
+
+        # Full queue (or shutting down): write on the caller's thread
+        self._write([row])
+        PREDICTION_WRITES.inc(path='synchronous')
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def close(self, timeout=30.0):
+        """Flush everything queued and stop the writer thread"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread if self._pid == os.getpid() else None
+        if thread is None or not thread.is_alive():
+            # Nothing is draining the queue in this process
+            self._drain_now()
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+        if thread.is_alive():
+            logger.error(f"Prediction writer did not drain within {timeout}s, "
+                         f"{self._queue.qsize()} rows not written")
+
+    def _ensure_started(self):
+        # Started per process on first use, so a forked Gunicorn worker
+        # gets its own thread and a preloaded master never starts one
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid() or self._closed:
+                return
+            self._thread = threading.Thread(target=self._run, name='prediction-writer', daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = []
+            try:
+                first = self._queue.get()
+            except Exception:
+                return
+            stop = first is _STOP
+            if not stop:
+                batch.append(first)
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        row = self._queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                    if row is _STOP:
+                        stop = True
+                        break
+                    batch.append(row)
+            if batch:
+                self._write_with_retry(batch)
+            if stop:
+                self._drain_now()
+                return
+
+    def _drain_now(self):
+        batch = []
+        while True:
+            try:
+                row = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if row is not _STOP:
+                batch.append(row)
+            if len(batch) >= self.batch_size:
+                self._write_with_retry(batch)
+                batch = []
+        if batch:
+            self._write_with_retry(batch)
+
+    def _write_with_retry(self, batch):
+        for attempt in range(self.max_retries + 1):
+            try:
+                self._write(batch)
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    logger.error(f"Dropping {len(batch)} predictions after {attempt + 1} attempts: {e}")
+                    PREDICTION_WRITES.inc(len(batch), path='dropped')
+                    return
+                logger.warning(f"Writing {len(batch)} predictions failed, retrying: {e}")
+                time.sleep(min(0.1 * 2 ** attempt, 2.0))
+
+    def _write(self, rows):
+        from models import db, Prediction, record_predictions
+
+        start = time.perf_counter()
+        with self.app.app_context():
+            try:
+                # One executemany; SQLAlchemy batches it into multi-row INSERTs
+                db.session.execute(db.insert(Prediction), rows)
+                record_predictions(rows)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            finally:
+                db.session.remove()
+        PREDICTION_FLUSH_SECONDS.observe(time.perf_counter() - start)
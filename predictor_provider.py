@@ -0,0 +1,118 @@
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class PredictorProvider:
+    """Hands out the predictor that requests should use right now
+
+    The ML stack (numpy, pandas, sklearn, joblib) is only imported on the
+    first load(). With a model registry the initial model comes from its
+    manifest, and a ModelWatcher swaps in new versions in the background.
+    The swap is a single reference assignment, so request threads never
+    wait for a model load and in-flight requests finish on the predictor
+    they started with.
+    """
+
+    # Seconds a replaced predictor stays open for requests still holding it
+    RETIRE_DELAY = 30.0
+
+    def __init__(self, options, registry_dir=None, reload_interval=10.0, load_options=None,
+                 model_path='models/house_price_model.joblib'):
+        self.options = options
+        self.model_path = model_path
+        self.load_options = load_options or {}
+        self.registry_dir = registry_dir
+        self.reload_interval = reload_interval
+        self.watcher = None
+        self._predictor = None
+        self._lock = threading.Lock()
+        self._watcher_pid = None
+
+    @classmethod
+    def from_config(cls, config):
+        options = {
+            'fold_linear': config['MODEL_FOLD_LINEAR'],
+            'cache_size': config['PREDICTION_CACHE_SIZE'],
+            'cache_ttl': config['PREDICTION_CACHE_TTL'],
+            'cache_backend': config['PREDICTION_CACHE_BACKEND'],
+            'cache_path': config['PREDICTION_CACHE_PATH'],
+            'batch_window': config['PREDICTION_BATCH_WINDOW_MS'] / 1000.0,
+            'max_batch': config['PREDICTION_MAX_BATCH']
+        }
+        load_options = {
+            'mmap_mode': config['MODEL_MMAP_MODE'],
+            'tree_engine': config['MODEL_TREE_ENGINE'],
+            'price_table': config['MODEL_PRICE_TABLE'],
+            'price_table_max_cells': config['MODEL_PRICE_TABLE_MAX_CELLS'],
+            'inference_backend': config['MODEL_INFERENCE_BACKEND'],
+            'inference_processes': config['MODEL_INFERENCE_PROCESSES'],
+            'inference_timeout': config['MODEL_INFERENCE_TIMEOUT_MS'] / 1000.0
+        }
+        return cls(options, config.get('MODEL_REGISTRY_DIR'), config['MODEL_RELOAD_INTERVAL'],
+                   load_options, config['MODEL_PATH'])
+
+    def get(self):
+        """Current predictor for a request, loading it on first use"""
+        predictor = self._predictor
+        if predictor is None:
+            predictor = self.load()
+        if self.watcher is not None and self._watcher_pid != os.getpid():
+            # Started here rather than in load() so a Gunicorn master that
+            # preloads the app never forks while the watcher runs
+            self._watcher_pid = os.getpid()
+            self.watcher.start()
+        return predictor
+
+    def load(self):
+        """Import the ML stack and load the initial model (idempotent)"""
+        with self._lock:
+            if self._predictor is not None:
+                return self._predictor
+
+            if self.registry_dir:
+                from model_registry import ModelRegistry, ModelWatcher
+
+                registry = ModelRegistry(self.registry_dir)
+                self.watcher = ModelWatcher(registry, self.build, self.swap, self.reload_interval)
+                version, path = registry.current()
+                if version is not None:
+                    self._predictor = self.build(path, version)
+                    self.watcher.version = version
+                else:
+                    logger.warning(f"Model registry {self.registry_dir} has no current version")
+
+            if self._predictor is None:
+                self._predictor = self._build_default()
+            return self._predictor
+
+    def _build_default(self):
+        """Predictor for model_path, or the minimal formula if it cannot be built"""
+        try:
+            predictor = self.build(self.model_path)
+            logger.info("Model predictor initialized")
+            return predictor
+        except Exception as e:
+            from ml_model import MinimalPredictor
+
+            logger.error(f"Predictor initialization failed: {e}")
+            logger.warning("Using minimal predictor as fallback")
+            return MinimalPredictor()
+
+    def build(self, path, version=None):
+        from ml_model import HousePricePredictor
+
+        predictor = HousePricePredictor(path, version=version, **self.load_options)
+        predictor.configure(**self.options)
+        return predictor
+
+    def swap(self, predictor):
+        previous, self._predictor = self._predictor, predictor
+        if previous is not None:
+            # A request may hold it without having submitted its prediction
+            # yet, so closing it now would send that request to the fallback
+            timer = threading.Timer(self.RETIRE_DELAY, previous.close)
+            timer.daemon = True
+            timer.start()
@@ -0,0 +1,34 @@
+import pandas as pd
+import pytest
+
+from conftest import SAMPLE_HOUSE, make_houses
+from bulk_scoring import score_file
+from ml_model import HousePricePredictor
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_score_file_matches_predict_batch(workers, model_path, tmp_path):
+    houses = make_houses(250, seed=3) + [dict(SAMPLE_HOUSE, area='n/a')]
+    source = tmp_path / 'houses.csv'
+    pd.DataFrame(houses).assign(listing_id=range(len(houses))).to_csv(source, index=False)
+    output = tmp_path / 'scored.csv'
+
+    stats = score_file(str(source), str(output), model_path, chunk_size=40, workers=workers)
+
+    scored = pd.read_csv(output)
+    expected = HousePricePredictor(model_path).predict_batch(houses)
+    assert stats['rows'] == len(houses) and stats['fallback_rows'] == 1
+    assert list(scored['listing_id']) == list(range(len(houses)))
+    assert list(scored['predicted_price']) == pytest.approx([p for p, _ in expected])
+    assert scored['prediction_error'].notna().tolist() == [e is not None for _, e in expected]
+
+
+def test_score_cli_reports_throughput(app, model_path, tmp_path):
+    source = tmp_path / 'houses.csv'
+    pd.DataFrame(make_houses(30)).to_csv(source, index=False)
+
+    result = app.test_cli_runner().invoke(args=[
+        'score', str(source), str(tmp_path / 'out.csv'), '--model', model_path, '--chunk-size', '7'])
+
+    assert result.exit_code == 0, result.output
+    assert 'Scored 30 rows' in result.output and 'rows/s' in result.output
@@ -18,8 +18,8 @@ def test_flask_app():
             print("✅ Routes configured!")
             
             # Test ML model loading
-            from ml_model import predictor
-            if predictor.model_data:
+            predictor = app.extensions['predictor_provider'].get()
+            if getattr(predictor, 'model_data', None):
                 print("✅ ML model loaded successfully!")
             else:
                 print("⚠️ ML model not found - you'll need to add your trained model")
@@ -0,0 +1,32 @@
+import os
+import subprocess
+import sys
+
+SCRIPT = '''
+import logging, os, sys, threading
+from log_queue import configure_logging, stop_logging
+from logging.handlers import QueueHandler
+
+logging.basicConfig(level=logging.INFO, stream=sys.stdout, format="%(message)s")
+configure_logging("INFO")
+root = logging.getLogger()
+assert [type(h) for h in root.handlers] == [QueueHandler]
+
+log = logging.getLogger("bench")
+log.debug("hidden")
+log.info("from %s", threading.current_thread().name)
+pid = os.fork()
+if pid == 0:
+    log.info("from child")
+    stop_logging()
+    os._exit(0)
+os.waitpid(pid, 0)
+'''
+
+
+def test_queue_logging_survives_fork():
+    result = subprocess.run([sys.executable, '-c', SCRIPT], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)), timeout=30)
+
+    assert result.returncode == 0, result.stderr
+    assert sorted(result.stdout.splitlines()) == ['from MainThread', 'from child']
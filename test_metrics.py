@@ -0,0 +1,63 @@
+from conftest import SAMPLE_HOUSE
+from metrics import MetricsRegistry, PREDICT_STAGE_SECONDS, PREDICTION_FALLBACKS
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    latency = registry.histogram('op_seconds', 'Op latency', ['op'], buckets=(0.01, 0.1))
+    calls = registry.counter('calls_total', 'Calls', ['result'])
+    for seconds in (0.005, 0.05, 0.5):
+        latency.observe(seconds, op='read')
+    calls.inc(result='ok')
+    calls.inc(2, result='ok')
+
+    lines = registry.render().splitlines()
+
+    assert '# TYPE op_seconds histogram' in lines
+    assert 'op_seconds_bucket{op="read",le="0.01"} 1' in lines
+    assert 'op_seconds_bucket{op="read",le="0.1"} 2' in lines
+    assert 'op_seconds_bucket{op="read",le="+Inf"} 3' in lines
+    assert 'op_seconds_count{op="read"} 3' in lines
+    assert 'calls_total{result="ok"} 3' in lines
+
+
+def test_predict_stages_are_exposed_on_metrics(app, client):
+    stages = ('validate', 'predict', 'db_commit', 'render')
+    before = {stage: PREDICT_STAGE_SECONDS.count(stage=stage) for stage in stages}
+    fallbacks = sum(PREDICTION_FALLBACKS.value(predictor=p) for p in ('formula', 'minimal'))
+    predictor = app.extensions['predictor_provider'].get()
+    uses_fallback = not getattr(predictor, 'model', None)
+
+    response = client.post('/predict', data=dict(SAMPLE_HOUSE))
+    assert response.status_code == 200
+
+    for stage in stages:
+        assert PREDICT_STAGE_SECONDS.count(stage=stage) == before[stage] + 1
+    assert sum(PREDICTION_FALLBACKS.value(predictor=p) for p in ('formula', 'minimal')) == \
+        fallbacks + uses_fallback
+
+    metrics = client.get('/metrics')
+    assert metrics.content_type.startswith('text/plain; version=0.0.4')
+    body = metrics.get_data(as_text=True)
+    assert 'predict_stage_seconds_bucket{stage="db_commit",le="+Inf"}' in body
+    assert 'http_request_seconds_count{endpoint="predict",method="POST",status="200"}' in body
+
+
+def test_metrics_token_protects_the_endpoint(monkeypatch):
+    from app import create_app
+    from config import config, TestingConfig
+
+    class TokenConfig(TestingConfig):
+        METRICS_TOKEN = 'scrape-secret'
+
+    class DisabledConfig(TestingConfig):
+        METRICS_ENABLED = False
+
+    monkeypatch.setitem(config, 'token', TokenConfig)
+    monkeypatch.setitem(config, 'disabled', DisabledConfig)
+    client = create_app('token').test_client()
+
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer scrape-secret'}).status_code == 200
+    assert create_app('disabled').test_client().get('/metrics').status_code == 404
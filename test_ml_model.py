@@ -0,0 +1,369 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import SAMPLE_HOUSE, make_houses
+from ml_model import HousePricePredictor
+
+
+def test_predict_batch_matches_predict_price(model_path):
+    predictor = HousePricePredictor(model_path)
+    houses = make_houses(50)
+
+    batch = predictor.predict_batch(houses)
+    single = [predictor.predict_price(h) for h in houses]
+
+    assert [error for _, error in batch] == [None] * len(houses)
+    assert [price for price, _ in batch] == pytest.approx([price for price, _ in single])
+
+
+def test_predict_batch_accepts_dataframe(model_path):
+    predictor = HousePricePredictor(model_path)
+    houses = make_houses(5)
+
+    from_frame = predictor.predict_batch(pd.DataFrame(houses))
+
+    assert from_frame == pytest.approx(predictor.predict_batch(houses))
+
+
+def test_predict_batch_reports_fallback_rows(model_path):
+    predictor = HousePricePredictor(model_path)
+    bad_house = dict(SAMPLE_HOUSE, area='not a number')
+
+    results = predictor.predict_batch([SAMPLE_HOUSE, bad_house, SAMPLE_HOUSE])
+
+    assert results[0][1] is None and results[2][1] is None
+    assert results[1][1] is not None
+    assert predictor.predict_batch([]) == []
+
+
+def _bare_model_path(tmp_path):
+    import joblib
+    from sklearn.linear_model import LinearRegression
+    from ml_model import HOUSE_FEATURES
+
+    houses = pd.DataFrame(make_houses(100))
+    for col in ['mainroad', 'guestroom', 'basement', 'hotwaterheating',
+                'airconditioning', 'prefarea', 'furnishingstatus']:
+        houses[col] = houses[col].astype('category').cat.codes
+    model = LinearRegression().fit(houses[HOUSE_FEATURES].to_numpy(), houses['area'] * 150)
+    path = tmp_path / 'bare.joblib'
+    joblib.dump(model, path)
+    return str(path)
+
+
+@pytest.mark.parametrize('artifact', ['dict', 'bare'])
+def test_compiled_plan_matches_pandas_path(artifact, model_path, tmp_path):
+    path = model_path if artifact == 'dict' else _bare_model_path(tmp_path)
+    predictor = HousePricePredictor(path)
+    assert predictor._plan is not None
+
+    houses = make_houses(30) + [dict(SAMPLE_HOUSE, furnishingstatus='palatial'),
+                                {'area': 1800, 'bedrooms': 2}]
+    for house in houses:
+        compiled = predictor._plan.transform(house)
+        legacy = predictor.scaler.transform(predictor.preprocess_input(house))
+        assert compiled == pytest.approx(legacy, rel=1e-9, abs=1e-9)
+
+    compiled = [predictor.predict_price(h) for h in houses]
+    predictor._plan = predictor._linear = None
+    legacy = [predictor.predict_price(h) for h in houses]
+    assert [e for _, e in compiled] == [e for _, e in legacy]
+    assert [p for p, _ in compiled] == pytest.approx([p for p, _ in legacy])
+
+
+def test_compiled_plan_defers_odd_values_to_pandas_path(model_path):
+    predictor = HousePricePredictor(model_path)
+
+    price, error = predictor.predict_price(dict(SAMPLE_HOUSE, area=None))
+
+    assert error is not None
+
+
+def test_linear_model_is_folded_into_dot_product(model_path):
+    folded = HousePricePredictor(model_path)
+    unfolded = HousePricePredictor(model_path, fold_linear=False)
+    assert folded._linear is not None
+    assert unfolded._linear is None
+
+    houses = make_houses(40)
+    assert [folded.predict_price(h)[0] for h in houses] == \
+        pytest.approx([unfolded.predict_price(h)[0] for h in houses])
+    assert [p for p, _ in folded.predict_batch(houses)] == \
+        pytest.approx([p for p, _ in unfolded.predict_batch(houses)])
+
+
+def test_linear_fold_rejected_when_parity_check_fails(model_path):
+    predictor = HousePricePredictor(model_path)
+    predictor.model.predict = lambda X: np.zeros(len(X))
+
+    predictor._compile_plan()
+
+    assert predictor._plan is not None
+    assert predictor._linear is None
+
+
+def test_non_linear_models_are_not_folded(tmp_path):
+    from sklearn.tree import DecisionTreeRegressor
+    from conftest import train_artifact
+
+    path = train_artifact(tmp_path / 'tree.joblib', DecisionTreeRegressor(max_depth=4))
+    predictor = HousePricePredictor(str(path))
+
+    assert predictor._linear is None
+    assert predictor.predict_price(SAMPLE_HOUSE)[1] is None
+
+
+@pytest.mark.parametrize('estimator', ['forest', 'boosting'])
+def test_flat_tree_artifact_is_memory_mapped(estimator, tmp_path):
+    import joblib
+    from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+    from conftest import train_artifact
+    from ml_model import TreeEnsembleEngine, save_model_artifact
+
+    model = (RandomForestRegressor(n_estimators=20, random_state=0) if estimator == 'forest'
+             else GradientBoostingRegressor(n_estimators=30, random_state=0))
+    sklearn_path = train_artifact(tmp_path / 'sklearn.joblib', model)
+    flat_path = save_model_artifact(str(tmp_path / 'flat.joblib'), joblib.load(sklearn_path))
+
+    reference = HousePricePredictor(str(sklearn_path))
+    mapped = HousePricePredictor(flat_path, mmap_mode='r')
+
+    assert isinstance(mapped.model, TreeEnsembleEngine)
+    assert isinstance(mapped.model.threshold, np.memmap)
+    houses = make_houses(50)
+    assert [p for p, _ in mapped.predict_batch(houses)] == \
+        pytest.approx([p for p, _ in reference.predict_batch(houses)])
+
+
+@pytest.mark.parametrize('estimator', ['tree', 'forest', 'extra', 'boosting'])
+def test_tree_engine_matches_sklearn(estimator, tmp_path):
+    from sklearn.ensemble import (ExtraTreesRegressor, GradientBoostingRegressor,
+                                  RandomForestRegressor)
+    from sklearn.tree import DecisionTreeRegressor
+    from conftest import train_artifact
+    from ml_model import TreeEnsembleEngine
+
+    model = {
+        'tree': DecisionTreeRegressor(random_state=0),
+        'forest': RandomForestRegressor(n_estimators=15, random_state=0),
+        'extra': ExtraTreesRegressor(n_estimators=15, random_state=0),
+        'boosting': GradientBoostingRegressor(n_estimators=40, max_depth=4, random_state=0)
+    }[estimator]
+    path = str(train_artifact(tmp_path / 'model.joblib', model))
+
+    reference = HousePricePredictor(path)
+    flattened = HousePricePredictor(path, tree_engine=True)
+
+    assert isinstance(flattened.model, TreeEnsembleEngine)
+    # Small batches run on the engine, large ones on the kept sklearn trees
+    for n in (20, 200):
+        houses = make_houses(n, seed=7)
+        assert [p for p, _ in flattened.predict_batch(houses)] == \
+            pytest.approx([p for p, _ in reference.predict_batch(houses)], rel=1e-9)
+    assert flattened.predict_price(SAMPLE_HOUSE)[0] == \
+        pytest.approx(reference.predict_price(SAMPLE_HOUSE)[0], rel=1e-9)
+
+
+def test_tree_engine_not_used_when_parity_check_fails(tmp_path, monkeypatch):
+    from sklearn.ensemble import RandomForestRegressor
+    from conftest import train_artifact
+    from ml_model import TreeEnsembleEngine
+
+    monkeypatch.setattr(TreeEnsembleEngine, 'matches', lambda self, model: False)
+    path = train_artifact(tmp_path / 'model.joblib', RandomForestRegressor(n_estimators=5))
+
+    predictor = HousePricePredictor(str(path), tree_engine=True)
+
+    assert isinstance(predictor.model, RandomForestRegressor)
+
+
+@pytest.mark.parametrize('estimator, kind', [('linear', 'additive'), ('stumps', 'additive'),
+                                             ('tree', 'dense')])
+def test_price_table_matches_model(estimator, kind, tmp_path):
+    from sklearn.ensemble import GradientBoostingRegressor
+    from sklearn.tree import DecisionTreeRegressor
+    from conftest import train_artifact
+
+    model = {
+        'linear': None,
+        'stumps': GradientBoostingRegressor(n_estimators=30, max_depth=1, random_state=0),
+        'tree': DecisionTreeRegressor(max_depth=6, random_state=0)
+    }[estimator]
+    path = str(train_artifact(tmp_path / 'model.joblib', model, n=1000))
+
+    reference = HousePricePredictor(path, fold_linear=False)
+    tabled = HousePricePredictor(path, price_table=True)
+
+    assert tabled._table.kind == kind
+    for house in make_houses(300, seed=3):
+        assert tabled._table.price(house) is not None
+        assert tabled.predict_price(house)[0] == pytest.approx(reference.predict_price(house)[0],
+                                                               rel=1e-6, abs=0.01)
+
+
+def test_price_table_leaves_inputs_outside_the_grid_to_the_model(model_path):
+    predictor = HousePricePredictor(model_path, price_table=True)
+    table = predictor._table
+
+    for odd in ({'area': 2400.5}, {'area': 60000}, {'bedrooms': 0}, {'area': '2400'},
+                {'area': float('nan')}, {'parking': True}):
+        house = dict(SAMPLE_HOUSE, **odd)
+        assert table.price(house) is None
+    assert table.price(dict(SAMPLE_HOUSE, area=2400.0)) == table.price(dict(SAMPLE_HOUSE, area=2400))
+    # Off-grid areas still get the model's answer
+    reference = HousePricePredictor(model_path)
+    house = dict(SAMPLE_HOUSE, area=2400.5)
+    assert predictor.predict_price(house) == reference.predict_price(house)
+
+
+def test_price_table_not_built_when_dense_grid_is_too_large(tmp_path):
+    from sklearn.ensemble import RandomForestRegressor
+    from conftest import train_artifact
+
+    path = train_artifact(tmp_path / 'model.joblib', RandomForestRegressor(n_estimators=10, random_state=0))
+
+    predictor = HousePricePredictor(str(path), price_table=True, price_table_max_cells=1000)
+
+    assert predictor._table is None
+    assert predictor.predict_price(SAMPLE_HOUSE)[1] is None
+
+
+def test_micro_batcher_coalesces_concurrent_calls():
+    import threading
+    from ml_model import MicroBatcher
+
+    batches = []
+    batcher = MicroBatcher(lambda houses: batches.append(len(houses)) or [(h['area'], None) for h in houses],
+                           max_batch=8, max_wait=0.5, idle_timeout=0.05)
+    barrier = threading.Barrier(16)
+    results = {}
+
+    def call(i):
+        barrier.wait()
+        results[i] = batcher.submit({'area': i}).result(timeout=5)
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert results == {i: (i, None) for i in range(16)}
+    assert sum(batches) == 16 and max(batches) == 8 and len(batches) <= 4
+    # The worker goes away once idle and comes back on demand
+    worker = batcher._thread
+    if worker is not None:
+        worker.join(timeout=5)
+    assert batcher._thread is None
+    assert batcher.submit({'area': 1}).result(timeout=5) == (1, None)
+
+
+def test_micro_batcher_passes_scoring_errors_to_every_caller():
+    from ml_model import MicroBatcher
+
+    def fail(houses):
+        raise RuntimeError('boom')
+
+    batcher = MicroBatcher(fail, max_wait=0)
+
+    with pytest.raises(RuntimeError, match='boom'):
+        batcher.submit({}).result(timeout=5)
+
+
+@pytest.mark.parametrize('estimator', ['linear', 'forest'])
+def test_batched_predictions_match_unbatched(estimator, tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+    from sklearn.ensemble import RandomForestRegressor
+    from conftest import train_artifact
+
+    model = None if estimator == 'linear' else RandomForestRegressor(n_estimators=10, random_state=0)
+    path = str(train_artifact(tmp_path / 'model.joblib', model))
+    reference = HousePricePredictor(path)
+    batched = HousePricePredictor(path)
+    batched.configure(batch_window=0.01, max_batch=16)
+    houses = make_houses(60, seed=5) + [dict(SAMPLE_HOUSE, area='big')]
+
+    with ThreadPoolExecutor(16) as pool:
+        results = list(pool.map(batched.predict_price, houses))
+
+    expected = [reference.predict_price(h) for h in houses]
+    assert [p for p, _ in results] == pytest.approx([p for p, _ in expected], rel=1e-9)
+    assert [e for _, e in results] == [e for _, e in expected]
+
+
+def test_process_backend_matches_local(tmp_path):
+    from sklearn.ensemble import RandomForestRegressor
+    from conftest import train_artifact
+
+    path = str(train_artifact(tmp_path / 'model.joblib', RandomForestRegressor(n_estimators=10, random_state=0)))
+    local = HousePricePredictor(path)
+    remote = HousePricePredictor(path, inference_backend='process', inference_processes=1,
+                                 inference_timeout=30)
+    houses = make_houses(20, seed=3)
+
+    try:
+        # The processes start in the background; until then the fallback answers
+        assert remote.predict_price(SAMPLE_HOUSE) == local._fallback_prediction(SAMPLE_HOUSE)
+        assert remote.start_inference(wait=True)
+        assert [remote.predict_price(h) for h in houses] == [local.predict_price(h) for h in houses]
+        assert remote.predict_batch(houses) == local.predict_batch(houses)
+        assert remote._score_houses(houses) == local._score_houses(houses)
+    finally:
+        remote.close()
+
+    # A closed pool leaves only the fallback formula
+    assert remote.predict_price(SAMPLE_HOUSE) == local._fallback_prediction(SAMPLE_HOUSE)
+    with pytest.raises(ValueError):
+        HousePricePredictor(path, inference_backend='gpu')
+
+
+class SlowModel:
+    """Stands in for a heavy model; importable by the inference processes"""
+
+    def predict(self, rows):
+        import time
+
+        time.sleep(1.0)
+        return np.full(len(rows), 500000.0)
+
+
+def test_process_backend_falls_back_when_inference_times_out(tmp_path, model_path):
+    import joblib
+    from metrics import INFERENCE_TIMEOUTS
+
+    artifact = joblib.load(model_path)
+    artifact['model'] = SlowModel()
+    path = str(tmp_path / 'slow.joblib')
+    joblib.dump(artifact, path)
+    predictor = HousePricePredictor(path, inference_backend='process', inference_processes=1,
+                                    inference_timeout=0.1)
+    houses = make_houses(3, seed=3)
+    timeouts = INFERENCE_TIMEOUTS.value()
+
+    try:
+        assert predictor.start_inference(wait=True)
+        assert predictor.predict_price(SAMPLE_HOUSE) == predictor._fallback_prediction(SAMPLE_HOUSE)
+        assert predictor._score_houses(houses) == [predictor._fallback_prediction(h) for h in houses]
+    finally:
+        predictor.close()
+    assert INFERENCE_TIMEOUTS.value() == timeouts + 2
+
+
+def test_inference_pool_backs_off_after_a_failed_start(tmp_path):
+    from inference_pool import InferencePool, InferenceUnavailable
+
+    pool = InferencePool(str(tmp_path / 'missing.joblib'), processes=1)
+    rows = np.zeros((1, 12))
+
+    try:
+        assert not pool.start(wait=True)
+        # Within the retry delay requests neither wait nor start processes again
+        with pytest.raises(InferenceUnavailable):
+            pool.predict(rows)
+        assert not pool._starting
+        pool._retry_at = 0.0
+        assert not pool.start(wait=True)
+        assert pool._failures == 2
+    finally:
+        pool.close()
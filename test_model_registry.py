@@ -0,0 +1,122 @@
+import pytest
+
+from conftest import SAMPLE_HOUSE, train_artifact
+from model_registry import ModelRegistry
+from predictor_provider import PredictorProvider
+
+OPTIONS = {'fold_linear': True, 'cache_size': 0, 'cache_ttl': None,
+           'cache_backend': 'memory', 'cache_path': None}
+
+
+@pytest.fixture
+def registry(tmp_path, model_path):
+    registry = ModelRegistry(str(tmp_path / 'registry'))
+    registry.publish(model_path, version='v1')
+    return registry
+
+
+def test_publish_and_activate(registry, model_path):
+    registry.publish(model_path, version='v2', activate=False)
+    assert registry.current()[0] == 'v1'
+
+    registry.activate('v2')
+
+    version, path = registry.current()
+    assert version == 'v2'
+    assert path.endswith('model-v2.joblib')
+    with pytest.raises(ValueError):
+        registry.publish(model_path, version='v2')
+
+
+def test_watcher_swaps_in_new_version(registry, tmp_path):
+    from sklearn.tree import DecisionTreeRegressor
+
+    provider = PredictorProvider(OPTIONS, registry.directory)
+    old = provider.load()
+    assert old.model_version == 'v1'
+
+    tree_path = train_artifact(tmp_path / 'tree.joblib', DecisionTreeRegressor(max_depth=3))
+    registry.publish(str(tree_path), version='v2')
+    assert provider.watcher.check()
+
+    new = provider.get()
+    assert new is not old
+    assert new.model_version == 'v2'
+    assert not provider.watcher.check()
+
+
+def test_watcher_keeps_serving_when_new_version_fails(registry, tmp_path):
+    provider = PredictorProvider(OPTIONS, registry.directory)
+    old = provider.load()
+
+    broken = tmp_path / 'broken.joblib'
+    broken.write_bytes(b'not a model')
+    registry.publish(str(broken), version='v2')
+
+    assert not provider.watcher.check()
+    assert provider.get() is old
+    assert provider.get().predict_price(SAMPLE_HOUSE)[1] is None
+
+
+def test_provider_without_registry_uses_config_load_options(monkeypatch, model_path):
+    from app import create_app
+    from config import config, TestingConfig
+
+    class PathConfig(TestingConfig):
+        MODEL_PATH = model_path
+        MODEL_MMAP_MODE = None
+        MODEL_PRICE_TABLE = True
+
+    monkeypatch.setitem(config, 'path', PathConfig)
+    predictor = create_app('path').extensions['predictor_provider'].get()
+
+    assert predictor.model_path == model_path and predictor.model is not None
+    assert predictor.mmap_mode is None and predictor.price_table
+
+
+def test_swap_closes_the_old_predictor_after_a_grace_period():
+    import threading
+
+    class Predictor:
+        def __init__(self):
+            self.closed = threading.Event()
+
+        def close(self):
+            self.closed.set()
+
+    provider = PredictorProvider(OPTIONS)
+    provider.RETIRE_DELAY = 0.2
+    old = Predictor()
+    provider.swap(old)
+    held = provider.get()
+
+    provider.swap(Predictor())
+
+    # A request that got the old predictor just before the swap can still use it
+    assert held is old and not old.closed.is_set()
+    assert old.closed.wait(5)
+
+
+def test_predictions_record_model_version(app, client, registry):
+    provider = PredictorProvider(OPTIONS, registry.directory)
+    app.extensions['predictor_provider'].swap(provider.load())
+
+    client.post('/api/predict/batch', json=[SAMPLE_HOUSE])
+
+    from models import Prediction
+    with app.app_context():
+        assert Prediction.query.one().model_version == 'v1'
+
+
+def test_ensure_schema_adds_model_version_to_existing_table(app):
+    from sqlalchemy import inspect, text
+    from models import db, ensure_schema
+
+    with app.app_context():
+        with db.engine.begin() as conn:
+            conn.execute(text('ALTER TABLE predictions DROP COLUMN model_version'))
+
+        ensure_schema()
+
+        columns = {c['name'] for c in inspect(db.engine).get_columns('predictions')}
+        assert 'model_version' in columns
@@ -0,0 +1,145 @@
+import asyncio
+import json
+
+from conftest import SAMPLE_HOUSE
+from models import Prediction
+
+
+def _token(app, client):
+    result = app.test_cli_runner().invoke(args=['create-token', 'tester', '--name', 'ci'])
+    assert result.exit_code == 0, result.output
+    return result.output.strip()
+
+
+def _call(application, method, path, body=b'', headers=()):
+    """Run one HTTP request through an ASGI app; returns (status, headers, body)"""
+    incoming = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return incoming.pop(0) if incoming else {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'http_version': '1.1', 'method': method, 'path': path, 'root_path': '',
+             'query_string': b'', 'scheme': 'http', 'server': ('testserver', 80),
+             'client': ('127.0.0.1', 5000),
+             'headers': [(name.lower().encode(), value.encode()) for name, value in headers]}
+    asyncio.run(application(scope, receive, send))
+    start, response = sent
+    return start['status'], dict(start['headers']), response['body']
+
+
+def test_api_predict_with_token(app, client):
+    token = _token(app, client)
+    api = app.test_client()
+
+    response = api.post('/api/v1/predict', json=SAMPLE_HOUSE, headers={'Authorization': f'Bearer {token}'})
+
+    assert response.status_code == 200
+    assert response.get_json()['predicted_price'] > 0
+    assert 'Set-Cookie' not in response.headers
+    with app.app_context():
+        assert Prediction.query.count() == 0
+
+
+def test_api_predict_rejects_bad_tokens_and_features(app, client):
+    token = _token(app, client)
+    api = app.test_client()
+
+    missing = api.post('/api/v1/predict', json=SAMPLE_HOUSE)
+    wrong = api.post('/api/v1/predict', json=SAMPLE_HOUSE, headers={'Authorization': 'Bearer nope'})
+    invalid = api.post('/api/v1/predict', json=dict(SAMPLE_HOUSE, area='big', mainroad='maybe'),
+                       headers={'Authorization': f'Bearer {token}'})
+
+    assert missing.status_code == wrong.status_code == 401
+    assert missing.headers['WWW-Authenticate'] == 'Bearer'
+    assert invalid.status_code == 400
+    assert set(invalid.get_json()['fields']) == {'area', 'mainroad'}
+
+
+def test_create_token_for_unknown_user_fails(app):
+    result = app.test_cli_runner().invoke(args=['create-token', 'nobody'])
+
+    assert result.exit_code != 0
+    assert 'No user named nobody' in result.output
+
+
+def test_asgi_app_serves_api_and_passes_other_paths_to_flask(app, client):
+    from asgi import PredictionASGI
+
+    token = _token(app, client)
+    application = PredictionASGI(app, threads=2)
+    auth = ('Authorization', f'Bearer {token}')
+    body = json.dumps(SAMPLE_HOUSE).encode()
+
+    status, _, ok = _call(application, 'POST', '/api/v1/predict', body, [auth])
+    expected = client.post('/api/v1/predict', json=SAMPLE_HOUSE, headers=dict([auth])).get_json()
+    assert status == 200
+    assert json.loads(ok) == expected
+
+    status, headers, _ = _call(application, 'POST', '/api/v1/predict', body)
+    assert status == 401
+    assert headers[b'www-authenticate'] == b'Bearer'
+
+    status, _, invalid = _call(application, 'POST', '/api/v1/predict', b'not json', [auth])
+    assert status == 400
+    status, _, _ = _call(application, 'GET', '/api/v1/predict', headers=[auth])
+    assert status == 405
+    status, _, _ = _call(application, 'POST', '/api/v1/predict', b'x' * 70000, [auth])
+    assert status == 413
+
+    status, headers, page = _call(application, 'GET', '/')
+    assert status == 200
+    assert headers[b'content-type'].startswith(b'text/html')
+    assert b'</html>' in page
+
+
+def test_api_predict_rejects_non_finite_numbers(app, client):
+    from asgi import PredictionASGI
+
+    auth = ('Authorization', f'Bearer {_token(app, client)}')
+    api = app.test_client()
+    application = PredictionASGI(app, threads=2)
+
+    for raw in ('Infinity', '-Infinity', 'NaN', '1e400'):
+        body = json.dumps(SAMPLE_HOUSE).replace('2400', raw).encode()
+        response = api.post('/api/v1/predict', data=body, content_type='application/json',
+                            headers=dict([auth]))
+        status, _, fields = _call(application, 'POST', '/api/v1/predict', body, [auth])
+
+        assert response.status_code == status == 400
+        assert set(response.get_json()['fields']) == set(json.loads(fields)['fields']) == {'area'}
+
+
+def test_token_cache_keeps_hashes_not_tokens(app, client):
+    from models import ApiToken
+
+    token = _token(app, client)
+    token_auth = app.extensions['token_auth']
+
+    user_id = token_auth.lookup(token)
+
+    assert user_id is not None and token_auth.cached(token) == user_id
+    assert list(token_auth._cache._entries) == [ApiToken.hash(token)]
+
+
+def test_asgi_app_checks_content_length_and_body_size(app, client):
+    from asgi import PredictionASGI
+
+    auth = ('Authorization', f'Bearer {_token(app, client)}')
+    application = PredictionASGI(app, threads=2)
+    application.max_content_length = 1000
+    body = json.dumps(SAMPLE_HOUSE).encode()
+
+    status, _, _ = _call(application, 'POST', '/api/v1/predict', body, [auth, ('Content-Length', 'abc')])
+    assert status == 400
+    status, _, _ = _call(application, 'POST', '/login', b'x', [('Content-Length', '-1')])
+    assert status == 400
+    status, _, _ = _call(application, 'POST', '/login', b'x' * 2000)
+    assert status == 413
+    status, _, _ = _call(application, 'POST', '/login', b'x', [('Content-Length', '5000')])
+    assert status == 413
+    status, _, _ = _call(application, 'GET', '/login')
+    assert status == 200
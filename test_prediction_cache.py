@@ -0,0 +1,114 @@
+from conftest import SAMPLE_HOUSE
+from features import make_cache_key
+from ml_model import HousePricePredictor
+from prediction_cache import LRUPredictionCache, SQLitePredictionCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUPredictionCache(maxsize=2)
+    cache.put('a', 1.0)
+    cache.put('b', 2.0)
+    cache.get('a')
+    cache.put('c', 3.0)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 1.0
+    assert cache.stats()['evictions'] == 1
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = LRUPredictionCache(maxsize=10, ttl=60, clock=clock)
+    cache.put('a', 1.0)
+
+    clock.now = 59
+    assert cache.get('a') == 1.0
+    clock.now = 61
+    assert cache.get('a') is None
+    assert cache.stats()['expirations'] == 1
+
+
+def test_cache_key_normalizes_numbers():
+    assert make_cache_key(SAMPLE_HOUSE) == make_cache_key(dict(SAMPLE_HOUSE, area=2400.0))
+    assert make_cache_key(SAMPLE_HOUSE) != make_cache_key(dict(SAMPLE_HOUSE, mainroad='Yes'))
+    assert make_cache_key(dict(SAMPLE_HOUSE, area=[1])) is None
+
+
+def test_cache_hit_skips_inference(model_path):
+    predictor = HousePricePredictor(model_path, cache_size=16)
+    first = predictor.predict_price(SAMPLE_HOUSE)
+
+    predictor._plan = predictor._linear = predictor.model = 'unused'
+    second = predictor.predict_price(dict(SAMPLE_HOUSE))
+
+    assert second == first
+    assert predictor.cache_stats()['hits'] == 1
+    assert predictor.cache_stats()['misses'] == 1
+
+
+def test_cache_is_cleared_on_model_reload(model_path):
+    predictor = HousePricePredictor(model_path, cache_size=16)
+    predictor.predict_price(SAMPLE_HOUSE)
+
+    predictor.load_model()
+
+    assert predictor.cache_stats()['size'] == 0
+
+
+def test_sqlite_cache_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    worker_a = SQLitePredictionCache(path)
+    worker_b = SQLitePredictionCache(path)
+
+    worker_a.put(('house',), 123.0, version='v1')
+
+    assert worker_b.get(('house',), version='v1') == 123.0
+    assert worker_b.get(('house',), version='v2') is None
+
+
+def test_sqlite_cache_prunes_to_maxsize(tmp_path):
+    cache = SQLitePredictionCache(str(tmp_path / 'cache.sqlite'), maxsize=5, prune_every=10)
+
+    for i in range(10):
+        cache.put((i,), float(i), version='v1')
+
+    assert cache.stats()['size'] == 5
+    assert cache.get((9,), version='v1') == 9.0
+    assert cache.get((0,), version='v1') is None
+
+
+def test_shared_cache_never_serves_other_model_versions(model_path, tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    predictor = HousePricePredictor(model_path)
+    predictor.configure(cache_size=100, cache_backend='sqlite', cache_path=path)
+    price, _ = predictor.predict_price(SAMPLE_HOUSE)
+
+    other = HousePricePredictor(model_path)
+    other.configure(cache_size=100, cache_backend='sqlite', cache_path=path)
+    other.model_version = 'retrained'
+    other.predict_price(SAMPLE_HOUSE)
+
+    assert other.cache_stats()['hits'] == 0
+    other.model_version = predictor.model_version
+    assert other.predict_price(SAMPLE_HOUSE) == (price, None)
+
+
+def test_sqlite_cache_counts_every_lookup_across_threads(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    cache = SQLitePredictionCache(str(tmp_path / 'cache.sqlite'))
+    cache.put(('hit',), 1.0, version='v1')
+
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(lambda i: cache.get(('hit',) if i % 2 else ('miss', i), version='v1'), range(400)))
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses']) == (200, 200)
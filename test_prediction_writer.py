@@ -0,0 +1,125 @@
+import threading
+
+import pytest
+
+from conftest import SAMPLE_HOUSE
+
+
+@pytest.fixture
+def write_behind_app(tmp_path, monkeypatch):
+    from app import create_app
+    from config import config, TestingConfig
+    from models import db
+
+    class WriteBehindConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'writer.db'}"
+        PREDICTION_WRITE_BEHIND = True
+        PREDICTION_WRITE_FLUSH_INTERVAL = 0.05
+
+    monkeypatch.setitem(config, 'write_behind', WriteBehindConfig)
+    app = create_app('write_behind')
+    yield app
+    app.extensions['prediction_writer'].close()
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+def _user_id(app):
+    from models import db, User
+
+    with app.app_context():
+        user = User(username='writer', email='writer@example.com')
+        user.set_password('secret123')
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+def _row(user_id, i):
+    from datetime import datetime
+
+    return dict(SAMPLE_HOUSE, area=1000 + i, user_id=user_id, predicted_price=100000.0 + i,
+                prediction_date=datetime.utcnow(), model_version='test')
+
+
+def _stored_areas(app):
+    from models import Prediction
+
+    with app.app_context():
+        return sorted(p.area for p in Prediction.query.all())
+
+
+def test_predict_renders_before_row_is_written(write_behind_app):
+    _user_id(write_behind_app)
+    client = write_behind_app.test_client()
+    client.post('/login', data={'username': 'writer', 'password': 'secret123'})
+
+    response = client.post('/predict', data=dict(SAMPLE_HOUSE))
+
+    assert response.status_code == 200
+    assert b'2,400' in response.data
+    write_behind_app.extensions['prediction_writer'].close()
+    assert _stored_areas(write_behind_app) == [2400]
+
+
+def test_close_drains_every_queued_row(write_behind_app):
+    from prediction_writer import PredictionWriter
+
+    user_id = _user_id(write_behind_app)
+    writer = PredictionWriter(write_behind_app, batch_size=7, flush_interval=0.01)
+
+    def submit(offset):
+        for i in range(offset, offset + 50):
+            writer.submit(_row(user_id, i))
+
+    threads = [threading.Thread(target=submit, args=(n * 50,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    writer.close()
+
+    assert _stored_areas(write_behind_app) == [1000 + i for i in range(200)]
+    assert writer.pending() == 0
+
+
+def test_full_queue_writes_on_the_request_thread(write_behind_app, monkeypatch):
+    from prediction_writer import PredictionWriter
+
+    user_id = _user_id(write_behind_app)
+    writer = PredictionWriter(write_behind_app, max_queue=2, put_timeout=0.01)
+    # No background thread, so the queue stays full
+    monkeypatch.setattr(writer, '_ensure_started', lambda: None)
+
+    for i in range(5):
+        writer.submit(_row(user_id, i))
+
+    assert writer.pending() == 2
+    assert _stored_areas(write_behind_app) == [1002, 1003, 1004]
+    writer.close()
+    assert _stored_areas(write_behind_app) == [1000, 1001, 1002, 1003, 1004]
+
+
+def test_failed_batches_are_retried(write_behind_app, monkeypatch):
+    from prediction_writer import PredictionWriter
+
+    user_id = _user_id(write_behind_app)
+    writer = PredictionWriter(write_behind_app, flush_interval=0.01)
+    write = writer._write
+    failures = []
+
+    def flaky_write(rows):
+        if not failures:
+            failures.append(len(rows))
+            raise RuntimeError('database went away')
+        write(rows)
+
+    monkeypatch.setattr(writer, '_write', flaky_write)
+    monkeypatch.setattr('prediction_writer.time.sleep', lambda seconds: None)
+    for i in range(3):
+        writer.submit(_row(user_id, i))
+    writer.close()
+
+    assert failures
+    assert _stored_areas(write_behind_app) == [1000, 1001, 1002]
@@ -0,0 +1,437 @@
+import json
+
+from conftest import SAMPLE_HOUSE, make_houses
+from models import Prediction
+
+
+def test_batch_prediction_endpoint_saves_every_row(app, client):
+    houses = make_houses(25)
+
+    response = client.post('/api/predict/batch', json={'houses': houses})
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['count'] == 25
+    assert all(p['predicted_price'] > 0 for p in body['predictions'])
+    with app.app_context():
+        assert Prediction.query.count() == 25
+
+
+def test_batch_prediction_endpoint_rejects_incomplete_rows(app, client):
+    incomplete = {k: v for k, v in SAMPLE_HOUSE.items() if k != 'area'}
+
+    response = client.post('/api/predict/batch', json=[SAMPLE_HOUSE, incomplete])
+
+    assert response.status_code == 400
+    assert response.get_json()['invalid_rows'] == [1]
+    with app.app_context():
+        assert Prediction.query.count() == 0
+
+
+def test_batch_prediction_endpoint_checks_bounds_and_choices(app, client):
+    houses = [SAMPLE_HOUSE,
+              dict(SAMPLE_HOUSE, area=2400.7),
+              dict(SAMPLE_HOUSE, bedrooms=-1),
+              dict(SAMPLE_HOUSE, area=10 ** 30),
+              dict(SAMPLE_HOUSE, furnishingstatus='x' * 50),
+              dict(SAMPLE_HOUSE, mainroad='maybe'),
+              SAMPLE_HOUSE]
+    infinite = json.dumps(SAMPLE_HOUSE).replace('2400', 'Infinity')
+    body = '[' + ', '.join([*map(json.dumps, houses), infinite]) + ']'
+
+    response = client.post('/api/predict/batch', data=body, content_type='application/json')
+
+    assert response.status_code == 400
+    result = response.get_json()
+    assert result['invalid_rows'] == [1, 2, 3, 4, 5, 7]
+    assert result['fields']['2'] == {'bedrooms': 'Whole number from 1 to 10'}
+    with app.app_context():
+        assert Prediction.query.count() == 0
+
+
+def test_lazy_mode_does_not_import_ml_stack(tmp_path):
+    import os
+    import subprocess
+    import sys
+
+    code = ("import sys, app; "
+            "print(sorted(m for m in ('pandas', 'numpy', 'sklearn', 'joblib') if m in sys.modules))")
+    env = dict(os.environ, MODEL_LOAD_MODE='lazy', DATABASE_URL=f"sqlite:///{tmp_path / 'lazy.db'}")
+    result = subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+
+    assert result.stdout.strip().splitlines()[-1] == '[]'
+
+
+def _add_predictions(app, prices):
+    from datetime import datetime, timedelta
+    from models import db, User
+
+    with app.app_context():
+        user = User.query.filter_by(username='tester').one()
+        start = datetime(2025, 1, 1)
+        for i, price in enumerate(prices):
+            db.session.add(Prediction(user_id=user.id, **SAMPLE_HOUSE, predicted_price=price,
+                                      prediction_date=start + timedelta(days=i)))
+        db.session.commit()
+        return user.id
+
+
+def _stats(app, user_id):
+    from models import db, UserPredictionStats
+
+    with app.app_context():
+        return db.session.get(UserPredictionStats, user_id).summary()
+
+
+def test_dashboard_stats_cover_all_predictions(app, client):
+    prices = [100000.0 + 10000 * i for i in range(12)]
+    user_id = _add_predictions(app, prices)
+
+    # No stats row yet, so the first visit backfills it from predictions
+    page = client.get('/dashboard').get_data(as_text=True)
+
+    assert '$100,000' in page and '$155,000' in page and '$210,000' in page
+    assert _stats(app, user_id) == {
+        'total_predictions': 12, 'avg_price': sum(prices) / 12, 'max_price': max(prices),
+        'min_price': min(prices), 'by_furnishing': {'furnished': 0, 'semi-furnished': 12,
+                                                    'unfurnished': 0}}
+
+
+def test_first_prediction_backfills_earlier_history(app, client):
+    from models import db, UserMonthlyPredictions
+
+    user_id = _add_predictions(app, [100000.0] * 5)
+
+    # Predicting before ever opening the dashboard must not start the totals at 1
+    assert client.post('/predict', data=SAMPLE_HOUSE).status_code == 200
+    assert client.get('/dashboard').status_code == 200
+
+    assert _stats(app, user_id)['total_predictions'] == 6
+    with app.app_context():
+        months = db.session.query(UserMonthlyPredictions).filter_by(user_id=user_id).all()
+        assert sum(row.prediction_count for row in months) == 6
+
+
+def test_dashboard_without_predictions(app, client):
+    user_id = _add_predictions(app, [])
+
+    assert client.get('/dashboard').status_code == 200
+    assert _stats(app, user_id)['total_predictions'] == 0
+
+
+def test_prediction_stats_follow_inserts_and_deletes(app, client):
+    from models import db, Prediction, rebuild_prediction_stats
+
+    user_id = _add_predictions(app, [200000.0, 300000.0])
+    client.get('/dashboard')
+    client.post('/api/predict/batch', json={'houses': make_houses(5)})
+    client.post('/predict', data=dict(SAMPLE_HOUSE))
+    stats = _stats(app, user_id)
+    assert stats['total_predictions'] == 8
+
+    with app.app_context():
+        prices = sorted(p.predicted_price for p in Prediction.query.filter_by(user_id=user_id))
+        assert stats['min_price'] == prices[0] and stats['max_price'] == prices[-1]
+        assert abs(stats['avg_price'] - sum(prices) / 8) < 1e-6
+        extremes = [Prediction.query.filter_by(user_id=user_id, predicted_price=price).first().id
+                    for price in (prices[0], prices[-1])]
+
+    # Deleting the cheapest and the dearest has to find the new extremes
+    for prediction_id in extremes:
+        client.get(f'/delete_prediction/{prediction_id}')
+    stats = _stats(app, user_id)
+    assert (stats['total_predictions'], stats['min_price'], stats['max_price']) == (6, prices[1], prices[-2])
+
+    with app.app_context():
+        rebuilt = rebuild_prediction_stats(user_id).summary()
+        db.session.rollback()
+    assert rebuilt['total_predictions'] == 6
+    assert abs(rebuilt['avg_price'] - stats['avg_price']) < 1e-6
+    assert rebuilt['by_furnishing'] == stats['by_furnishing']
+
+
+def test_deleting_a_months_last_prediction_drops_its_row(app, client):
+    from models import db, UserMonthlyPredictions
+
+    # 31 predictions in January 2025, the last one on February 1st
+    user_id = _add_predictions(app, [100000.0] * 31 + [200000.0])
+    client.get('/dashboard')
+    with app.app_context():
+        february = Prediction.query.filter_by(user_id=user_id, predicted_price=200000.0).one().id
+
+    client.get(f'/delete_prediction/{february}')
+
+    with app.app_context():
+        rows = db.session.query(UserMonthlyPredictions).filter_by(user_id=user_id).all()
+        assert [(row.month, row.prediction_count) for row in rows] == [('2025-01', 31)]
+
+
+def test_backfill_that_loses_a_race_keeps_the_transaction_usable(app, client, monkeypatch):
+    import models
+    from models import db, UserPredictionStats, backfill_prediction_stats
+
+    user_id = _add_predictions(app, [100000.0, 200000.0])
+    rebuild = models.rebuild_prediction_stats
+
+    def racing_rebuild(user_id):
+        # A concurrent transaction committed the same month row first
+        rebuild(user_id)
+        db.session.execute(db.insert(models.UserMonthlyPredictions).values(
+            user_id=user_id, month='2025-01', prediction_count=1))
+
+    monkeypatch.setattr(models, 'rebuild_prediction_stats', racing_rebuild)
+    with app.app_context():
+        assert not backfill_prediction_stats(user_id)
+        assert db.session.get(UserPredictionStats, user_id) is None
+        db.session.commit()
+
+
+def test_rebuild_stats_command_backfills_every_user(app, client):
+    from models import UserMonthlyPredictions
+
+    user_id = _add_predictions(app, [100000.0 + i for i in range(40)])
+
+    result = app.test_cli_runner().invoke(args=['rebuild-stats'])
+
+    assert 'all users' in result.output
+    assert _stats(app, user_id)['total_predictions'] == 40
+    with app.app_context():
+        months = {m.month: m.prediction_count
+                  for m in UserMonthlyPredictions.query.filter_by(user_id=user_id)}
+    assert months == {'2025-01': 31, '2025-02': 9}
+
+
+def test_ensure_schema_command_creates_missing_indexes(app):
+    from sqlalchemy import inspect, text
+    from models import db, ensure_schema
+
+    def indexes():
+        return {i['name'] for i in inspect(db.engine).get_indexes('predictions')}
+
+    with app.app_context():
+        with db.engine.begin() as conn:
+            conn.execute(text('DROP INDEX ix_predictions_user_date'))
+
+        # Startup only adds columns; the index build is left to the command
+        ensure_schema()
+        assert 'ix_predictions_user_date' not in indexes()
+
+        result = app.test_cli_runner().invoke(args=['ensure-schema'])
+        assert result.exit_code == 0, result.output
+        assert 'ix_predictions_user_date' in result.output
+        assert 'ix_predictions_user_date' in indexes()
+        assert 'All indexes present' in app.test_cli_runner().invoke(args=['ensure-schema']).output
+
+
+def test_keyset_pages_walk_every_row_once_in_both_directions(app, client):
+    from datetime import datetime
+    from models import db
+    from pagination import keyset_page
+
+    user_id = _add_predictions(app, [100000.0 + i for i in range(25)])
+    with app.app_context():
+        # A batch shares one timestamp, so ties are broken by id
+        tied = datetime(2025, 1, 10)
+        for i in range(20):
+            db.session.add(Prediction(user_id=user_id, **SAMPLE_HOUSE, predicted_price=500000.0 + i,
+                                      prediction_date=tied))
+        db.session.commit()
+
+        query = Prediction.query.filter_by(user_id=user_id)
+        expected = [p.id for p in query.order_by(Prediction.prediction_date.desc(),
+                                                 Prediction.id.desc())]
+        pages, cursor = [], None
+        while True:
+            page = keyset_page(query, Prediction, cursor, per_page=10)
+            pages.append(page)
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        assert [p.id for page in pages for p in page.items] == expected
+        assert not pages[0].has_prev and pages[-1].has_prev
+
+        back = keyset_page(query, Prediction, pages[-1].prev_cursor, per_page=10)
+        assert [p.id for p in back.items] == [p.id for p in pages[-2].items]
+        first = keyset_page(query, Prediction, pages[1].prev_cursor, per_page=10)
+        assert [p.id for p in first.items] == expected[:10] and not first.has_prev
+
+
+def test_history_total_comes_from_prediction_stats(app, client):
+    _add_predictions(app, [100000.0 + i for i in range(30)])
+
+    page = client.get('/history').get_data(as_text=True)
+    assert 'Showing 20 of 30 predictions' in page
+    assert '?cursor=' in page and 'page=' not in page
+
+    client.post('/predict', data=dict(SAMPLE_HOUSE))
+    assert 'of 31 predictions' in client.get('/history?cursor=garbage').get_data(as_text=True)
+
+
+def test_history_exports_stream_every_row(app, client):
+    import csv
+    import io
+    import json
+
+    prices = [100000.0 + i for i in range(25)]
+    _add_predictions(app, prices)
+    app.config['HISTORY_EXPORT_BATCH_SIZE'] = 10
+
+    response = client.get('/history/export.csv')
+    assert response.is_streamed and response.mimetype == 'text/csv'
+    assert 'attachment' in response.headers['Content-Disposition']
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert [float(r['predicted_price']) for r in rows] == prices
+    assert rows[0]['prediction_date'] == '2025-01-01 00:00:00'
+
+    lines = client.get('/history/export.jsonl').get_data(as_text=True).splitlines()
+    with app.app_context():
+        oldest = Prediction.query.order_by(Prediction.prediction_date).first().to_dict()
+    assert json.loads(lines[0]) == oldest and len(lines) == 25
+
+    assert client.get('/history/export.xml').status_code == 404
+
+
+def test_history_export_without_predictions(app, client):
+    _add_predictions(app, [])
+
+    assert client.get('/history/export.csv').get_data(as_text=True).startswith('id,area,')
+    assert client.get('/history/export.jsonl').get_data(as_text=True) == ''
+
+
+def test_user_loader_caches_users_until_they_change(app, client):
+    from sqlalchemy import event
+    from models import db, User
+
+    user_selects = []
+    with app.app_context():
+        engine = db.engine
+
+    def count(conn, cursor, statement, *args):
+        if statement.startswith('SELECT') and 'FROM users' in statement:
+            user_selects.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', count)
+    try:
+        client.get('/dashboard')
+        user_selects.clear()
+        page = client.get('/dashboard').get_data(as_text=True)
+        assert user_selects == [] and 'Welcome, tester!' in page
+
+        with app.app_context():
+            user = User.query.filter_by(username='tester').one()
+            user.first_name, user.last_name = 'Ada', 'Lovelace'
+            db.session.commit()
+        assert 'Welcome, Ada Lovelace!' in client.get('/dashboard').get_data(as_text=True)
+    finally:
+        event.remove(engine, 'before_cursor_execute', count)
+
+
+def test_login_rehashes_password_when_hash_method_changes(app, client):
+    from models import User
+
+    client.get('/logout')
+    app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:2000'
+
+    response = client.post('/login', data={'username': 'tester', 'password': 'secret123'})
+
+    assert response.status_code == 302
+    with app.app_context():
+        user = User.query.filter_by(username='tester').one()
+        assert user.password_hash.startswith('pbkdf2:sha256:2000$')
+        assert user.check_password('secret123') and not user.password_needs_rehash()
+
+
+def test_hash_methods_without_a_cost_do_not_rehash_every_login(app):
+    from models import User
+
+    for method in ('pbkdf2', 'pbkdf2:sha256', 'scrypt'):
+        app.config['PASSWORD_HASH_METHOD'] = method
+        with app.app_context():
+            user = User(username='u', email='u@example.com')
+            user.set_password('secret123')
+            assert not user.password_needs_rehash(), method
+
+
+SIGNUP = {'username': 'newbie', 'email': 'newbie@example.com', 'first_name': 'New', 'last_name': 'User',
+          'password': 'secret123', 'confirm_password': 'secret123'}
+
+
+def test_signup_checks_both_unique_fields_in_one_query(app):
+    from sqlalchemy import event
+    from models import db, User
+
+    client = app.test_client()
+    assert client.post('/signup', data=SIGNUP).status_code == 302
+
+    with app.app_context():
+        engine = db.engine
+    user_selects = []
+
+    def count(conn, cursor, statement, *args):
+        if statement.startswith('SELECT') and 'FROM users' in statement:
+            user_selects.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', count)
+    try:
+        page = client.post('/signup', data=dict(SIGNUP, username='other')).get_data(as_text=True)
+    finally:
+        event.remove(engine, 'before_cursor_execute', count)
+
+    assert len(user_selects) == 1
+    assert 'Email already registered' in page and 'Username already taken' not in page
+    with app.app_context():
+        assert User.query.count() == 1
+
+
+def test_signup_race_lost_on_commit_is_reported_as_taken(app, monkeypatch):
+    from forms import SignupForm
+    from models import User
+
+    client = app.test_client()
+    client.post('/signup', data=SIGNUP)
+    # As if the other signup committed between our check and our INSERT
+    monkeypatch.setattr(SignupForm, 'check_taken', lambda self: False)
+
+    response = client.post('/signup', data=SIGNUP)
+
+    assert response.status_code == 200
+    assert 'Username or email already exists.' in response.get_data(as_text=True)
+    with app.app_context():
+        assert User.query.count() == 1
+
+
+def test_concurrent_signups_create_each_user_once(tmp_path, monkeypatch):
+    import threading
+    from app import create_app
+    from config import config, TestingConfig
+    from models import db, User
+
+    class FileConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'signup.db'}"
+        SQLALCHEMY_ENGINE_OPTIONS = {'connect_args': {'timeout': 30}}
+
+    monkeypatch.setitem(config, 'file', FileConfig)
+    app = create_app('file')
+    barrier = threading.Barrier(8)
+    statuses = []
+
+    def signup(i):
+        client = app.test_client()
+        barrier.wait()
+        # Pairs of threads race for the same username
+        response = client.post('/signup', data=dict(SIGNUP, username=f'racer{i // 2}',
+                                                    email=f'racer{i // 2}@example.com'))
+        statuses.append(response.status_code)
+
+    threads = [threading.Thread(target=signup, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sorted(statuses) == [200] * 4 + [302] * 4
+    with app.app_context():
+        assert sorted(u.username for u in User.query) == [f'racer{i}' for i in range(4)]
+        db.session.remove()
+        db.drop_all()
@@ -0,0 +1,58 @@
+"""Short-lived in-process cache behind Flask-Login's user_loader
+
+Every authenticated request rebuilds current_user. With the cache that
+costs a dictionary lookup instead of a SELECT on users: the column values
+are cached for ttl seconds and turned back into a User attached to the
+request's session without touching the database, so lazy relationships
+such as user.predictions still work.
+
+Updates and deletes of a User flushed by this process drop its entry
+straight away. Other Gunicorn workers keep their copy until it expires,
+so keep the TTL short.
+"""
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import make_transient_to_detached
+
+from models import db, User
+from ttl_cache import TTLCache
+
+
+class UserCache:
+    def __init__(self, maxsize=10000, ttl=30):
+        self._entries = TTLCache(maxsize, ttl)
+
+    @classmethod
+    def from_config(cls, app):
+        if not app.config['USER_CACHE_SIZE']:
+            return None
+        return cls(app.config['USER_CACHE_SIZE'], app.config['USER_CACHE_TTL'])
+
+    def load(self, user_id):
+        """The User with user_id in the current session, or None"""
+        values = self._entries.get(user_id)
+        if values is None:
+            user = db.session.get(User, user_id)
+            if user is not None:
+                self._entries.put(user_id, {column.key: getattr(user, column.key)
+                                            for column in User.__table__.columns})
+            return user
+
+        user = User(**values)
+        make_transient_to_detached(user)
+        # load=False attaches it as-is, without a SELECT
+        return db.session.merge(user, load=False)
+
+    def discard(self, user_id):
+        self._entries.discard(user_id)
+
+    def stats(self):
+        return self._entries.stats()
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate(mapper, connection, user):
+    cache = current_app.extensions.get('user_cache')
+    if cache is not None:
+        cache.discard(user.id)